@@ -1,7 +1,9 @@
 from django.contrib import admin
 
+from .busqueda import filtro as filtro_busqueda
+
 # Register your models here.
-from .models import Apartamento, PropietarioApartamento, Comprobante
+from .models import Apartamento, PropietarioApartamento, Comprobante, ExportacionComprobantes, ResumenMensual, ArchivoComprobante, PaqueteArchivo, ExtractoBancario, MovimientoBancario
 
 # Registramos el modelo Apartamento
 @admin.register(Apartamento)
@@ -16,6 +18,12 @@ class PropietarioApartamentoAdmin(admin.ModelAdmin):
     list_filter = ['apartamento']
     search_fields = ['copropietario__username', 'apartamento__numeroApartamento']
 
+    def get_search_results(self, request, queryset, search_term):
+        # Con el índice de busqueda.py en vez de icontains sobre auth_user y APARTAMENTO
+        if not search_term:
+            return queryset, False
+        return queryset.filter(filtro_busqueda(search_term)), False
+
 # Registramos el modelo Comprobante
 @admin.register(Comprobante)
 class ComprobanteAdmin(admin.ModelAdmin):
@@ -23,4 +31,76 @@ class ComprobanteAdmin(admin.ModelAdmin):
     list_filter = ['fecha_creacion', 'apartamento']
     search_fields = ['copropietario__username', 'apartamento__numeroApartamento']
 
-    
\ No newline at end of file
+    def get_search_results(self, request, queryset, search_term):
+        if not search_term:
+            return queryset, False
+        return queryset.filter(filtro_busqueda(search_term)), False
+
+# Registramos el modelo ExportacionComprobantes
+@admin.register(ExportacionComprobantes)
+class ExportacionComprobantesAdmin(admin.ModelAdmin):
+    list_display = ['exportacionID', 'solicitante', 'estado', 'total_filas', 'fecha_creacion', 'fecha_expiracion']
+    list_filter = ['estado']
+    readonly_fields = ['huella']
+
+# Registramos el modelo ResumenMensual (solo lectura, lo mantienen las señales)
+@admin.register(ResumenMensual)
+class ResumenMensualAdmin(admin.ModelAdmin):
+    list_display = ['apartamento', 'copropietario', 'periodo', 'cantidad', 'total', 'minimo', 'maximo']
+    list_filter = ['periodo', 'apartamento']
+
+    def has_add_permission(self, request):
+        return False
+
+    def has_change_permission(self, request, obj=None):
+        return False
+
+# Registramos el modelo ArchivoComprobante (solo lectura, lo mantienen las señales)
+@admin.register(ArchivoComprobante)
+class ArchivoComprobanteAdmin(admin.ModelAdmin):
+    list_display = ['ruta', 'referencias', 'tamano', 'paquete', 'fecha_creacion']
+    list_filter = ['paquete']
+    search_fields = ['ruta', 'sha256']
+
+    def has_add_permission(self, request):
+        return False
+
+    def has_change_permission(self, request, obj=None):
+        return False
+
+# Registramos el modelo PaqueteArchivo (solo lectura, lo mantiene archivar_comprobantes)
+@admin.register(PaqueteArchivo)
+class PaqueteArchivoAdmin(admin.ModelAdmin):
+    list_display = ['nombre', 'tamano', 'cerrado', 'fecha_creacion']
+
+    def has_add_permission(self, request):
+        return False
+
+    def has_change_permission(self, request, obj=None):
+        return False
+
+# Registramos el modelo ExtractoBancario (solo lectura, se importa desde admin-conciliacion/)
+@admin.register(ExtractoBancario)
+class ExtractoBancarioAdmin(admin.ModelAdmin):
+    list_display = ['extractoID', 'nombre_archivo', 'fecha_desde', 'fecha_hasta', 'total_movimientos', 'fecha_conciliacion']
+    search_fields = ['nombre_archivo', 'sha256']
+
+    def has_add_permission(self, request):
+        return False
+
+    def has_change_permission(self, request, obj=None):
+        return False
+
+# Registramos el modelo MovimientoBancario (solo lectura, lo mantiene conciliacion.py)
+@admin.register(MovimientoBancario)
+class MovimientoBancarioAdmin(admin.ModelAdmin):
+    list_display = ['extracto', 'linea', 'fecha', 'monto', 'estado', 'comprobante']
+    list_filter = ['estado', 'extracto']
+    search_fields = ['descripcion', 'referencia']
+    raw_id_fields = ['comprobante']
+
+    def has_add_permission(self, request):
+        return False
+
+    def has_change_permission(self, request, obj=None):
+        return False
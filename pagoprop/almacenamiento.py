@@ -0,0 +1,112 @@
+# pagoprop/almacenamiento.py
+
+import hashlib
+import os
+import re
+
+from django.core.files.base import ContentFile
+from django.core.files.storage import FileSystemStorage
+
+
+TAMANO_LECTURA = 64 * 1024
+
+# comprobantes/ab/cd/abcd...(64 hex).pdf
+RUTA_CONTENIDO = re.compile(r'^(?P<base>.+/)?[0-9a-f]{2}/[0-9a-f]{2}/(?P<sha>[0-9a-f]{64})(\.[\w]+)?$')
+
+
+def calcular_sha256(archivo):
+    """
+    SHA-256 de un archivo (o de un UploadedFile) leído por bloques. Si ya se
+    calculó antes (por ejemplo, al subirlo por partes) se reutiliza.
+    """
+    sha = getattr(archivo, 'sha256', None)
+    if sha:
+        return sha
+
+    calculo = hashlib.sha256()
+    if hasattr(archivo, 'chunks'):
+        for bloque in archivo.chunks(TAMANO_LECTURA):
+            calculo.update(bloque)
+    else:
+        archivo.seek(0)
+        for bloque in iter(lambda: archivo.read(TAMANO_LECTURA), b''):
+            calculo.update(bloque)
+    if hasattr(archivo, 'seek'):
+        archivo.seek(0)
+    return calculo.hexdigest()
+
+
+def ruta_por_contenido(nombre, sha):
+    """
+    Ruta final de un archivo según su hash: se conserva la carpeta de
+    upload_to y la extensión, y se reparte en dos niveles de subcarpetas
+    (256 x 256) para que ningún directorio crezca demasiado.
+    """
+    carpeta = os.path.dirname(nombre)
+    extension = os.path.splitext(nombre)[1].lower()[:10]
+    return os.path.join(carpeta, sha[:2], sha[2:4], sha + extension).replace('\\', '/')
+
+
+def rutas_vistas_previas(nombre):
+    # Miniatura y vista previa (WebP) junto al archivo original
+    base = os.path.splitext(nombre)[0]
+    return f'{base}.miniatura.webp', f'{base}.vista.webp'
+
+
+def es_ruta_por_contenido(nombre):
+    return bool(nombre and RUTA_CONTENIDO.match(nombre))
+
+
+class AlmacenamientoPorContenido(FileSystemStorage):
+    """
+    Guarda cada archivo con el nombre de su SHA-256. Si el mismo contenido ya
+    existe no se vuelve a escribir: varios comprobantes apuntan al mismo
+    archivo y ArchivoComprobante lleva la cuenta de cuántos lo usan.
+    """
+
+    def _save(self, name, content):
+        destino = ruta_por_contenido(name, calcular_sha256(content))
+        if self.exists(destino):
+            # Se reusa: la fecha nueva lo protege de verificar_almacenamiento
+            # (ver archivos.py) mientras el comprobante hace commit
+            try:
+                os.utime(self.path(destino))
+            except FileNotFoundError:
+                return super()._save(destino, content)
+            return destino
+        if self.miembro_frio(destino) is not None:
+            return destino
+        # Si dos subidas iguales llegan al mismo tiempo, FileSystemStorage le
+        # pone un sufijo a la segunda: queda un duplicado, nunca un archivo pisado
+        return super()._save(destino, content)
+
+    # Los archivos antiguos pueden estar en un paquete de ARCHIVO_FRIO_ROOT
+    # (ver paquetes.py). exists() y path() siguen hablando solo del disco;
+    # abrirlos y su tamaño sí los buscan en el índice si no están ahí.
+
+    def miembro_frio(self, name):
+        from .paquetes import miembro_frio
+        return miembro_frio(name)
+
+    def _open(self, name, mode='rb'):
+        if 'w' not in mode and not os.path.exists(self.path(name)):
+            miembro = self.miembro_frio(name)
+            if miembro is not None:
+                from .paquetes import leer_miembro
+                return ContentFile(leer_miembro(miembro), name=name)
+        return super()._open(name, mode)
+
+    def size(self, name):
+        if not os.path.exists(self.path(name)):
+            miembro = self.miembro_frio(name)
+            if miembro is not None:
+                return miembro.tamano
+        return super().size(name)
+
+
+_almacenamiento = AlmacenamientoPorContenido()
+
+
+def almacenamiento_comprobantes():
+    # Callable para el `storage` del FileField (así no queda la instancia en las migraciones)
+    return _almacenamiento
@@ -0,0 +1,265 @@
+# pagoprop/api.py
+
+import hashlib
+from collections import namedtuple
+from functools import wraps
+
+from django.http import JsonResponse
+from django.urls import reverse
+from django.utils.cache import patch_cache_control, patch_vary_headers
+
+from .autocompletado import leer_limite, recortar
+from .cache_paginas import version_usuario
+from .cache_versiones import obtener_version
+from .membresias import apartamentos_de
+from .paginacion import PARAMETRO_CURSOR, paginar_por_cursor
+from .tablero import VERSION_TABLERO
+
+
+# API de solo lectura (JSON) para la app móvil e integraciones. Mismos
+# permisos que las páginas: cada copropietario ve lo suyo y el staff todo.
+#
+#   ?campos=id,monto     solo esas columnas (se piden solo esas a la BD)
+#   ?limite=50           tamaño de página (máximo LIMITE_MAXIMO)
+#   ?cursor=... / ?despues=<id>  siguiente página (viene armada en "siguiente")
+#
+# El ETag sale de las versiones de caché que ya suben las señales (la del
+# usuario en cache_paginas.py y la del tablero para el staff), así que un
+# If-None-Match que coincide se responde con 304 sin consultar la BD.
+
+LIMITE_POR_DEFECTO = 50
+LIMITE_MAXIMO = 200
+
+# columnas: lo que se pide con only(); relacion: para select_related
+Campo = namedtuple('Campo', ['columnas', 'relacion', 'valor'])
+
+CAMPOS_COMPROBANTE = {
+    'id': Campo([], None, lambda c: c.comprobanteID),
+    'fecha_creacion': Campo([], None, lambda c: c.fecha_creacion),
+    'monto': Campo(['monto'], None, lambda c: c.monto),
+    'apartamento_id': Campo(['apartamento'], None, lambda c: c.apartamento_id),
+    'apartamento': Campo(
+        ['apartamento', 'apartamento__numeroApartamento'], 'apartamento',
+        lambda c: c.apartamento.numeroApartamento
+    ),
+    'copropietario_id': Campo(['copropietario'], None, lambda c: c.copropietario_id),
+    'copropietario': Campo(
+        ['copropietario', 'copropietario__username'], 'copropietario',
+        lambda c: c.copropietario.username
+    ),
+    'sha256': Campo(['sha256'], None, lambda c: c.sha256),
+    'archivo': Campo([], None, lambda c: reverse('archivo_comprobante', args=[c.comprobanteID])),
+    'miniatura': Campo(
+        ['miniatura'], None,
+        lambda c: reverse('miniatura_comprobante', args=[c.comprobanteID]) if c.miniatura else None
+    ),
+}
+
+CAMPOS_APARTAMENTO = {
+    'id': Campo([], None, lambda a: a.apartamentoID),
+    'numero': Campo(['numeroApartamento'], None, lambda a: a.numeroApartamento),
+}
+
+CAMPOS_ASIGNACION = {
+    'id': Campo([], None, lambda p: p.propietarioAptoID),
+    'apartamento_id': Campo(['apartamento'], None, lambda p: p.apartamento_id),
+    'apartamento': Campo(
+        ['apartamento', 'apartamento__numeroApartamento'], 'apartamento',
+        lambda p: p.apartamento.numeroApartamento
+    ),
+    'copropietario_id': Campo(['copropietario'], None, lambda p: p.copropietario_id),
+    'copropietario': Campo(
+        ['copropietario', 'copropietario__username'], 'copropietario',
+        lambda p: p.copropietario.username
+    ),
+}
+
+
+class ErrorApi(Exception):
+    # Parámetros inválidos: se responde {'error': ..., **extra} con ese estado
+    def __init__(self, mensaje, estado=400, **extra):
+        super().__init__(mensaje)
+        self.mensaje = mensaje
+        self.estado = estado
+        self.extra = extra
+
+
+def error(mensaje, estado=400, **extra):
+    return JsonResponse({'error': mensaje, **extra}, status=estado)
+
+
+# ---------------------------------------------------------------------------
+# Acceso
+# ---------------------------------------------------------------------------
+
+def requiere_login(vista):
+    # Como login_required, pero responde 401 en JSON en vez de redirigir
+    @wraps(vista)
+    def envoltura(request, *args, **kwargs):
+        if not request.user.is_authenticated:
+            return error('Autenticación requerida.', 401)
+        return vista(request, *args, **kwargs)
+    return envoltura
+
+
+def requiere_staff(vista):
+    @wraps(vista)
+    def envoltura(request, *args, **kwargs):
+        if not request.user.is_authenticated:
+            return error('Autenticación requerida.', 401)
+        if not (request.user.is_active and request.user.is_staff):
+            return error('No tienes permiso para ver esto.', 403)
+        return vista(request, *args, **kwargs)
+    return envoltura
+
+
+def etag(alcance):
+    """
+    etag_func para @condition. alcance 'usuario' usa la versión de las
+    páginas del usuario; 'staff' la del tablero (cambia con cualquier
+    comprobante, apartamento, asignación o usuario).
+    """
+    def calcular(request, *args, **kwargs):
+        if not request.user.is_authenticated:
+            return None
+        if alcance == 'staff':
+            version = obtener_version(VERSION_TABLERO)
+        else:
+            version = version_usuario(request.user.pk)
+        partes = [alcance, request.user.pk, version, request.path, request.GET.urlencode()]
+        return hashlib.md5('|'.join(str(parte) for parte in partes).encode(), usedforsecurity=False).hexdigest()
+    return calcular
+
+
+def respuesta_json(vista):
+    """
+    La vista devuelve un dict; aquí se convierte en la respuesta (o en el
+    error si lanzó ErrorApi). Los clientes la guardan pero siempre
+    revalidan con el ETag.
+    """
+    @wraps(vista)
+    def envoltura(request, *args, **kwargs):
+        try:
+            response = JsonResponse(vista(request, *args, **kwargs))
+        except ErrorApi as e:
+            return error(e.mensaje, e.estado, **e.extra)
+        patch_cache_control(response, private=True, no_cache=True)
+        patch_vary_headers(response, ['Cookie'])
+        return response
+    return envoltura
+
+
+# ---------------------------------------------------------------------------
+# Lectura de parámetros
+# ---------------------------------------------------------------------------
+
+def leer_campos(texto, disponibles):
+    """
+    Nombres pedidos en ?campos= (todos si no viene). Lanza ErrorApi si
+    alguno no existe.
+    """
+    if not texto:
+        return list(disponibles)
+    campos = list(dict.fromkeys(nombre.strip() for nombre in texto.split(',') if nombre.strip()))
+    desconocidos = [nombre for nombre in campos if nombre not in disponibles]
+    if desconocidos or not campos:
+        raise ErrorApi(
+            f'Campos desconocidos: {", ".join(desconocidos) or "(ninguno)"}. '
+            f'Disponibles: {", ".join(disponibles)}.'
+        )
+    return campos
+
+
+def _restringir(queryset, campos, disponibles, columnas_fijas):
+    # only() + select_related con lo justo para esos campos
+    columnas = list(columnas_fijas)
+    relaciones = []
+    for nombre in campos:
+        campo = disponibles[nombre]
+        columnas += campo.columnas
+        if campo.relacion and campo.relacion not in relaciones:
+            relaciones.append(campo.relacion)
+    if relaciones:
+        queryset = queryset.select_related(*relaciones)
+    return queryset.only(*dict.fromkeys(columnas))
+
+
+def serializar(objetos, campos, disponibles):
+    return [{nombre: disponibles[nombre].valor(objeto) for nombre in campos} for objeto in objetos]
+
+
+def _url(request, parametros):
+    texto = parametros.urlencode()
+    return f'{request.path}?{texto}' if texto else request.path
+
+
+def _con(parametros, nombre, valor):
+    parametros = parametros.copy()
+    parametros[nombre] = valor
+    return parametros
+
+
+# ---------------------------------------------------------------------------
+# Listados
+# ---------------------------------------------------------------------------
+
+def listar_comprobantes(request, comprobantes):
+    """
+    Página de comprobantes (ya filtrados por permisos y filtros) con
+    paginación por cursor, igual que las páginas HTML.
+    """
+    campos = leer_campos(request.GET.get('campos'), CAMPOS_COMPROBANTE)
+    comprobantes = _restringir(
+        comprobantes, campos, CAMPOS_COMPROBANTE, ['comprobanteID', 'fecha_creacion']
+    )
+    limite = leer_limite(request.GET.get('limite'), LIMITE_POR_DEFECTO, LIMITE_MAXIMO)
+    pagina = paginar_por_cursor(comprobantes, request, limite)
+    anterior = siguiente = None
+    if pagina.has_previous():
+        anterior = _url(request, _con(pagina.parametros, PARAMETRO_CURSOR, pagina.cursor_anterior))
+    if pagina.has_next():
+        siguiente = _url(request, _con(pagina.parametros, PARAMETRO_CURSOR, pagina.cursor_siguiente))
+    return {
+        'resultados': serializar(pagina, campos, CAMPOS_COMPROBANTE),
+        'anterior': anterior,
+        'siguiente': siguiente,
+    }
+
+
+def listar_por_llave(request, queryset, disponibles, llave):
+    """
+    Página ordenada por la llave primaria (`llave`), desde ?despues=<id>.
+    Para apartamentos y asignaciones, que no tienen fecha.
+    """
+    campos = leer_campos(request.GET.get('campos'), disponibles)
+    limite = leer_limite(request.GET.get('limite'), LIMITE_POR_DEFECTO, LIMITE_MAXIMO)
+    queryset = _restringir(queryset, campos, disponibles, [llave]).order_by(llave)
+
+    despues = request.GET.get('despues')
+    if despues:
+        try:
+            queryset = queryset.filter(**{f'{llave}__gt': int(despues)})
+        except ValueError:
+            raise ErrorApi('"despues" debe ser un número.')
+
+    filas, hay_mas = recortar(list(queryset[:limite + 1]), limite)
+    siguiente = None
+    if hay_mas:
+        siguiente = _url(request, _con(request.GET, 'despues', getattr(filas[-1], llave)))
+    return {
+        'resultados': serializar(filas, campos, disponibles),
+        'siguiente': siguiente,
+    }
+
+
+def listar_mis_apartamentos(request):
+    # Salen de membresias.py: sin consultas en la mayoría de los casos
+    campos = leer_campos(request.GET.get('campos'), CAMPOS_APARTAMENTO)
+    apartamentos = [
+        {'id': membresia.apartamentoID, 'numero': membresia.numeroApartamento}
+        for membresia in apartamentos_de(request.user)
+    ]
+    return {
+        'resultados': [{nombre: apartamento[nombre] for nombre in campos} for apartamento in apartamentos],
+        'siguiente': None,
+    }
@@ -4,3 +4,7 @@ from django.apps import AppConfig
 class PagopropConfig(AppConfig):
     default_auto_field = 'django.db.models.BigAutoField'
     name = 'pagoprop'
+
+    def ready(self):
+        # Registrar las señales (invalidación de caché, contadores, etc.)
+        from . import signals  # noqa: F401
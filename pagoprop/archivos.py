@@ -0,0 +1,379 @@
+# pagoprop/archivos.py
+
+import os
+import re
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from django.core.files.storage import default_storage
+from django.db import IntegrityError, transaction
+from django.db.models import Case, Count, F, Q, Value, When
+
+from .almacenamiento import (
+    almacenamiento_comprobantes, calcular_sha256, es_ruta_por_contenido, ruta_por_contenido,
+    rutas_vistas_previas
+)
+from .models import ArchivoComprobante, Comprobante
+
+
+# ---------------------------------------------------------------------------
+# Conteo de referencias
+# ---------------------------------------------------------------------------
+
+def retener(ruta, sha256='', tamano=0, cantidad=1):
+    """
+    Suma `cantidad` referencias al archivo: un UPDATE con F() o, si es la
+    primera vez que se usa, un INSERT.
+    """
+    if not ruta:
+        return
+    fila = ArchivoComprobante.objects.filter(ruta=ruta)
+    with transaction.atomic():
+        if fila.update(referencias=F('referencias') + cantidad):
+            return
+        try:
+            with transaction.atomic():
+                ArchivoComprobante.objects.create(
+                    ruta=ruta, sha256=sha256, tamano=tamano, referencias=cantidad
+                )
+        except IntegrityError:
+            # Otro request registró el mismo archivo al mismo tiempo
+            fila.update(referencias=F('referencias') + cantidad)
+
+
+def borrar_si_no_se_usa(ruta):
+    # Se vuelve a revisar después del commit: otra subida pudo reusar el archivo
+    if not ArchivoComprobante.objects.filter(ruta=ruta).exists():
+        almacenamiento_comprobantes().delete(ruta)
+        _borrar_vistas_previas(ruta)
+
+
+def _borrar_vistas_previas(ruta):
+    for nombre in rutas_vistas_previas(ruta):
+        default_storage.delete(nombre)
+
+
+def liberar(ruta, cantidad=1):
+    """
+    Resta `cantidad` referencias. Cuando ningún comprobante usa el archivo
+    se borra la fila y, si la transacción se confirma, el archivo del disco.
+    """
+    if not ruta:
+        return
+    fila = ArchivoComprobante.objects.filter(ruta=ruta)
+    fila.update(referencias=Case(
+        When(referencias__gte=cantidad, then=F('referencias') - cantidad),
+        default=Value(0),
+    ))
+    if fila.filter(referencias=0).delete()[0]:
+        transaction.on_commit(lambda: borrar_si_no_se_usa(ruta))
+
+
+def _tamano(archivo):
+    try:
+        return archivo.size
+    except (OSError, ValueError):
+        return 0
+
+
+# ---------------------------------------------------------------------------
+# Señales de Comprobante
+# ---------------------------------------------------------------------------
+
+def preparar_archivo(comprobante):
+    """
+    Antes de guardar: si el archivo es nuevo, calcula su SHA-256 para que el
+    almacenamiento lo use como nombre y quede guardado en el comprobante.
+    """
+    archivo = comprobante.archivo
+    if archivo and not archivo._committed:
+        comprobante.sha256 = calcular_sha256(archivo.file)
+        archivo.file.sha256 = comprobante.sha256
+        # Las vistas previas (y el original sin normalizar) eran del archivo anterior
+        comprobante.miniatura = ''
+        comprobante.vista_previa = ''
+        comprobante.archivo_original = ''
+
+
+def comprobante_guardado(comprobante, created, anterior):
+    ruta = comprobante.archivo.name
+    ruta_anterior = None if created or anterior is None else anterior['archivo']
+    if ruta == ruta_anterior:
+        return
+    retener(ruta, comprobante.sha256, _tamano(comprobante.archivo))
+    liberar(ruta_anterior)
+    if anterior and anterior['archivo_original'] and not comprobante.archivo_original:
+        liberar(anterior['archivo_original'])
+
+
+def comprobante_eliminado(comprobante):
+    liberar(comprobante.archivo.name)
+    liberar(comprobante.archivo_original.name)
+
+
+def contar_duplicados(comprobante):
+    # Otros comprobantes con exactamente el mismo archivo
+    if not comprobante.sha256:
+        return 0
+    return Comprobante.objects.filter(sha256=comprobante.sha256).exclude(pk=comprobante.pk).count()
+
+
+# ---------------------------------------------------------------------------
+# Migración de archivos al esquema por contenido (comando migrar_archivos)
+# ---------------------------------------------------------------------------
+
+def archivos_pendientes():
+    # Archivos que todavía están en la carpeta plana comprobantes/
+    return [
+        archivo for archivo in ArchivoComprobante.objects.order_by('pk').iterator()
+        if not es_ruta_por_contenido(archivo.ruta)
+    ]
+
+
+def migrar_archivo(archivo):
+    """
+    Mueve un archivo a su ruta por contenido y actualiza los comprobantes
+    que lo usan. Si el mismo contenido ya existía, el archivo viejo se borra.
+    Devuelve (ruta_nueva, bytes_liberados), o None si el archivo no existe
+    en el disco.
+    """
+    almacenamiento = almacenamiento_comprobantes()
+    if not almacenamiento.exists(archivo.ruta):
+        return None
+
+    with almacenamiento.open(archivo.ruta, 'rb') as original:
+        sha256 = calcular_sha256(original)
+    destino = ruta_por_contenido(archivo.ruta, sha256)
+    tamano = almacenamiento.size(archivo.ruta)
+
+    # Mover (no copiar) dentro del mismo MEDIA_ROOT
+    duplicado = almacenamiento.exists(destino)
+    if not duplicado:
+        os.makedirs(os.path.dirname(almacenamiento.path(destino)), exist_ok=True)
+        os.replace(almacenamiento.path(archivo.ruta), almacenamiento.path(destino))
+
+    try:
+        with transaction.atomic():
+            # Las vistas previas se vuelven a generar junto a la ruta nueva
+            Comprobante.objects.filter(archivo=archivo.ruta).update(
+                archivo=destino, sha256=sha256, miniatura='', vista_previa=''
+            )
+            Comprobante.objects.filter(archivo_original=archivo.ruta).update(archivo_original=destino)
+            referencias = archivo.referencias
+            archivo.delete()
+            retener(destino, sha256, tamano, cantidad=referencias)
+    except Exception:
+        if not duplicado:
+            os.replace(almacenamiento.path(destino), almacenamiento.path(archivo.ruta))
+        raise
+
+    _borrar_vistas_previas(archivo.ruta)
+    if duplicado:
+        almacenamiento.delete(archivo.ruta)
+        return destino, tamano
+    return destino, 0
+
+
+# ---------------------------------------------------------------------------
+# Verificación del almacenamiento (comando verificar_archivos)
+# ---------------------------------------------------------------------------
+# El disco y la BD se comparan por carpeta (comprobantes/ab/): cada carpeta
+# tiene ~1/256 de los archivos, así nunca se carga todo en memoria. Las
+# carpetas se leen en paralelo con os.scandir y las consultas se hacen una
+# carpeta a la vez.
+
+SUFIJOS_VISTAS = ('.miniatura.webp', '.vista.webp')
+
+CARPETA_FRAGMENTO = re.compile(r'^[0-9a-f]{2}$')
+
+
+def _carpeta_base():
+    return Comprobante._meta.get_field('archivo').upload_to.rstrip('/')
+
+
+def _listar(raiz, relativa, recursivo):
+    """
+    Archivos bajo MEDIA_ROOT/relativa como {nombre relativo: (tamaño, mtime)}.
+    Sin `recursivo` solo se leen los archivos sueltos de esa carpeta.
+    """
+    encontrados = {}
+    pendientes = [relativa]
+    while pendientes:
+        actual = pendientes.pop()
+        try:
+            entradas = os.scandir(os.path.join(raiz, actual))
+        except FileNotFoundError:
+            continue
+        with entradas:
+            for entrada in entradas:
+                nombre = f'{actual}/{entrada.name}'
+                if entrada.is_dir(follow_symlinks=False):
+                    if recursivo:
+                        pendientes.append(nombre)
+                elif entrada.is_file(follow_symlinks=False):
+                    estado = entrada.stat(follow_symlinks=False)
+                    encontrados[nombre] = (estado.st_size, estado.st_mtime)
+    return encontrados
+
+
+def _carpetas(raiz):
+    # La carpeta plana (archivos antiguos) y una por cada primer nivel ab/
+    base = _carpeta_base()
+    carpetas = [(base, False)]
+    try:
+        with os.scandir(os.path.join(raiz, base)) as entradas:
+            for entrada in entradas:
+                if entrada.is_dir(follow_symlinks=False) and CARPETA_FRAGMENTO.match(entrada.name):
+                    carpetas.append((f'{base}/{entrada.name}', True))
+    except FileNotFoundError:
+        pass
+    return sorted(carpetas)
+
+
+def _en_carpeta(consulta, campo, carpeta, recursivo):
+    if recursivo:
+        return consulta.filter(**{f'{campo}__startswith': carpeta + '/'})
+    return consulta.filter(**{f'{campo}__regex': '^' + re.escape(carpeta) + '/[^/]+$'})
+
+
+def _usos_originales():
+    # Originales conservados por la normalización (suelen ser pocos)
+    usos = {}
+    filas = Comprobante.objects.exclude(archivo_original='').order_by().values('archivo_original').annotate(n=Count('pk'))
+    for fila in filas.iterator():
+        usos[fila['archivo_original']] = fila['n']
+    return usos
+
+
+def _comparar_carpeta(carpeta, recursivo, en_disco, originales, limite_reciente):
+    """
+    Diferencias de una carpeta. Devuelve una lista de (tipo, ruta, detalle):
+    'huerfano' (archivo sin comprobantes), 'colgante' (comprobante sin
+    archivo), 'conteo' (referencias guardadas distintas de las reales).
+    """
+    filas = {}
+    archivados = set()
+    for ruta, referencias, paquete in (
+        _en_carpeta(ArchivoComprobante.objects.all(), 'ruta', carpeta, recursivo)
+        .values_list('ruta', 'referencias', 'paquete').iterator()
+    ):
+        filas[ruta] = referencias
+        if paquete:
+            # Está en un paquete de ARCHIVO_FRIO_ROOT (ver paquetes.py)
+            archivados.add(ruta)
+    usos = {
+        fila['archivo']: fila['n']
+        for fila in _en_carpeta(Comprobante.objects.order_by(), 'archivo', carpeta, recursivo)
+        .values('archivo').annotate(n=Count('pk')).iterator()
+    }
+    prefijo = carpeta + '/'
+    for ruta, cantidad in originales.items():
+        if ruta.startswith(prefijo) and (recursivo or '/' not in ruta[len(prefijo):]):
+            usos[ruta] = usos.get(ruta, 0) + cantidad
+
+    # Bases (sin extensión) de los archivos en uso, para reconocer sus vistas previas
+    bases = {os.path.splitext(ruta)[0] for ruta in usos}
+
+    diferencias = []
+    for nombre, (tamano, modificado) in en_disco.items():
+        if nombre in usos:
+            continue
+        if nombre.endswith(SUFIJOS_VISTAS):
+            base = nombre[:-len(next(s for s in SUFIJOS_VISTAS if nombre.endswith(s)))]
+            if base in bases:
+                continue
+        if modificado >= limite_reciente:
+            # Puede ser una subida o una normalización que todavía no hace commit
+            continue
+        diferencias.append(('huerfano', nombre, tamano))
+
+    for ruta, cantidad in usos.items():
+        if ruta not in en_disco and ruta not in archivados:
+            diferencias.append(('colgante', ruta, cantidad))
+        if filas.get(ruta, 0) != cantidad:
+            diferencias.append(('conteo', ruta, (filas.get(ruta, 0), cantidad)))
+    for ruta, referencias in filas.items():
+        if ruta not in usos:
+            diferencias.append(('conteo', ruta, (referencias, 0)))
+    return diferencias
+
+
+def _usos_reales(ruta):
+    return (
+        Comprobante.objects.filter(archivo=ruta).count()
+        + Comprobante.objects.filter(archivo_original=ruta).count()
+    )
+
+
+def _sigue_huerfano(ruta, limite_reciente):
+    # Lo mismo que _comparar_carpeta(), pero con lo que hay ahora
+    try:
+        if os.path.getmtime(almacenamiento_comprobantes().path(ruta)) >= limite_reciente:
+            return False
+    except FileNotFoundError:
+        return False
+    if ArchivoComprobante.objects.filter(ruta=ruta).exists() or _usos_reales(ruta):
+        return False
+    sufijo = next((s for s in SUFIJOS_VISTAS if ruta.endswith(s)), None)
+    if sufijo:
+        base = ruta[:-len(sufijo)]
+        return not Comprobante.objects.filter(
+            Q(archivo__startswith=base + '.') | Q(archivo_original__startswith=base + '.')
+        ).exists()
+    return True
+
+
+def _reparar(tipo, ruta, detalle, limite_reciente):
+    """
+    Corrige una diferencia, revisándola otra vez con la fila bloqueada: el
+    listado es de hace un rato y entretanto una subida deduplicada pudo
+    reusar el archivo o cambiar sus referencias.
+    """
+    with transaction.atomic():
+        fila = ArchivoComprobante.objects.select_for_update().filter(ruta=ruta).first()
+        if tipo == 'huerfano':
+            if fila is None and _sigue_huerfano(ruta, limite_reciente):
+                almacenamiento_comprobantes().delete(ruta)
+        elif tipo == 'conteo':
+            reales = _usos_reales(ruta)
+            if fila is None:
+                if reales:
+                    ArchivoComprobante.objects.create(ruta=ruta, referencias=reales)
+            elif not reales:
+                fila.delete()
+            elif fila.referencias != reales:
+                fila.referencias = reales
+                fila.save(update_fields=['referencias'])
+    # Los colgantes solo se reportan: el comprobante existe pero su archivo no
+
+
+def verificar_almacenamiento(reparar=False, hilos=4, gracia_minutos=60, al_encontrar=None):
+    """
+    Compara MEDIA_ROOT/comprobantes con la BD. Con `reparar` borra los
+    archivos huérfanos y corrige los conteos de referencias. Llama a
+    al_encontrar(tipo, ruta, detalle) por cada diferencia y devuelve un
+    dict con los totales por tipo.
+    """
+    raiz = almacenamiento_comprobantes().location
+    limite_reciente = time.time() - gracia_minutos * 60
+    originales = _usos_originales()
+    totales = {'carpetas': 0, 'archivos': 0, 'huerfano': 0, 'colgante': 0, 'conteo': 0, 'bytes_huerfanos': 0}
+
+    carpetas = _carpetas(raiz)
+    with ThreadPoolExecutor(max_workers=hilos, thread_name_prefix='verificar-archivos') as pool:
+        # Se leen de a `hilos` carpetas por vez para no acumular listados en memoria
+        for inicio in range(0, len(carpetas), hilos):
+            grupo = carpetas[inicio:inicio + hilos]
+            listados = pool.map(lambda carpeta: _listar(raiz, *carpeta), grupo)
+            for (carpeta, recursivo), en_disco in zip(grupo, listados):
+                totales['carpetas'] += 1
+                totales['archivos'] += len(en_disco)
+                for tipo, ruta, detalle in _comparar_carpeta(carpeta, recursivo, en_disco, originales, limite_reciente):
+                    totales[tipo] += 1
+                    if tipo == 'huerfano':
+                        totales['bytes_huerfanos'] += detalle
+                    if al_encontrar:
+                        al_encontrar(tipo, ruta, detalle)
+                    if reparar:
+                        _reparar(tipo, ruta, detalle, limite_reciente)
+    return totales
@@ -0,0 +1,167 @@
+# pagoprop/asignaciones.py
+
+import csv
+import io
+from collections import Counter
+
+from django.contrib.auth.models import User
+from django.db import transaction
+from django.db.models.functions import Lower
+
+from . import contadores
+from .cache_paginas import invalidar_propietarios
+from .membresias import invalidar_membresias
+from .models import Apartamento, PropietarioApartamento
+from .tablero import invalidar_tablero
+
+
+# Importación masiva de asignaciones desde un CSV con dos columnas:
+# usuario (username o email) y numeroApartamento. Todo se resuelve con
+# consultas por conjuntos (una para usuarios, una para apartamentos y una
+# para las asignaciones que ya existen), sin una consulta por fila.
+
+TAMANO_LOTE = 500
+
+CREAR = 'crear'
+EXISTENTE = 'existente'
+REPETIDA = 'repetida'
+USUARIO_DESCONOCIDO = 'usuario_desconocido'
+APARTAMENTO_DESCONOCIDO = 'apartamento_desconocido'
+INVALIDA = 'invalida'
+
+ESTADOS = {
+    CREAR: 'Se asigna',
+    EXISTENTE: 'Ya estaba asignado',
+    REPETIDA: 'Repetida en el archivo',
+    USUARIO_DESCONOCIDO: 'Usuario no encontrado',
+    APARTAMENTO_DESCONOCIDO: 'Apartamento no encontrado',
+    INVALIDA: 'Fila incompleta',
+}
+
+
+class Fila:
+    # Una línea del CSV y cómo se resolvió
+    def __init__(self, linea, usuario, apartamento):
+        self.linea = linea
+        self.texto_usuario = usuario
+        self.texto_apartamento = apartamento
+        self.usuario = None
+        self.apartamento = None
+        self.estado = None
+
+    @property
+    def descripcion(self):
+        return ESTADOS[self.estado]
+
+
+def leer_csv(texto):
+    """
+    Filas del CSV (acepta ',' o ';' y una fila de encabezado opcional).
+    """
+    try:
+        dialecto = csv.Sniffer().sniff(texto[:1024], delimiters=',;')
+    except csv.Error:
+        dialecto = csv.excel
+    filas = []
+    for linea, columnas in enumerate(csv.reader(io.StringIO(texto), dialecto), start=1):
+        columnas = [columna.strip() for columna in columnas]
+        if not any(columnas):
+            continue
+        if linea == 1 and columnas[0].lower() in ('usuario', 'username', 'email', 'correo'):
+            continue
+        columnas += [''] * (2 - len(columnas))
+        filas.append(Fila(linea, columnas[0], columnas[1]))
+    return filas
+
+
+def _buscar_usuarios(textos):
+    # {texto tal como vino: usuario}; username exacto o email sin mayúsculas
+    nombres = {texto for texto in textos if '@' not in texto}
+    correos = {texto.lower() for texto in textos if '@' in texto}
+    encontrados = {}
+    if nombres:
+        for usuario in User.objects.filter(username__in=nombres):
+            encontrados[usuario.username] = usuario
+    if correos:
+        # Un email repetido entre varias cuentas es ambiguo: no se usa
+        por_correo = {}
+        for usuario in User.objects.annotate(correo=Lower('email')).filter(correo__in=correos):
+            por_correo.setdefault(usuario.correo, []).append(usuario)
+        for texto in textos:
+            coincidencias = por_correo.get(texto.lower(), []) if '@' in texto else []
+            if len(coincidencias) == 1:
+                encontrados[texto] = coincidencias[0]
+    return encontrados
+
+
+def resolver(filas):
+    """
+    Le pone a cada fila su usuario, su apartamento y su estado.
+    """
+    completas = [fila for fila in filas if fila.texto_usuario and fila.texto_apartamento]
+    usuarios = _buscar_usuarios({fila.texto_usuario for fila in completas})
+    apartamentos = {
+        apartamento.numeroApartamento: apartamento
+        for apartamento in Apartamento.objects.filter(
+            numeroApartamento__in={fila.texto_apartamento for fila in completas}
+        )
+    }
+    for fila in completas:
+        fila.usuario = usuarios.get(fila.texto_usuario)
+        fila.apartamento = apartamentos.get(fila.texto_apartamento)
+
+    validas = [fila for fila in completas if fila.usuario and fila.apartamento]
+    existentes = set(
+        PropietarioApartamento.objects.filter(
+            copropietario__in={fila.usuario.pk for fila in validas},
+            apartamento__in={fila.apartamento.pk for fila in validas},
+        ).values_list('copropietario_id', 'apartamento_id')
+    )
+
+    vistas = set()
+    for fila in filas:
+        if not (fila.texto_usuario and fila.texto_apartamento):
+            fila.estado = INVALIDA
+        elif fila.usuario is None:
+            fila.estado = USUARIO_DESCONOCIDO
+        elif fila.apartamento is None:
+            fila.estado = APARTAMENTO_DESCONOCIDO
+        else:
+            par = (fila.usuario.pk, fila.apartamento.pk)
+            if par in existentes:
+                fila.estado = EXISTENTE
+            elif par in vistas:
+                fila.estado = REPETIDA
+            else:
+                fila.estado = CREAR
+            vistas.add(par)
+    return filas
+
+
+def importar(texto, simular=True, tamano_lote=TAMANO_LOTE):
+    """
+    Lee y resuelve el CSV y, si no es una simulación, crea las asignaciones
+    nuevas en lotes con bulk_create dentro de una transacción. Devuelve
+    (filas, totales por estado).
+    """
+    filas = resolver(leer_csv(texto))
+    totales = Counter(fila.estado for fila in filas)
+
+    nuevas = [fila for fila in filas if fila.estado == CREAR]
+    if simular or not nuevas:
+        return filas, totales
+
+    with transaction.atomic():
+        # ignore_conflicts: si otro admin asignó lo mismo mientras tanto, se omite
+        PropietarioApartamento.objects.bulk_create(
+            [PropietarioApartamento(copropietario=fila.usuario, apartamento=fila.apartamento) for fila in nuevas],
+            batch_size=tamano_lote,
+            ignore_conflicts=True,
+        )
+        # bulk_create no envía señales: lo mismo que signals.asignacion_guardada
+        contadores.recalcular_apartamentos({fila.usuario.pk for fila in nuevas})
+        invalidar_tablero()
+        # Los nuevos ya están entre los propietarios de cada apartamento
+        invalidar_propietarios({fila.apartamento.pk for fila in nuevas})
+        invalidar_membresias({fila.usuario.pk for fila in nuevas})
+    return filas, totales
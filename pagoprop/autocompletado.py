@@ -0,0 +1,71 @@
+# pagoprop/autocompletado.py
+
+from .busqueda import filtro, filtro_apartamentos, filtro_usuarios
+from .models import Apartamento, PropietarioApartamento, User
+
+
+# Búsquedas de la pantalla de asignaciones. Usan el índice de términos de
+# busqueda.py (prefijo de cualquier palabra del nombre, email, usuario o
+# número de apartamento, sin importar tildes ni mayúsculas).
+
+LIMITE_POR_DEFECTO = 10
+LIMITE_MAXIMO = 50
+
+
+def leer_limite(valor, por_defecto=LIMITE_POR_DEFECTO, maximo=LIMITE_MAXIMO):
+    # También la usa api.py, con sus propios límites
+    try:
+        limite = int(valor)
+    except (TypeError, ValueError):
+        return por_defecto
+    return max(1, min(limite, maximo))
+
+
+def recortar(filas, limite):
+    # Se pide uno de más para saber si hay más resultados sin un COUNT
+    return filas[:limite], len(filas) > limite
+
+
+def buscar_usuarios(texto, limite=LIMITE_POR_DEFECTO):
+    usuarios = User.objects.filter(is_superuser=False)
+    texto = (texto or '').strip()
+    if texto:
+        usuarios = usuarios.filter(filtro_usuarios(texto))
+    filas = list(
+        usuarios.order_by('first_name', 'last_name', 'id')
+        .values('id', 'username', 'first_name', 'last_name')[:limite + 1]
+    )
+    filas, mas = recortar(filas, limite)
+    resultados = [
+        {
+            'id': fila['id'],
+            'texto': f"{fila['first_name']} {fila['last_name']} ({fila['username']})".strip(),
+        }
+        for fila in filas
+    ]
+    return resultados, mas
+
+
+def buscar_apartamentos(texto, limite=LIMITE_POR_DEFECTO):
+    apartamentos = Apartamento.objects.all()
+    texto = (texto or '').strip()
+    if texto:
+        apartamentos = apartamentos.filter(filtro_apartamentos(texto))
+    filas = list(
+        apartamentos.order_by('numeroApartamento')
+        .values_list('apartamentoID', 'numeroApartamento')[:limite + 1]
+    )
+    filas, mas = recortar(filas, limite)
+    return [{'id': pk, 'texto': f'Apartamento {numero}'} for pk, numero in filas], mas
+
+
+def filtrar_asignaciones(texto):
+    """
+    Asignaciones para la tabla paginada, filtradas por el número de
+    apartamento o los datos del copropietario.
+    """
+    asignaciones = PropietarioApartamento.objects.select_related('copropietario', 'apartamento')
+    texto = (texto or '').strip()
+    if texto:
+        asignaciones = asignaciones.filter(filtro(texto))
+    return asignaciones.order_by('apartamento__numeroApartamento', 'propietarioAptoID')
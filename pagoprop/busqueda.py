@@ -0,0 +1,181 @@
+# pagoprop/busqueda.py
+
+import re
+import unicodedata
+
+from django.contrib.auth.models import User
+from django.db import transaction
+from django.db.models import Q
+
+from .models import Apartamento, TerminoBusqueda
+
+
+# Búsqueda de comprobantes y asignaciones por nombre, email, usuario o número
+# de apartamento. En vez de icontains sobre auth_user y APARTAMENTO (que
+# recorre las tablas), cada usuario y apartamento tiene sus términos en
+# TERMINO_BUSQUEDA, en minúsculas y sin tildes, y se busca por prefijo
+# (LIKE 'texto%'), que usa el índice (tipo, termino, objeto_id).
+# Los términos los mantienen las señales de User y Apartamento, y
+# inventario.provisionar() para los que se crean con bulk_create.
+#
+# Con varias palabras ("ana 101") cada una tiene que coincidir con el
+# copropietario o con el apartamento.
+
+LARGO_TERMINO = TerminoBusqueda._meta.get_field('termino').max_length
+
+# Palabras de la consulta que se tienen en cuenta (las más largas)
+MAXIMO_PALABRAS = 5
+
+TAMANO_LOTE = 1000
+
+
+def normalizar(texto):
+    # 'José Pérez' -> 'jose perez'
+    texto = unicodedata.normalize('NFKD', str(texto or ''))
+    return ''.join(letra for letra in texto if not unicodedata.combining(letra)).lower().strip()
+
+
+def palabras(texto):
+    return {palabra[:LARGO_TERMINO] for palabra in re.findall(r'[^\W_]+', normalizar(texto))}
+
+
+def terminos_usuario(username, first_name, last_name, email):
+    terminos = palabras(first_name) | palabras(last_name) | palabras(username) | palabras(email)
+    # Completos también, para buscar 'ana.perez@' o 'ana_p'
+    for texto in (username, email):
+        texto = normalizar(texto)
+        if texto:
+            terminos.add(texto[:LARGO_TERMINO])
+    return terminos
+
+
+def terminos_apartamento(numero):
+    # 'T-1 101' -> t, 1, 101, t-1101 y t1101
+    terminos = palabras(numero)
+    numero = re.sub(r'\s+', '', normalizar(numero))
+    for texto in (numero, re.sub(r'[\W_]+', '', numero)):
+        if texto:
+            terminos.add(texto[:LARGO_TERMINO])
+    return terminos
+
+
+# ---------------------------------------------------------------------------
+# Mantenimiento del índice
+# ---------------------------------------------------------------------------
+
+def _reemplazar(tipo, terminos_por_objeto):
+    """
+    Deja en el índice exactamente esos términos para esos objetos (un
+    conjunto vacío borra los del objeto). Devuelve True si algo cambió.
+    """
+    actuales = {}
+    for objeto_id, termino in TerminoBusqueda.objects.filter(
+        tipo=tipo, objeto_id__in=list(terminos_por_objeto)
+    ).values_list('objeto_id', 'termino'):
+        actuales.setdefault(objeto_id, set()).add(termino)
+
+    cambiados = [
+        objeto_id for objeto_id, terminos in terminos_por_objeto.items()
+        if actuales.get(objeto_id, set()) != terminos
+    ]
+    if not cambiados:
+        return False
+    with transaction.atomic():
+        TerminoBusqueda.objects.filter(tipo=tipo, objeto_id__in=cambiados).delete()
+        TerminoBusqueda.objects.bulk_create(
+            [
+                TerminoBusqueda(tipo=tipo, objeto_id=objeto_id, termino=termino)
+                for objeto_id in cambiados for termino in terminos_por_objeto[objeto_id]
+            ],
+            batch_size=TAMANO_LOTE,
+        )
+    return True
+
+
+def indexar_usuarios(usuario_ids):
+    usuario_ids = list(usuario_ids)
+    cambio = False
+    for inicio in range(0, len(usuario_ids), TAMANO_LOTE):
+        lote = usuario_ids[inicio:inicio + TAMANO_LOTE]
+        # Los que ya no existen quedan con un conjunto vacío y se borran
+        terminos = {usuario_id: set() for usuario_id in lote}
+        for usuario_id, *datos in User.objects.filter(pk__in=lote).values_list(
+            'id', 'username', 'first_name', 'last_name', 'email'
+        ):
+            terminos[usuario_id] = terminos_usuario(*datos)
+        cambio = _reemplazar(TerminoBusqueda.TIPO_USUARIO, terminos) or cambio
+    return cambio
+
+
+def indexar_apartamentos(apartamento_ids):
+    apartamento_ids = list(apartamento_ids)
+    cambio = False
+    for inicio in range(0, len(apartamento_ids), TAMANO_LOTE):
+        lote = apartamento_ids[inicio:inicio + TAMANO_LOTE]
+        terminos = {apartamento_id: set() for apartamento_id in lote}
+        for apartamento_id, numero in Apartamento.objects.filter(pk__in=lote).values_list(
+            'apartamentoID', 'numeroApartamento'
+        ):
+            terminos[apartamento_id] = terminos_apartamento(numero)
+        cambio = _reemplazar(TerminoBusqueda.TIPO_APARTAMENTO, terminos) or cambio
+    return cambio
+
+
+def reconstruir():
+    """
+    Vuelve a armar todo el índice. Devuelve (usuarios, apartamentos).
+    """
+    with transaction.atomic():
+        TerminoBusqueda.objects.all().delete()
+        usuarios = list(User.objects.values_list('id', flat=True))
+        apartamentos = list(Apartamento.objects.values_list('apartamentoID', flat=True))
+        indexar_usuarios(usuarios)
+        indexar_apartamentos(apartamentos)
+    return len(usuarios), len(apartamentos)
+
+
+# ---------------------------------------------------------------------------
+# Consultas
+# ---------------------------------------------------------------------------
+
+def _palabras_consulta(texto):
+    # Las más largas primero: son las más selectivas
+    return sorted(palabras(texto), key=len, reverse=True)[:MAXIMO_PALABRAS]
+
+
+def _ids(tipo, palabra):
+    # Subconsulta: la base de datos la resuelve con el índice, sin traer los ids
+    return TerminoBusqueda.objects.filter(tipo=tipo, termino__startswith=palabra).values('objeto_id')
+
+
+def filtro_usuarios(texto, campo='id'):
+    filtro = Q()
+    for palabra in _palabras_consulta(texto):
+        filtro &= Q(**{f'{campo}__in': _ids(TerminoBusqueda.TIPO_USUARIO, palabra)})
+    return filtro
+
+
+def filtro_apartamentos(texto, campo='apartamentoID'):
+    filtro = Q()
+    for palabra in _palabras_consulta(texto):
+        filtro &= Q(**{f'{campo}__in': _ids(TerminoBusqueda.TIPO_APARTAMENTO, palabra)})
+    return filtro
+
+
+def filtro(texto):
+    """
+    Q para Comprobante o PropietarioApartamento (los dos tienen copropietario
+    y apartamento): cada palabra coincide con uno o con el otro.
+    """
+    resultado = Q()
+    for palabra in _palabras_consulta(texto):
+        resultado &= (
+            Q(copropietario_id__in=_ids(TerminoBusqueda.TIPO_USUARIO, palabra))
+            | Q(apartamento_id__in=_ids(TerminoBusqueda.TIPO_APARTAMENTO, palabra))
+        )
+    return resultado
+
+
+def texto_normalizado(texto):
+    # Misma búsqueda -> mismo texto (para las llaves de caché de los conteos)
+    return ' '.join(sorted(_palabras_consulta(texto)))
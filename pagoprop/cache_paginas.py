@@ -0,0 +1,125 @@
+# pagoprop/cache_paginas.py
+
+import hashlib
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db import transaction
+
+from .cache_versiones import incrementar_version, obtener_version
+from .models import Comprobante, PropietarioApartamento
+
+
+# Fragmentos de las páginas de cada copropietario (mis apartamentos, detalle
+# de un apartamento, mis comprobantes) guardados ya renderizados. La llave
+# lleva una versión por usuario que las señales suben cuando cambia algo que
+# esas páginas muestran: nunca se sirve un fragmento viejo y el TTL
+# (PAGINA_CACHE_SEGUNDOS) es solo para que no queden para siempre.
+# Se usan desde los templates con {% cache_usuario %} (templatetags/cache_usuario.py).
+
+PREFIJO = 'pagoprop:pagina:'
+
+# Los que usan los templates (para el reporte de aciertos y fallos)
+FRAGMENTOS = ('mis_apartamentos', 'detalle_apartamento', 'mis_comprobantes')
+
+
+def _version(usuario_id):
+    return f'usuario:{usuario_id}'
+
+
+def version_usuario(usuario_id):
+    # Cambia con cualquier cosa que muestren sus páginas (también la usa api.py)
+    return obtener_version(_version(usuario_id))
+
+
+# ---------------------------------------------------------------------------
+# Invalidación (señales y operaciones masivas)
+# ---------------------------------------------------------------------------
+
+def invalidar_usuarios(usuario_ids):
+    # Después del commit: antes, otro request podría volver a guardar los datos viejos
+    ids = {usuario_id for usuario_id in usuario_ids if usuario_id}
+
+    def incrementar():
+        for usuario_id in ids:
+            incrementar_version(_version(usuario_id))
+
+    if ids:
+        transaction.on_commit(incrementar)
+
+
+def invalidar_propietarios(apartamento_ids):
+    # Todos los copropietarios de esos apartamentos (el detalle lista a los demás)
+    invalidar_usuarios(
+        PropietarioApartamento.objects.filter(apartamento_id__in=apartamento_ids)
+        .values_list('copropietario_id', flat=True)
+    )
+
+
+def invalidar_por_archivo(ruta):
+    # Cambios hechos con update() (vistas previas, normalización): no hay señales
+    invalidar_usuarios(
+        Comprobante.objects.filter(archivo=ruta).values_list('copropietario_id', flat=True).distinct()
+    )
+
+
+# ---------------------------------------------------------------------------
+# Lectura y escritura
+# ---------------------------------------------------------------------------
+
+def _contar(nombre, tipo):
+    llave = f'{PREFIJO}{tipo}:{nombre}'
+    try:
+        cache.incr(llave)
+    except ValueError:
+        # add() por si otro request la creó entre medio
+        if not cache.add(llave, 1, timeout=None):
+            cache.incr(llave)
+
+
+def _llave(usuario_id, nombre, partes):
+    huella = hashlib.md5(
+        '|'.join(str(parte) for parte in partes).encode(), usedforsecurity=False
+    ).hexdigest()
+    return f'{PREFIJO}{usuario_id}:{version_usuario(usuario_id)}:{nombre}:{huella}'
+
+
+def fragmento(usuario_id, nombre, partes, renderizar):
+    """
+    El fragmento `nombre` del usuario para esas `partes` (apartamento,
+    parámetros de la URL...). Si no está en caché se llama a renderizar()
+    y se guarda.
+    """
+    llave = _llave(usuario_id, nombre, partes)
+    html = cache.get(llave)
+    if html is not None:
+        _contar(nombre, 'aciertos')
+        return html
+    _contar(nombre, 'fallos')
+    html = renderizar()
+    cache.set(llave, html, timeout=settings.PAGINA_CACHE_SEGUNDOS)
+    return html
+
+
+def estadisticas(nombres=FRAGMENTOS):
+    """
+    {nombre: {'aciertos', 'fallos', 'tasa'}} desde que se reiniciaron los
+    contadores. Con LocMemCache son los de un solo proceso.
+    """
+    llaves = [f'{PREFIJO}{tipo}:{nombre}' for nombre in nombres for tipo in ('aciertos', 'fallos')]
+    valores = cache.get_many(llaves)
+    resultado = {}
+    for nombre in nombres:
+        aciertos = valores.get(f'{PREFIJO}aciertos:{nombre}', 0)
+        fallos = valores.get(f'{PREFIJO}fallos:{nombre}', 0)
+        total = aciertos + fallos
+        resultado[nombre] = {
+            'aciertos': aciertos,
+            'fallos': fallos,
+            'tasa': aciertos / total if total else None,
+        }
+    return resultado
+
+
+def reiniciar_estadisticas(nombres=FRAGMENTOS):
+    cache.delete_many([f'{PREFIJO}{tipo}:{nombre}' for nombre in nombres for tipo in ('aciertos', 'fallos')])
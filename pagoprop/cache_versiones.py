@@ -0,0 +1,43 @@
+# pagoprop/cache_versiones.py
+
+import time
+
+from django.core.cache import cache
+
+
+# Las versiones no expiran, pero la caché las puede desalojar. Si se pierden
+# no se vuelve a empezar en 1: las entradas guardadas con esa versión podrían
+# seguir en la caché y volverían a usarse (por ejemplo, una membresía ya
+# quitada). Se arranca en time.time_ns(), que siempre es mayor que cualquier
+# versión anterior.
+PREFIJO = 'pagoprop:version:'
+
+
+def _semilla():
+    return time.time_ns()
+
+
+def obtener_version(nombre):
+    llave = PREFIJO + nombre
+    version = cache.get(llave)
+    if version is None:
+        semilla = _semilla()
+        cache.add(llave, semilla, timeout=None)
+        version = cache.get(llave, semilla)
+    return version
+
+
+def incrementar_version(nombre):
+    """
+    Invalida todo lo guardado bajo esa versión. Las llaves de caché llevan
+    el número de versión, así que basta con cambiarlo.
+    """
+    llave = PREFIJO + nombre
+    try:
+        return cache.incr(llave)
+    except ValueError:
+        # La llave no existía (o se desalojó): una semilla nueva, mayor que
+        # cualquier versión usada antes
+        semilla = _semilla()
+        cache.set(llave, semilla, timeout=None)
+        return semilla
@@ -0,0 +1,485 @@
+# pagoprop/conciliacion.py
+
+import bisect
+import codecs
+import csv
+import hashlib
+import re
+from collections import Counter, namedtuple
+from datetime import date, datetime, timedelta
+from decimal import Decimal, InvalidOperation
+
+from django.conf import settings
+from django.db import connection, transaction
+from django.db.models import Count
+from django.utils import timezone
+
+from .busqueda import normalizar
+from .filtros import inicio_del_dia
+from .models import Comprobante, ExtractoBancario, MovimientoBancario
+
+
+# Conciliación de extractos bancarios con los comprobantes subidos.
+#
+# 1. importar_extracto() lee el CSV o XLSX (sin cargarlo entero: csv por
+#    líneas, openpyxl en modo read_only) y guarda las consignaciones como
+#    MovimientoBancario.
+# 2. conciliar() busca para cada movimiento los comprobantes con el mismo
+#    monto y una fecha dentro de ±tolerancia_dias. Los comprobantes se
+#    agrupan por monto y se ordenan por fecha, así cada búsqueda es un
+#    bisect (O(log n)) y no un recorrido de todos contra todos.
+#    Un movimiento queda conciliado si tiene un solo candidato y ese
+#    comprobante no es candidato de ningún otro movimiento; se repite
+#    quitando los ya conciliados hasta que no cambie nada. Lo que queda con
+#    varios candidatos es ambiguo y lo decide una persona.
+# 3. Lo conciliado queda guardado: volver a correr conciliar() solo mira los
+#    movimientos abiertos y los comprobantes que no se han conciliado
+#    (por ejemplo, los que se subieron después).
+
+TAMANO_LOTE = 2000
+
+# Cuántas filas con error se guardan para mostrar
+MAXIMO_ERRORES = 50
+
+COLUMNAS = {
+    'fecha': ('fecha', 'fecha movimiento', 'fecha transaccion', 'fecha operacion', 'date'),
+    'monto': ('monto', 'valor', 'importe', 'credito', 'creditos', 'abono', 'abonos', 'consignacion', 'amount'),
+    'descripcion': ('descripcion', 'concepto', 'detalle', 'transaccion', 'description'),
+    'referencia': ('referencia', 'ref', 'documento', 'numero documento', 'comprobante', 'reference'),
+}
+
+FORMATOS_FECHA = ('%Y-%m-%d', '%d/%m/%Y', '%d-%m-%Y', '%Y/%m/%d', '%d/%m/%y', '%Y%m%d')
+
+# Lo que cabe en MovimientoBancario.monto
+_campo_monto = MovimientoBancario._meta.get_field('monto')
+MONTO_MAXIMO = Decimal(10) ** (_campo_monto.max_digits - _campo_monto.decimal_places)
+
+Lectura = namedtuple('Lectura', ['movimientos', 'omitidos', 'errores'])
+
+
+class ErrorExtracto(Exception):
+    pass
+
+
+# ---------------------------------------------------------------------------
+# Lectura del archivo
+# ---------------------------------------------------------------------------
+
+def _normalizar(texto):
+    # Sin tildes igual que la búsqueda: 'Descripción' -> 'descripcion'
+    return re.sub(r'\s+', ' ', normalizar(texto).replace('_', ' ').replace('.', '')).strip()
+
+
+def _columnas(encabezado):
+    """
+    {'fecha': i, 'monto': i, ...} si la fila parece un encabezado con al
+    menos fecha y monto; None si no.
+    """
+    nombres = [_normalizar(celda) for celda in encabezado]
+    indices = {}
+    for clave, alias in COLUMNAS.items():
+        for alias_columna in alias:
+            if alias_columna in nombres:
+                indices[clave] = nombres.index(alias_columna)
+                break
+    if 'fecha' in indices and 'monto' in indices:
+        return indices
+    return None
+
+
+def leer_fecha(valor):
+    if isinstance(valor, datetime):
+        return valor.date()
+    if isinstance(valor, date):
+        return valor
+    texto = str(valor or '').strip()[:10]
+    for formato in FORMATOS_FECHA:
+        try:
+            return datetime.strptime(texto, formato).date()
+        except ValueError:
+            continue
+    return None
+
+
+def leer_monto(valor):
+    """
+    Decimal a partir de 1200000, '1.200.000', '1.200.000,50',
+    '1,200,000.50' o '$ 1.200.000'. None si no es un número.
+    """
+    if isinstance(valor, (int, float, Decimal)) and not isinstance(valor, bool):
+        return Decimal(str(valor)).quantize(Decimal('0.01'))
+    texto = re.sub(r'[^\d,.\-]', '', str(valor or ''))
+    if not texto:
+        return None
+    # El último separador que aparece es el decimal si le siguen 1 o 2 dígitos
+    coma, punto = texto.rfind(','), texto.rfind('.')
+    decimal = max(coma, punto)
+    if decimal != -1 and len(texto) - decimal - 1 in (1, 2):
+        entero, fraccion = texto[:decimal], texto[decimal + 1:]
+        texto = re.sub(r'[,.]', '', entero) + '.' + fraccion
+    else:
+        texto = re.sub(r'[,.]', '', texto)
+    try:
+        return Decimal(texto).quantize(Decimal('0.01'))
+    except InvalidOperation:
+        return None
+
+
+DELIMITADORES = (';', ',', '\t')
+
+
+def _lineas(archivo):
+    """
+    Las líneas del CSV como texto: UTF-8 (con o sin BOM) mientras se pueda
+    y, desde la primera línea que no lo sea, cp1252, que es como exportan
+    la mayoría de los bancos ('Crédito', 'Descripción').
+    """
+    codificacion = 'utf-8'
+    for numero, linea in enumerate(archivo):
+        if numero == 0 and linea.startswith(codecs.BOM_UTF8):
+            linea = linea[len(codecs.BOM_UTF8):]
+        if codificacion == 'utf-8':
+            try:
+                yield linea.decode('utf-8')
+                continue
+            except UnicodeDecodeError:
+                codificacion = 'cp1252'
+        yield linea.decode('cp1252', errors='replace')
+
+
+def _filas_csv(archivo):
+    """
+    El separador se toma de la línea del encabezado: csv.Sniffer falla con
+    las líneas de la cuenta (banco, número) que traen arriba muchos extractos.
+    Las líneas anteriores al encabezado salen como una sola celda.
+    """
+    lineas = _lineas(archivo)
+    for linea in lineas:
+        for delimitador in DELIMITADORES:
+            fila = next(csv.reader([linea], delimiter=delimitador), [])
+            if _columnas(fila) is not None:
+                yield fila
+                yield from csv.reader(lineas, delimiter=delimitador)
+                return
+        yield [linea.strip()]
+
+
+def _filas_xlsx(archivo):
+    from openpyxl import load_workbook
+
+    libro = load_workbook(archivo, read_only=True, data_only=True)
+    try:
+        yield from libro.worksheets[0].iter_rows(values_only=True)
+    finally:
+        libro.close()
+
+
+def _es_xlsx(archivo, nombre):
+    inicio = archivo.read(4)
+    archivo.seek(0)
+    return nombre.lower().endswith('.xlsx') or inicio == b'PK\x03\x04'
+
+
+def leer_extracto(archivo, nombre):
+    """
+    Lee las consignaciones (montos positivos) del archivo. Las filas antes
+    del encabezado (logo, datos de la cuenta...) se saltan. Devuelve una
+    Lectura con los MovimientoBancario sin guardar, cuántas filas se
+    omitieron (débitos, totales) y las filas con error (máximo MAXIMO_ERRORES).
+    """
+    filas = _filas_xlsx(archivo) if _es_xlsx(archivo, nombre) else _filas_csv(archivo)
+    columnas = None
+    movimientos = []
+    omitidos = 0
+    errores = []
+
+    for linea, fila in enumerate(filas, start=1):
+        fila = list(fila)
+        if not any(celda not in (None, '') for celda in fila):
+            continue
+        if columnas is None:
+            columnas = _columnas(fila)
+            continue
+
+        def celda(clave):
+            indice = columnas.get(clave)
+            return fila[indice] if indice is not None and indice < len(fila) else None
+
+        if celda('monto') in (None, ''):
+            # Con columnas separadas de débito y crédito, los débitos no traen crédito
+            omitidos += 1
+            continue
+        fecha = leer_fecha(celda('fecha'))
+        monto = leer_monto(celda('monto'))
+        if fecha is None or monto is None:
+            # Totales y notas al pie del extracto no traen fecha o monto
+            if len(errores) < MAXIMO_ERRORES:
+                errores.append((linea, 'Fecha o monto no válidos.'))
+            continue
+        if abs(monto) >= MONTO_MAXIMO:
+            if len(errores) < MAXIMO_ERRORES:
+                errores.append((linea, 'Monto demasiado grande.'))
+            continue
+        if monto <= 0:
+            omitidos += 1
+            continue
+        movimientos.append(MovimientoBancario(
+            linea=linea,
+            fecha=fecha,
+            monto=monto,
+            descripcion=str(celda('descripcion') or '').strip()[:255],
+            referencia=str(celda('referencia') or '').strip()[:100],
+        ))
+
+    if columnas is None:
+        raise ErrorExtracto('No se encontró el encabezado: se necesitan al menos las columnas fecha y monto (o valor).')
+    return Lectura(movimientos, omitidos, errores)
+
+
+def _huella(archivo):
+    sha = hashlib.sha256()
+    for bloque in iter(lambda: archivo.read(1024 * 1024), b''):
+        sha.update(bloque)
+    archivo.seek(0)
+    return sha.hexdigest()
+
+
+def importar_extracto(archivo, nombre, usuario=None, tolerancia_dias=None):
+    """
+    Guarda el extracto y sus movimientos y lo concilia. Si ese mismo archivo
+    ya se había importado solo se vuelve a conciliar (incremental).
+    Devuelve (extracto, lectura o None, resultado de conciliar()).
+    """
+    if tolerancia_dias is None:
+        tolerancia_dias = settings.CONCILIACION_TOLERANCIA_DIAS
+    sha256 = _huella(archivo)
+    extracto = ExtractoBancario.objects.filter(sha256=sha256).first()
+    if extracto is not None:
+        return extracto, None, conciliar(extracto, tolerancia_dias)
+
+    lectura = leer_extracto(archivo, nombre)
+    if not lectura.movimientos:
+        raise ErrorExtracto('El archivo no tiene consignaciones (montos positivos con fecha).')
+
+    fechas = [movimiento.fecha for movimiento in lectura.movimientos]
+    with transaction.atomic():
+        extracto = ExtractoBancario.objects.create(
+            nombre_archivo=nombre[:255],
+            sha256=sha256,
+            subido_por=usuario,
+            fecha_desde=min(fechas),
+            fecha_hasta=max(fechas),
+            total_movimientos=len(lectura.movimientos),
+            tolerancia_dias=tolerancia_dias,
+        )
+        for movimiento in lectura.movimientos:
+            movimiento.extracto = extracto
+        MovimientoBancario.objects.bulk_create(lectura.movimientos, batch_size=TAMANO_LOTE)
+    return extracto, lectura, conciliar(extracto, tolerancia_dias)
+
+
+# ---------------------------------------------------------------------------
+# Conciliación
+# ---------------------------------------------------------------------------
+
+def _indice_comprobantes(desde, hasta):
+    """
+    {monto: [(día, comprobanteID), ...] ordenada} con los comprobantes sin
+    conciliar creados entre esas fechas. Usa el índice (fecha_creacion, monto).
+    """
+    indice = {}
+    comprobantes = Comprobante.objects.filter(
+        fecha_creacion__gte=inicio_del_dia(desde),
+        fecha_creacion__lt=inicio_del_dia(hasta + timedelta(days=1)),
+        movimiento_bancario__isnull=True,
+    ).values_list('comprobanteID', 'monto', 'fecha_creacion')
+    for comprobante_id, monto, fecha in comprobantes.iterator(chunk_size=TAMANO_LOTE):
+        dia = timezone.localtime(fecha).date().toordinal()
+        indice.setdefault(monto, []).append((dia, comprobante_id))
+    for lista in indice.values():
+        lista.sort()
+    return indice
+
+
+def emparejar(movimientos, indice, tolerancia_dias):
+    """
+    movimientos: [(movimientoID, fecha, monto)]. Devuelve
+    ({movimientoID: comprobanteID}, {movimientoID: [candidatos]}) con los
+    conciliados y los ambiguos; los demás no tienen candidatos.
+    """
+    candidatos = {}
+    for movimiento_id, fecha, monto in movimientos:
+        lista = indice.get(monto)
+        if not lista:
+            continue
+        dia = fecha.toordinal()
+        inicio = bisect.bisect_left(lista, (dia - tolerancia_dias, -1))
+        fin = bisect.bisect_right(lista, (dia + tolerancia_dias, float('inf')))
+        if inicio < fin:
+            candidatos[movimiento_id] = {comprobante_id for _, comprobante_id in lista[inicio:fin]}
+
+    conciliados = {}
+    cambio = True
+    while cambio:
+        cambio = False
+        reclamos = Counter(comprobante_id for posibles in candidatos.values() for comprobante_id in posibles)
+        for movimiento_id, posibles in list(candidatos.items()):
+            if len(posibles) == 1:
+                comprobante_id = next(iter(posibles))
+                if reclamos[comprobante_id] == 1:
+                    conciliados[movimiento_id] = comprobante_id
+                    del candidatos[movimiento_id]
+                    cambio = True
+        if cambio:
+            usados = set(conciliados.values())
+            for movimiento_id in list(candidatos):
+                candidatos[movimiento_id] -= usados
+                if not candidatos[movimiento_id]:
+                    del candidatos[movimiento_id]
+    return conciliados, {movimiento_id: sorted(posibles) for movimiento_id, posibles in candidatos.items()}
+
+
+def _guardar(cambios):
+    """
+    Un UPDATE por movimiento con executemany: bulk_update arma un CASE con
+    todas las filas del lote, que con decenas de miles tarda mucho más.
+    """
+    meta = MovimientoBancario._meta
+    q = connection.ops.quote_name
+    campo_candidatos = meta.get_field('candidatos')
+    sql = (
+        f"UPDATE {q(meta.db_table)} SET "
+        f"{q(meta.get_field('estado').column)} = %s, "
+        f"{q(meta.get_field('comprobante').column)} = %s, "
+        f"{q(campo_candidatos.column)} = %s "
+        f"WHERE {q(meta.pk.column)} = %s"
+    )
+    with connection.cursor() as cursor:
+        for inicio in range(0, len(cambios), TAMANO_LOTE):
+            cursor.executemany(sql, [
+                (estado, comprobante_id, campo_candidatos.get_db_prep_save(candidatos, connection), movimiento_id)
+                for estado, comprobante_id, candidatos, movimiento_id in cambios[inicio:inicio + TAMANO_LOTE]
+            ])
+
+
+def conciliar(extracto, tolerancia_dias=None, rehacer=False):
+    """
+    Concilia los movimientos abiertos del extracto (todos si rehacer=True).
+    Devuelve {estado: cantidad} de los movimientos revisados.
+    """
+    if tolerancia_dias is None:
+        tolerancia_dias = extracto.tolerancia_dias
+
+    with transaction.atomic():
+        # Una conciliación a la vez por extracto
+        ExtractoBancario.objects.select_for_update().filter(pk=extracto.pk).first()
+        movimientos = extracto.movimientos.all()
+        if rehacer:
+            movimientos.update(estado=MovimientoBancario.ESTADO_PENDIENTE, comprobante=None, candidatos=[])
+        # Los conciliados cuyo comprobante se borró también vuelven a revisarse
+        abiertos = list(
+            movimientos.exclude(estado=MovimientoBancario.ESTADO_CONCILIADO, comprobante__isnull=False)
+            .values_list('movimientoID', 'fecha', 'monto')
+        )
+        resultado = Counter()
+        if abiertos:
+            desde = min(fecha for _, fecha, _ in abiertos) - timedelta(days=tolerancia_dias)
+            hasta = max(fecha for _, fecha, _ in abiertos) + timedelta(days=tolerancia_dias)
+            conciliados, ambiguos = emparejar(abiertos, _indice_comprobantes(desde, hasta), tolerancia_dias)
+
+            cambios = []
+            for movimiento_id, _, _ in abiertos:
+                if movimiento_id in conciliados:
+                    estado, comprobante_id, candidatos = MovimientoBancario.ESTADO_CONCILIADO, conciliados[movimiento_id], []
+                elif movimiento_id in ambiguos:
+                    estado, comprobante_id, candidatos = MovimientoBancario.ESTADO_AMBIGUO, None, ambiguos[movimiento_id]
+                else:
+                    estado, comprobante_id, candidatos = MovimientoBancario.ESTADO_SIN_COINCIDENCIA, None, []
+                resultado[estado] += 1
+                cambios.append((estado, comprobante_id, candidatos, movimiento_id))
+            _guardar(cambios)
+
+        ExtractoBancario.objects.filter(pk=extracto.pk).update(
+            tolerancia_dias=tolerancia_dias, fecha_conciliacion=timezone.now()
+        )
+    extracto.refresh_from_db()
+    return resultado
+
+
+def conciliar_manual(movimiento, comprobante):
+    """
+    Resuelve un movimiento ambiguo (o sin coincidencia) a mano. Lanza
+    ErrorExtracto si el comprobante ya está conciliado con otro movimiento.
+    """
+    with transaction.atomic():
+        ocupado = MovimientoBancario.objects.select_for_update().filter(
+            comprobante=comprobante
+        ).exclude(pk=movimiento.pk).first()
+        if ocupado is not None:
+            raise ErrorExtracto(f'El comprobante ya está conciliado con la línea {ocupado.linea} del extracto {ocupado.extracto_id}.')
+        movimiento.estado = MovimientoBancario.ESTADO_CONCILIADO
+        movimiento.comprobante = comprobante
+        movimiento.candidatos = []
+        movimiento.save(update_fields=['estado', 'comprobante', 'candidatos'])
+
+
+# ---------------------------------------------------------------------------
+# Reporte
+# ---------------------------------------------------------------------------
+
+def reporte(extracto, limite=100):
+    """
+    Totales y primeros `limite` elementos de cada grupo, de los dos lados:
+    movimientos (conciliados, ambiguos, sin coincidencia) y comprobantes
+    del periodo del extracto (conciliados, ambiguos, sin coincidencia).
+    """
+    movimientos = extracto.movimientos.all()
+    por_estado = Counter(dict(
+        movimientos.order_by().values_list('estado').annotate(total=Count('movimientoID'))
+    ))
+
+    ambiguos = list(
+        movimientos.filter(estado=MovimientoBancario.ESTADO_AMBIGUO)[:limite]
+    )
+    ids_candidatos = {comprobante_id for movimiento in ambiguos for comprobante_id in movimiento.candidatos}
+    comprobantes_candidatos = Comprobante.objects.select_related('copropietario', 'apartamento').in_bulk(ids_candidatos)
+    for movimiento in ambiguos:
+        movimiento.comprobantes_candidatos = [
+            comprobantes_candidatos[comprobante_id]
+            for comprobante_id in movimiento.candidatos if comprobante_id in comprobantes_candidatos
+        ]
+
+    # Lado de los comprobantes: los del periodo del extracto (con la tolerancia)
+    desde = extracto.fecha_desde - timedelta(days=extracto.tolerancia_dias)
+    hasta = extracto.fecha_hasta + timedelta(days=extracto.tolerancia_dias)
+    del_periodo = Comprobante.objects.filter(
+        fecha_creacion__gte=inicio_del_dia(desde),
+        fecha_creacion__lt=inicio_del_dia(hasta + timedelta(days=1)),
+    )
+    todos_candidatos = set()
+    for candidatos in movimientos.filter(estado=MovimientoBancario.ESTADO_AMBIGUO).values_list('candidatos', flat=True):
+        todos_candidatos.update(candidatos)
+    sin_conciliar = del_periodo.filter(movimiento_bancario__isnull=True)
+    comprobantes_sin_coincidencia = sin_conciliar.exclude(comprobanteID__in=todos_candidatos)
+
+    return {
+        'movimientos': {
+            'conciliados': por_estado[MovimientoBancario.ESTADO_CONCILIADO],
+            'ambiguos': por_estado[MovimientoBancario.ESTADO_AMBIGUO],
+            'sin_coincidencia': por_estado[MovimientoBancario.ESTADO_SIN_COINCIDENCIA],
+            'pendientes': por_estado[MovimientoBancario.ESTADO_PENDIENTE],
+        },
+        'comprobantes': {
+            'conciliados': movimientos.filter(comprobante__isnull=False).count(),
+            'ambiguos': sin_conciliar.filter(comprobanteID__in=todos_candidatos).count(),
+            'sin_coincidencia': comprobantes_sin_coincidencia.count(),
+        },
+        'lista_ambiguos': ambiguos,
+        'lista_movimientos_sin_coincidencia': list(
+            movimientos.filter(estado=MovimientoBancario.ESTADO_SIN_COINCIDENCIA)[:limite]
+        ),
+        'lista_comprobantes_sin_coincidencia': list(
+            comprobantes_sin_coincidencia.select_related('copropietario', 'apartamento')
+            .order_by('fecha_creacion')[:limite]
+        ),
+    }
@@ -0,0 +1,191 @@
+# pagoprop/contadores.py
+
+from django.db import IntegrityError, transaction
+from django.db.models import Count, DecimalField, F, Max, Sum, Value
+from django.db.models.functions import Coalesce, Greatest
+
+from .models import Comprobante, EstadisticasUsuario, PropietarioApartamento, ResumenMensual
+
+
+def _calcular_usuario(usuario_id):
+    """
+    Valores exactos de un usuario. Los comprobantes salen del resumen
+    mensual y la última fecha del índice (copropietario, fecha_creacion).
+    """
+    comprobantes = ResumenMensual.objects.filter(copropietario_id=usuario_id).aggregate(
+        total_comprobantes=Sum('cantidad'),
+        total_pagado=Sum('total'),
+    )
+    return {
+        'total_apartamentos': PropietarioApartamento.objects.filter(copropietario_id=usuario_id).count(),
+        'total_comprobantes': comprobantes['total_comprobantes'] or 0,
+        'total_pagado': comprobantes['total_pagado'] or 0,
+        'ultimo_comprobante': Comprobante.objects.filter(
+            copropietario_id=usuario_id
+        ).aggregate(ultimo=Max('fecha_creacion'))['ultimo'],
+    }
+
+
+def recalcular_usuario(usuario_id, crear=False):
+    """
+    Recalcula la fila de un usuario. Solo se crea si `crear` es True: al
+    borrar en cascada el usuario puede estar desapareciendo.
+    """
+    datos = _calcular_usuario(usuario_id)
+    if EstadisticasUsuario.objects.filter(copropietario_id=usuario_id).update(**datos) or not crear:
+        return
+    try:
+        with transaction.atomic():
+            EstadisticasUsuario.objects.create(copropietario_id=usuario_id, **datos)
+    except IntegrityError:
+        # Otro request la creó al mismo tiempo
+        EstadisticasUsuario.objects.filter(copropietario_id=usuario_id).update(**datos)
+
+
+def _sumar(usuario_id, cantidad, total, ultimo):
+    # Comprobantes nuevos: un UPDATE con F(), sin leer los demás
+    monto = Value(total, output_field=DecimalField(max_digits=14, decimal_places=2))
+    actualizadas = EstadisticasUsuario.objects.filter(copropietario_id=usuario_id).update(
+        total_comprobantes=F('total_comprobantes') + cantidad,
+        total_pagado=F('total_pagado') + monto,
+        ultimo_comprobante=Greatest(
+            Coalesce('ultimo_comprobante', Value(ultimo)),
+            Value(ultimo)
+        ),
+    )
+    if not actualizadas:
+        recalcular_usuario(usuario_id, crear=True)
+
+
+def sumar_comprobante(comprobante):
+    _sumar(comprobante.copropietario_id, 1, comprobante.monto, comprobante.fecha_creacion)
+
+
+def sumar_lote(comprobantes):
+    # Comprobantes creados con bulk_create (sin señales): una operación por usuario
+    grupos = {}
+    for comprobante in comprobantes:
+        datos = grupos.setdefault(comprobante.copropietario_id, [0, 0, comprobante.fecha_creacion])
+        datos[0] += 1
+        datos[1] += comprobante.monto
+        datos[2] = max(datos[2], comprobante.fecha_creacion)
+    for usuario_id, (cantidad, total, ultimo) in grupos.items():
+        _sumar(usuario_id, cantidad, total, ultimo)
+
+
+def comprobante_guardado(comprobante, created, anterior):
+    if created or anterior is None:
+        sumar_comprobante(comprobante)
+        return
+
+    if anterior['copropietario_id'] != comprobante.copropietario_id:
+        recalcular_usuario(anterior['copropietario_id'])
+        recalcular_usuario(comprobante.copropietario_id, crear=True)
+    elif anterior['monto'] != comprobante.monto:
+        recalcular_usuario(comprobante.copropietario_id, crear=True)
+
+
+def comprobante_eliminado(comprobante):
+    recalcular_usuario(comprobante.copropietario_id)
+
+
+def asignacion_cambiada(asignacion, anterior_id=None, eliminada=False):
+    # El conteo de apartamentos se recalcula (un COUNT sobre un índice)
+    recalcular_usuario(asignacion.copropietario_id, crear=not eliminada)
+    if anterior_id and anterior_id != asignacion.copropietario_id:
+        recalcular_usuario(anterior_id)
+
+
+def recalcular_apartamentos(usuario_ids):
+    """
+    Asignaciones creadas con bulk_create (sin señales): un COUNT agrupado
+    para todos y un UPDATE por cada valor distinto, no uno por usuario.
+    """
+    por_conteo = {}
+    conteos = (
+        PropietarioApartamento.objects.filter(copropietario_id__in=usuario_ids)
+        .order_by().values('copropietario_id').annotate(n=Count('pk'))
+    )
+    for fila in conteos:
+        por_conteo.setdefault(fila['n'], []).append(fila['copropietario_id'])
+
+    con_fila = set(
+        EstadisticasUsuario.objects.filter(copropietario_id__in=usuario_ids).values_list('copropietario_id', flat=True)
+    )
+    for cantidad, ids in por_conteo.items():
+        EstadisticasUsuario.objects.filter(copropietario_id__in=ids).update(total_apartamentos=cantidad)
+    for usuario_id in set(usuario_ids) - con_fila:
+        recalcular_usuario(usuario_id, crear=True)
+
+
+def estadisticas_usuario(usuario):
+    """
+    Contadores del dashboard con una sola búsqueda por llave primaria.
+    Si el usuario todavía no tiene fila se calcula y se crea.
+    """
+    try:
+        return EstadisticasUsuario.objects.get(copropietario_id=usuario.pk)
+    except EstadisticasUsuario.DoesNotExist:
+        recalcular_usuario(usuario.pk, crear=True)
+        return EstadisticasUsuario.objects.get(copropietario_id=usuario.pk)
+
+
+# ---------------------------------------------------------------------------
+# Reconciliación (comando reconciliar_estadisticas)
+# ---------------------------------------------------------------------------
+
+VACIO = {'total_apartamentos': 0, 'total_comprobantes': 0, 'total_pagado': 0, 'ultimo_comprobante': None}
+
+
+def calcular_todos():
+    """
+    Valores exactos de todos los usuarios con consultas agrupadas, sin una
+    consulta por usuario. Devuelve {usuario_id: datos}.
+    """
+    resultado = {}
+
+    for fila in PropietarioApartamento.objects.order_by().values('copropietario_id').annotate(n=Count('pk')):
+        resultado.setdefault(fila['copropietario_id'], dict(VACIO))['total_apartamentos'] = fila['n']
+
+    # Directo de los comprobantes (no del resumen) para no heredar sus errores
+    comprobantes = Comprobante.objects.order_by().values('copropietario_id').annotate(
+        cantidad=Count('pk'), total=Sum('monto'), ultimo=Max('fecha_creacion')
+    )
+    for fila in comprobantes:
+        datos = resultado.setdefault(fila['copropietario_id'], dict(VACIO))
+        datos['total_comprobantes'] = fila['cantidad']
+        datos['total_pagado'] = fila['total']
+        datos['ultimo_comprobante'] = fila['ultimo']
+
+    return resultado
+
+
+def reconciliar(reparar=True):
+    """
+    Compara los contadores guardados con los reales. Si `reparar` es True
+    corrige (o crea) las filas con diferencias.
+    Devuelve la lista de usuario_id con diferencias.
+    """
+    esperado = calcular_todos()
+    campos = ['total_apartamentos', 'total_comprobantes', 'total_pagado', 'ultimo_comprobante']
+    guardado = {
+        fila['copropietario_id']: fila
+        for fila in EstadisticasUsuario.objects.values('copropietario_id', *campos).iterator()
+    }
+
+    diferentes = []
+    for usuario_id in esperado.keys() | guardado.keys():
+        actual = guardado.get(usuario_id)
+        datos = esperado.get(usuario_id, VACIO)
+        if actual is None or any(actual[campo] != datos[campo] for campo in campos):
+            diferentes.append(usuario_id)
+
+    if reparar and diferentes:
+        with transaction.atomic():
+            for usuario_id in diferentes:
+                EstadisticasUsuario.objects.update_or_create(
+                    copropietario_id=usuario_id,
+                    defaults=esperado.get(usuario_id, VACIO)
+                )
+
+    return diferentes
@@ -0,0 +1,73 @@
+# pagoprop/conteos.py
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db import connection, transaction
+
+from .cache_versiones import obtener_version, incrementar_version
+from .filtros import huella_filtros, serializar_filtros
+from .models import Comprobante
+
+
+VERSION_CONTEOS = 'conteos_comprobantes'
+
+
+def invalidar_conteos():
+    # Se llama desde las señales de Comprobante (crear, editar, eliminar).
+    # Otra vez después del commit, igual que invalidar_tablero()
+    incrementar_version(VERSION_CONTEOS)
+    transaction.on_commit(lambda: incrementar_version(VERSION_CONTEOS))
+
+
+def estimar_filas(modelo):
+    """
+    Número aproximado de filas según las estadísticas del motor, sin
+    recorrer la tabla. Devuelve None si el motor no lo soporta.
+    """
+    tabla = modelo._meta.db_table
+    with connection.cursor() as cursor:
+        if connection.vendor == 'mysql':
+            cursor.execute(
+                "SELECT TABLE_ROWS FROM information_schema.TABLES "
+                "WHERE TABLE_SCHEMA = DATABASE() AND TABLE_NAME = %s",
+                [tabla]
+            )
+        elif connection.vendor == 'postgresql':
+            cursor.execute("SELECT reltuples::bigint FROM pg_class WHERE relname = %s", [tabla])
+        else:
+            return None
+        fila = cursor.fetchone()
+    if not fila or fila[0] is None or fila[0] < 0:
+        return None
+    return int(fila[0])
+
+
+def contar_comprobantes(comprobantes, filtro_form, alcance='todos', permitir_estimado=False):
+    """
+    Cuenta los comprobantes filtrados una sola vez y guarda el resultado en
+    caché con una llave que combina el alcance (todos o un usuario), los
+    filtros normalizados y la versión actual de los conteos.
+
+    Con permitir_estimado=True y sin filtros activos, en tablas grandes
+    (más de CONTEO_ESTIMADO_MINIMO filas) se usa el estimado del motor.
+
+    Devuelve {'cantidad': int, 'estimado': bool}.
+    """
+    filtros = serializar_filtros(filtro_form.cleaned_data) if filtro_form.is_valid() else {}
+
+    if permitir_estimado and not filtros:
+        estimado = estimar_filas(Comprobante)
+        if estimado is not None and estimado >= settings.CONTEO_ESTIMADO_MINIMO:
+            return {'cantidad': estimado, 'estimado': True}
+
+    llave = 'pagoprop:conteo:{}:{}:{}'.format(
+        obtener_version(VERSION_CONTEOS),
+        alcance,
+        huella_filtros(filtros)
+    )
+    cantidad = cache.get(llave)
+    if cantidad is None:
+        cantidad = comprobantes.count()
+        cache.set(llave, cantidad, timeout=settings.CONTEO_CACHE_SEGUNDOS)
+
+    return {'cantidad': cantidad, 'estimado': False}
@@ -0,0 +1,176 @@
+# pagoprop/entrega.py
+
+import io
+import mimetypes
+import os
+import re
+from urllib.parse import quote
+
+from django.conf import settings
+from django.http import FileResponse, HttpResponse
+from django.utils.cache import get_conditional_response
+from django.utils.http import http_date, parse_http_date_safe, quote_etag
+
+from .membresias import es_propietario
+
+
+# Bytes: inicio-fin, inicio- o -sufijo (un solo rango)
+RANGO = re.compile(r'^bytes=(\d*)-(\d*)$')
+
+ENVIO_PYTHON = 'python'
+ENVIO_X_ACCEL = 'x-accel'
+ENVIO_X_SENDFILE = 'x-sendfile'
+
+
+def puede_ver_comprobante(usuario, comprobante):
+    """
+    El personal ve todos los comprobantes; los demás, los que subieron y los
+    de los apartamentos de los que son propietarios (PropietarioApartamento).
+    """
+    if usuario.is_staff or comprobante.copropietario_id == usuario.pk:
+        return True
+    return es_propietario(usuario, comprobante.apartamento_id)
+
+
+class _LectorRango:
+    """
+    Archivo limitado a `longitud` bytes desde la posición actual. Expone
+    fileno() para que el servidor WSGI (gunicorn) pueda usar sendfile con
+    el Content-Length de la respuesta en vez de leer por Python.
+    """
+
+    def __init__(self, archivo, longitud):
+        self.archivo = archivo
+        self.pendientes = longitud
+
+    def read(self, tamano=-1):
+        if self.pendientes <= 0:
+            return b''
+        if tamano is None or tamano < 0 or tamano > self.pendientes:
+            tamano = self.pendientes
+        datos = self.archivo.read(tamano)
+        self.pendientes -= len(datos)
+        return datos
+
+    def fileno(self):
+        return self.archivo.fileno()
+
+    def close(self):
+        self.archivo.close()
+
+
+def _leer_rango(encabezado, tamano):
+    """
+    Devuelve (inicio, fin) inclusivos, None si no hay rango válido que
+    aplicar (se responde el archivo completo) o False si no se puede cumplir.
+    """
+    coincidencia = RANGO.match(encabezado.strip()) if encabezado else None
+    if not coincidencia:
+        return None
+    inicio, fin = coincidencia.groups()
+    if not inicio and not fin:
+        return None
+    if not inicio:
+        # Los últimos N bytes
+        sufijo = int(fin)
+        if not sufijo:
+            return False
+        return max(0, tamano - sufijo), tamano - 1
+    inicio = int(inicio)
+    fin = min(int(fin), tamano - 1) if fin else tamano - 1
+    if inicio >= tamano or inicio > fin:
+        return False
+    return inicio, fin
+
+
+def _rango_vigente(request, etag, ultima_modificacion):
+    # If-Range: el rango solo vale si el cliente tiene la misma versión
+    condicion = request.headers.get('If-Range')
+    if not condicion:
+        return True
+    if condicion.startswith(('"', 'W/')):
+        return condicion == etag
+    fecha = parse_http_date_safe(condicion)
+    return fecha is not None and int(ultima_modificacion) <= fecha
+
+
+def _encabezados(nombre, nombre_descarga):
+    content_type = mimetypes.guess_type(nombre)[0] or 'application/octet-stream'
+    disposicion = f'inline; filename="{nombre_descarga or os.path.basename(nombre)}"'
+    return content_type, disposicion
+
+
+def servir_archivo(request, nombre, ruta, nombre_descarga=None):
+    """
+    Entrega un archivo de MEDIA_ROOT ya autorizado. Con MEDIA_ENVIO en
+    'x-accel' (nginx) o 'x-sendfile' (Apache/lighttpd) solo se devuelven
+    encabezados y el servidor web hace la transferencia; si no, se envía
+    desde Python con ETag, Last-Modified, GET condicional y rangos.
+    """
+    content_type, disposicion = _encabezados(nombre, nombre_descarga)
+
+    envio = settings.MEDIA_ENVIO
+    if envio in (ENVIO_X_ACCEL, ENVIO_X_SENDFILE):
+        respuesta = HttpResponse(content_type=content_type)
+        # Codificados: nginx y mod_xsendfile decodifican la URI, y los nombres
+        # viejos pueden traer espacios, '#', '%', '?' o tildes
+        if envio == ENVIO_X_ACCEL:
+            respuesta['X-Accel-Redirect'] = settings.MEDIA_X_ACCEL_PREFIJO.rstrip('/') + '/' + quote(nombre)
+        else:
+            respuesta['X-Sendfile'] = quote(ruta)
+        respuesta['Content-Disposition'] = disposicion
+        respuesta['Cache-Control'] = 'private, max-age=3600'
+        return respuesta
+
+    estado = os.stat(ruta)
+    return _entregar(
+        request, estado.st_size, estado.st_mtime, lambda: open(ruta, 'rb'), content_type, disposicion
+    )
+
+
+def servir_datos(request, nombre, datos, modificado, nombre_descarga=None):
+    """
+    Como servir_archivo, para un contenido que ya está en memoria (un
+    archivo leído de un paquete de ARCHIVO_FRIO_ROOT). Siempre desde Python:
+    el servidor web no ve los archivos dentro de un paquete.
+    """
+    content_type, disposicion = _encabezados(nombre, nombre_descarga)
+    return _entregar(request, len(datos), modificado, lambda: io.BytesIO(datos), content_type, disposicion)
+
+
+def _entregar(request, tamano, ultima_modificacion, abrir, content_type, disposicion):
+    etag = quote_etag(f'{int(ultima_modificacion):x}-{tamano:x}')
+
+    # 304 Not Modified / 412 Precondition Failed
+    condicional = get_conditional_response(request, etag=etag, last_modified=int(ultima_modificacion))
+    if condicional is not None:
+        condicional['Cache-Control'] = 'private, max-age=3600'
+        return condicional
+
+    rango = None
+    if request.method == 'GET' and _rango_vigente(request, etag, ultima_modificacion):
+        rango = _leer_rango(request.headers.get('Range'), tamano)
+
+    if rango is False:
+        respuesta = HttpResponse(status=416)
+        respuesta['Content-Range'] = f'bytes */{tamano}'
+        return respuesta
+
+    archivo = abrir()
+    if rango:
+        inicio, fin = rango
+        archivo.seek(inicio)
+        longitud = fin - inicio + 1
+        respuesta = FileResponse(_LectorRango(archivo, longitud), status=206, content_type=content_type)
+        respuesta['Content-Range'] = f'bytes {inicio}-{fin}/{tamano}'
+    else:
+        longitud = tamano
+        respuesta = FileResponse(archivo, content_type=content_type)
+
+    respuesta['Content-Length'] = str(longitud)
+    respuesta['Content-Disposition'] = disposicion
+    respuesta['Accept-Ranges'] = 'bytes'
+    respuesta['ETag'] = etag
+    respuesta['Last-Modified'] = http_date(ultima_modificacion)
+    respuesta['Cache-Control'] = 'private, max-age=3600'
+    return respuesta
@@ -0,0 +1,279 @@
+# pagoprop/exportacion.py
+
+import logging
+import tempfile
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from datetime import timedelta
+
+from django.conf import settings
+from django.core.files import File
+from django.db import close_old_connections, transaction
+from django.db.models import Max, Q
+from django.db.models.functions import Length
+from django.utils import timezone
+from openpyxl import Workbook
+from openpyxl.cell import WriteOnlyCell
+from openpyxl.styles import Font, Alignment, PatternFill
+from openpyxl.utils import get_column_letter
+
+from .filtros import formulario_filtros, filtrar_comprobantes, huella_filtros
+from .models import Comprobante, ExportacionComprobantes
+
+logger = logging.getLogger(__name__)
+
+
+# Filas que se traen de la base de datos en cada viaje
+TAMANO_LOTE = 2000
+
+ENCABEZADOS = ['ID', 'Copropietario', 'Email', 'Apartamento', 'Monto', 'Fecha']
+
+CONTENT_TYPE_EXCEL = 'application/vnd.openxmlformats-officedocument.spreadsheetml.sheet'
+
+FORMATO_FECHA = '%d/%m/%Y %H:%M'
+
+def _anchos_columnas(comprobantes):
+    """
+    Calcula el ancho de cada columna con una sola consulta de agregados.
+    En modo write-only no se pueden ajustar las columnas después de
+    escribir las filas, así que el ancho se conoce antes de empezar.
+    """
+    maximos = comprobantes.order_by().aggregate(
+        id=Max('comprobanteID'),
+        nombre=Max(Length('copropietario__first_name')),
+        apellido=Max(Length('copropietario__last_name')),
+        email=Max(Length('copropietario__email')),
+        apartamento=Max(Length('apartamento__numeroApartamento')),
+        monto=Max('monto'),
+    )
+
+    largos = [
+        len(str(maximos['id'] or '')),
+        (maximos['nombre'] or 0) + 1 + (maximos['apellido'] or 0),
+        maximos['email'] or 0,
+        len('Apto. ') + (maximos['apartamento'] or 0),
+        len(str(maximos['monto'] or '')),
+        len('dd/mm/aaaa hh:mm'),
+    ]
+
+    # +2 de margen, igual que el ajuste automático anterior
+    return [max(largo, len(encabezado)) + 2 for largo, encabezado in zip(largos, ENCABEZADOS)]
+
+
+def _filas(comprobantes):
+    """
+    Recorre los comprobantes por lotes sin cargar objetos del ORM,
+    solo las columnas que van al reporte.
+    """
+    columnas = comprobantes.values_list(
+        'comprobanteID',
+        'copropietario__first_name',
+        'copropietario__last_name',
+        'copropietario__email',
+        'apartamento__numeroApartamento',
+        'monto',
+        'fecha_creacion',
+    )
+
+    for comp_id, nombre, apellido, email, numero, monto, fecha in columnas.iterator(chunk_size=TAMANO_LOTE):
+        yield [
+            comp_id,
+            f"{nombre} {apellido}".strip(),
+            email,
+            f"Apto. {numero}",
+            monto,
+            fecha.strftime(FORMATO_FECHA) if fecha else "",
+        ]
+
+
+def escribir_excel_comprobantes(comprobantes, destino, al_avanzar=None):
+    """
+    Escribe el reporte de comprobantes en `destino` (ruta o archivo abierto)
+    usando un libro write-only: las filas se vuelcan a disco a medida que se
+    generan, así que la memoria no crece con la cantidad de comprobantes.
+
+    Si se pasa `al_avanzar`, se llama con el número de filas escritas
+    cada vez que se completa un lote.
+    """
+    wb = Workbook(write_only=True)
+    ws = wb.create_sheet(title="Comprobantes Recaudados")
+
+    # Anchos de columna (deben definirse antes de la primera fila)
+    for indice, ancho in enumerate(_anchos_columnas(comprobantes), start=1):
+        ws.column_dimensions[get_column_letter(indice)].width = ancho
+
+    # Encabezados con estilo
+    font_bold = Font(bold=True, color="FFFFFF")
+    fill_header = PatternFill(start_color="4F81BD", end_color="4F81BD", fill_type="solid")
+    center_aligned = Alignment(horizontal="center")
+
+    fila_encabezados = []
+    for titulo in ENCABEZADOS:
+        celda = WriteOnlyCell(ws, value=titulo)
+        celda.font = font_bold
+        celda.fill = fill_header
+        celda.alignment = center_aligned
+        fila_encabezados.append(celda)
+    ws.append(fila_encabezados)
+
+    # Datos
+    for escritas, fila in enumerate(_filas(comprobantes), start=1):
+        ws.append(fila)
+        if al_avanzar and escritas % TAMANO_LOTE == 0:
+            al_avanzar(escritas)
+
+    wb.save(destino)
+
+
+def generar_excel_temporal(comprobantes):
+    """
+    Genera el reporte en un archivo temporal y lo devuelve abierto al inicio,
+    listo para enviarse por partes con FileResponse.
+    """
+    archivo = tempfile.TemporaryFile(suffix='.xlsx')
+    escribir_excel_comprobantes(comprobantes, archivo)
+    archivo.seek(0)
+    return archivo
+
+
+# ---------------------------------------------------------------------------
+# Exportaciones en segundo plano
+# ---------------------------------------------------------------------------
+
+_pool = None
+_pool_lock = threading.Lock()
+
+
+def _obtener_pool():
+    # El pool se crea la primera vez que se usa, uno por proceso
+    global _pool
+    with _pool_lock:
+        if _pool is None:
+            _pool = ThreadPoolExecutor(
+                max_workers=settings.EXPORTACION_HILOS,
+                thread_name_prefix='exportacion'
+            )
+        return _pool
+
+
+def solicitar_exportacion(usuario, filtros):
+    """
+    Devuelve una exportación para esos filtros: reutiliza una reciente
+    (terminada o en curso) si existe, o crea una nueva y la encola.
+    """
+    huella = huella_filtros(filtros)
+    ahora = timezone.now()
+    desde = ahora - timedelta(minutes=settings.EXPORTACION_REUTILIZAR_MINUTOS)
+
+    reciente = ExportacionComprobantes.objects.filter(
+        huella=huella,
+        fecha_creacion__gte=desde,
+    ).filter(
+        Q(estado=ExportacionComprobantes.ESTADO_TERMINADO, fecha_expiracion__gt=ahora) |
+        Q(estado__in=[ExportacionComprobantes.ESTADO_PENDIENTE, ExportacionComprobantes.ESTADO_PROCESANDO])
+    ).first()
+    if reciente:
+        return reciente
+
+    exportacion = ExportacionComprobantes.objects.create(
+        solicitante=usuario,
+        filtros=filtros,
+        huella=huella,
+    )
+    # Encolar solo cuando el registro ya sea visible para el hilo
+    transaction.on_commit(lambda: _obtener_pool().submit(ejecutar_exportacion, exportacion.pk))
+    return exportacion
+
+
+def ejecutar_exportacion(exportacion_id):
+    """
+    Genera el archivo de una exportación y actualiza su progreso.
+    Corre en un hilo del pool (o desde un comando), nunca en el request.
+    """
+    pendientes = ExportacionComprobantes.objects.filter(pk=exportacion_id)
+    try:
+        # Tomar la tarea solo si sigue pendiente (evita procesarla dos veces)
+        if not pendientes.filter(estado=ExportacionComprobantes.ESTADO_PENDIENTE).update(
+            estado=ExportacionComprobantes.ESTADO_PROCESANDO
+        ):
+            return
+
+        exportacion = pendientes.get()
+        filtro_form = formulario_filtros(exportacion.solicitante, exportacion.filtros, todos_apartamentos=True)
+        if not filtro_form.is_valid():
+            # Los filtros guardados ya no validan (p. ej. se borró el apartamento):
+            # filtrar_comprobantes() devolvería todos los comprobantes
+            errores = '; '.join(
+                f"{campo}: {' '.join(mensajes)}" for campo, mensajes in filtro_form.errors.items()
+            )
+            pendientes.update(
+                estado=ExportacionComprobantes.ESTADO_ERROR,
+                error=f'Los filtros de la exportación ya no son válidos ({errores}).',
+                fecha_fin=timezone.now()
+            )
+            return
+        comprobantes = filtrar_comprobantes(Comprobante.objects.all(), filtro_form)
+        total = comprobantes.count()
+        pendientes.update(total_filas=total)
+
+        with tempfile.TemporaryFile(suffix='.xlsx') as temporal:
+            escribir_excel_comprobantes(
+                comprobantes,
+                temporal,
+                al_avanzar=lambda escritas: pendientes.update(filas_procesadas=escritas)
+            )
+            temporal.seek(0)
+            nombre = f"Reporte_Comprobantes_{exportacion.exportacionID}_{timezone.localtime().strftime('%Y%m%d_%H%M')}.xlsx"
+            exportacion.archivo.save(nombre, File(temporal), save=False)
+
+        ahora = timezone.now()
+        exportacion.estado = ExportacionComprobantes.ESTADO_TERMINADO
+        exportacion.total_filas = total
+        exportacion.filas_procesadas = total
+        exportacion.fecha_fin = ahora
+        exportacion.fecha_expiracion = ahora + timedelta(hours=settings.EXPORTACION_VIGENCIA_HORAS)
+        exportacion.save(update_fields=[
+            'archivo', 'estado', 'total_filas', 'filas_procesadas', 'fecha_fin', 'fecha_expiracion'
+        ])
+    except Exception as e:
+        logger.exception('Error generando la exportación %s', exportacion_id)
+        pendientes.update(
+            estado=ExportacionComprobantes.ESTADO_ERROR,
+            error=str(e),
+            fecha_fin=timezone.now()
+        )
+    finally:
+        # El hilo no pasa por el ciclo de request, cerramos la conexión a mano
+        close_old_connections()
+
+
+def limpiar_exportaciones(ahora=None):
+    """
+    Borra archivos y registros de exportaciones vencidas, y marca como error
+    las que quedaron colgadas (por ejemplo si el proceso se reinició).
+    Devuelve (eliminadas, colgadas).
+    """
+    ahora = ahora or timezone.now()
+    limite = ahora - timedelta(hours=settings.EXPORTACION_VIGENCIA_HORAS)
+
+    colgadas = ExportacionComprobantes.objects.filter(
+        estado__in=[ExportacionComprobantes.ESTADO_PENDIENTE, ExportacionComprobantes.ESTADO_PROCESANDO],
+        fecha_creacion__lt=limite,
+    ).update(
+        estado=ExportacionComprobantes.ESTADO_ERROR,
+        error='La exportación no terminó a tiempo.',
+        fecha_fin=ahora
+    )
+
+    eliminadas = 0
+    vencidas = ExportacionComprobantes.objects.filter(
+        Q(fecha_expiracion__lte=ahora) |
+        Q(estado=ExportacionComprobantes.ESTADO_ERROR, fecha_creacion__lt=limite)
+    )
+    for exportacion in vencidas.iterator():
+        if exportacion.archivo:
+            exportacion.archivo.delete(save=False)
+        exportacion.delete()
+        eliminadas += 1
+
+    return eliminadas, colgadas
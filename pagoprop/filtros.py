@@ -0,0 +1,108 @@
+# pagoprop/filtros.py
+
+import hashlib
+import json
+from datetime import datetime, time, timedelta
+
+from django.utils import timezone
+
+from .busqueda import filtro as filtro_busqueda, texto_normalizado
+from .forms import FiltroComprobantesForm
+from .models import Apartamento
+
+
+# Mismos campos que expone FiltroComprobantesForm
+CAMPOS_FILTRO = ['buscar', 'apartamento', 'fecha_desde', 'fecha_hasta', 'monto_minimo', 'monto_maximo']
+
+
+def formulario_filtros(user, datos, todos_apartamentos=False):
+    """
+    Crea el formulario de filtros. Los administradores pueden filtrar por
+    cualquier apartamento; los copropietarios solo por los suyos.
+    """
+    apartamentos = Apartamento.objects.order_by('numeroApartamento') if todos_apartamentos else None
+    return FiltroComprobantesForm(user, datos, apartamentos=apartamentos)
+
+
+def inicio_del_dia(fecha):
+    # Medianoche de esa fecha en la zona horaria configurada (TIME_ZONE)
+    return timezone.make_aware(datetime.combine(fecha, time.min), timezone.get_current_timezone())
+
+
+def aplicar_filtros(comprobantes, filtros):
+    """
+    Aplica los filtros ya validados (cleaned_data del formulario).
+
+    Las fechas se convierten en un rango semiabierto [desde, hasta + 1 día)
+    sobre la columna fecha_creacion tal cual, sin DATE(): así MySQL puede
+    recorrer los índices compuestos de Comprobante en vez de leer la tabla.
+    """
+    # Por nombre, email, usuario o apartamento, con el índice de busqueda.py
+    buscar = filtros.get('buscar')
+    if buscar:
+        comprobantes = comprobantes.filter(filtro_busqueda(buscar))
+
+    apartamento = filtros.get('apartamento')
+    if apartamento:
+        comprobantes = comprobantes.filter(apartamento=apartamento)
+
+    fecha_desde = filtros.get('fecha_desde')
+    if fecha_desde:
+        comprobantes = comprobantes.filter(fecha_creacion__gte=inicio_del_dia(fecha_desde))
+
+    fecha_hasta = filtros.get('fecha_hasta')
+    if fecha_hasta:
+        comprobantes = comprobantes.filter(fecha_creacion__lt=inicio_del_dia(fecha_hasta + timedelta(days=1)))
+
+    monto_minimo = filtros.get('monto_minimo')
+    if monto_minimo is not None:
+        comprobantes = comprobantes.filter(monto__gte=monto_minimo)
+
+    monto_maximo = filtros.get('monto_maximo')
+    if monto_maximo is not None:
+        comprobantes = comprobantes.filter(monto__lte=monto_maximo)
+
+    return comprobantes
+
+
+def filtrar_comprobantes(comprobantes, filtro_form):
+    # Si el formulario no es válido se devuelven los comprobantes sin filtrar
+    if filtro_form.is_valid():
+        return aplicar_filtros(comprobantes, filtro_form.cleaned_data)
+    return comprobantes
+
+
+def hay_filtros_activos(filtro_form):
+    # True si el formulario es válido y tiene al menos un filtro con valor
+    return filtro_form.is_valid() and bool(serializar_filtros(filtro_form.cleaned_data))
+
+
+def serializar_filtros(filtros):
+    """
+    Convierte el cleaned_data en un dict de textos con solo los campos que
+    tienen valor, para guardarlo en JSON o usarlo como llave de caché.
+    """
+    serializados = {}
+    for campo in CAMPOS_FILTRO:
+        valor = filtros.get(campo)
+        if valor is None or valor == '':
+            continue
+        if campo == 'buscar':
+            valor = texto_normalizado(valor)
+            if not valor:
+                continue
+        elif campo == 'apartamento':
+            valor = valor.pk
+        elif campo in ('fecha_desde', 'fecha_hasta'):
+            valor = valor.isoformat()
+        else:
+            # 1000, 1000.0 y 1000.00 deben dar el mismo texto
+            valor = format(valor.normalize(), 'f')
+        serializados[campo] = str(valor)
+    return serializados
+
+
+def huella_filtros(filtros):
+    # Hash estable del conjunto de filtros serializados
+    texto = json.dumps(filtros, sort_keys=True)
+    return hashlib.sha256(texto.encode('utf-8')).hexdigest()
@@ -1,7 +1,42 @@
 from django import forms
+from django.conf import settings
 from django.contrib.auth.models import User
 from django.contrib.auth.forms import UserCreationForm, AuthenticationForm
 from .models import Comprobante, Apartamento
+from .inventario import generar_numeros, leer_lista
+from .membresias import apartamento_de, apartamentos_de
+
+# Selector de los apartamentos de un usuario. Las opciones y la validación
+# salen de membresias.py (caché), sin consultar la BD; sin usar_membresias()
+# funciona como un ModelChoiceField normal (p. ej. todos los apartamentos
+# para el admin).
+class ApartamentoPropioField(forms.ModelChoiceField):
+
+    def __init__(self, *args, **kwargs):
+        kwargs.setdefault('queryset', Apartamento.objects.none())
+        super().__init__(*args, **kwargs)
+        self.usuario = None
+
+    def usar_membresias(self, usuario):
+        self.usuario = usuario
+        membresias = apartamentos_de(usuario)
+        # No se evalúa: queda por si algo más lo consulta
+        self.queryset = Apartamento.objects.filter(pk__in=[m.apartamentoID for m in membresias])
+        opciones = [(m.apartamentoID, f'Apartamento {m.numeroApartamento}') for m in membresias]
+        self.choices = ([('', self.empty_label)] if self.empty_label is not None else []) + opciones
+
+    def to_python(self, value):
+        if self.usuario is None:
+            return super().to_python(value)
+        if value in self.empty_values:
+            return None
+        apartamento = apartamento_de(self.usuario, getattr(value, 'pk', value))
+        if apartamento is None:
+            raise forms.ValidationError(
+                self.error_messages['invalid_choice'], code='invalid_choice', params={'value': value}
+            )
+        return apartamento
+
 
 # Formulario de Registro
 class RegistroForm(UserCreationForm):
@@ -79,22 +114,173 @@ class ComprobanteForm(forms.ModelForm):
             'archivo': 'Comprobante (imagen o PDF)',
             'monto': 'Monto pagado',
         }
+        field_classes = {
+            'apartamento': ApartamentoPropioField,
+        }
 
     def __init__(self, user, *args, **kwargs):
         super(ComprobanteForm, self).__init__(*args, **kwargs)
         # Filtrar solo apartamentos del usuario logueado
-        self.fields['apartamento'].queryset = user.apartamentos.all()
+        self.fields['apartamento'].usar_membresias(user)
 
         #EDITANDO TIENE INSTANCE, EL ARCHIVO SE HACE OPCIONAL
         if self.instance and self.instance.pk:
             self.fields['archivo'].required = False
 
 
+# Formulario para subir varios comprobantes (valores generales del lote;
+# cada archivo puede traer su propio apartamento y monto, ver lotes.py)
+class LoteComprobantesForm(forms.Form):
+    apartamento = ApartamentoPropioField(
+        required=False,
+        empty_label='Selecciona un apartamento',
+        widget=forms.Select(attrs={'class': 'form-select'}),
+        label='Apartamento para todos'
+    )
+    monto = forms.CharField(
+        required=False,
+        widget=forms.TextInput(attrs={
+            'class': 'form-control',
+            'placeholder': 'Ej: 1.200.000',
+            'inputmode': 'numeric'
+        }),
+        label='Monto para todos'
+    )
+
+    def __init__(self, user, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.fields['apartamento'].usar_membresias(user)
+
+
+# Formulario para importar asignaciones desde un CSV (ver asignaciones.py).
+# `contenido` lleva el CSV de la simulación para confirmarla sin volver a subirlo
+class ImportarAsignacionesForm(forms.Form):
+    archivo = forms.FileField(
+        required=False,
+        widget=forms.ClearableFileInput(attrs={'class': 'form-control', 'accept': '.csv,text/csv'}),
+        label='Archivo CSV'
+    )
+    contenido = forms.CharField(required=False, widget=forms.HiddenInput)
+    simular = forms.BooleanField(
+        required=False,
+        initial=True,
+        widget=forms.CheckboxInput(attrs={'class': 'form-check-input'}),
+        label='Solo simular (no guarda nada)'
+    )
+
+    def clean(self):
+        datos = super().clean()
+        archivo = datos.get('archivo')
+        if archivo:
+            if archivo.size > 2 * 1024 * 1024:
+                raise forms.ValidationError('El archivo no puede superar 2 MB.')
+            datos['contenido'] = archivo.read().decode('utf-8-sig', errors='replace')
+        elif not datos.get('contenido'):
+            raise forms.ValidationError('Selecciona un archivo CSV.')
+        return datos
+
+
+# Formulario para importar un extracto bancario y conciliarlo (ver conciliacion.py)
+class ImportarExtractoForm(forms.Form):
+    archivo = forms.FileField(
+        widget=forms.ClearableFileInput(attrs={'class': 'form-control', 'accept': '.csv,.xlsx,text/csv'}),
+        label='Extracto (CSV o XLSX)'
+    )
+    tolerancia_dias = forms.IntegerField(
+        min_value=0, max_value=31,
+        widget=forms.NumberInput(attrs={'class': 'form-control'}),
+        label='Días de tolerancia'
+    )
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.fields['tolerancia_dias'].initial = settings.CONCILIACION_TOLERANCIA_DIAS
+
+    def clean_archivo(self):
+        archivo = self.cleaned_data['archivo']
+        if archivo.size > 20 * 1024 * 1024:
+            raise forms.ValidationError('El archivo no puede superar 20 MB.')
+        return archivo
+
+
+# Formulario para crear los apartamentos de un edificio (ver inventario.py)
+class GenerarApartamentosForm(forms.Form):
+    torres = forms.IntegerField(
+        min_value=1, max_value=50, initial=1,
+        widget=forms.NumberInput(attrs={'class': 'form-control'}),
+        label='Torres'
+    )
+    pisos = forms.IntegerField(
+        required=False, min_value=1, max_value=200,
+        widget=forms.NumberInput(attrs={'class': 'form-control'}),
+        label='Pisos por torre'
+    )
+    unidades = forms.IntegerField(
+        required=False, min_value=1, max_value=100,
+        widget=forms.NumberInput(attrs={'class': 'form-control'}),
+        label='Apartamentos por piso'
+    )
+    piso_inicial = forms.IntegerField(
+        min_value=0, initial=1,
+        widget=forms.NumberInput(attrs={'class': 'form-control'}),
+        label='Primer piso'
+    )
+    patron = forms.CharField(
+        required=False, max_length=50,
+        widget=forms.TextInput(attrs={'class': 'form-control', 'placeholder': '{torre_letra}{piso}{unidad:02d}'}),
+        label='Patrón de numeración'
+    )
+    archivo = forms.FileField(
+        required=False,
+        widget=forms.ClearableFileInput(attrs={'class': 'form-control', 'accept': '.csv,.txt,text/plain,text/csv'}),
+        label='O un archivo con un número por línea'
+    )
+    contenido = forms.CharField(required=False, widget=forms.HiddenInput)
+    simular = forms.BooleanField(
+        required=False,
+        initial=True,
+        widget=forms.CheckboxInput(attrs={'class': 'form-check-input'}),
+        label='Solo simular (no guarda nada)'
+    )
+
+    def clean(self):
+        datos = super().clean()
+        if self.errors:
+            return datos
+        archivo = datos.get('archivo')
+        if archivo:
+            if archivo.size > 2 * 1024 * 1024:
+                raise forms.ValidationError('El archivo no puede superar 2 MB.')
+            datos['contenido'] = archivo.read().decode('utf-8-sig', errors='replace')
+        if datos.get('contenido'):
+            datos['numeros'] = leer_lista(datos['contenido'])
+        elif datos.get('pisos') and datos.get('unidades'):
+            try:
+                datos['numeros'] = generar_numeros(
+                    datos['torres'], datos['pisos'], datos['unidades'],
+                    datos.get('patron'), datos['piso_inicial']
+                )
+            except ValueError as e:
+                raise forms.ValidationError(str(e))
+        else:
+            raise forms.ValidationError('Indica los pisos y apartamentos por piso, o sube un archivo.')
+        return datos
+
+
 # formulario para filtro de busqueda
 class FiltroComprobantesForm(forms.Form):
 
-    apartamento = forms.ModelChoiceField(
-        queryset=None,
+    buscar = forms.CharField(
+        required=False,
+        max_length=100,
+        widget=forms.TextInput(attrs={
+            'class':'form-control',
+            'placeholder': 'Nombre, email, usuario o apartamento'
+        }),
+        label='Buscar'
+    )
+
+    apartamento = ApartamentoPropioField(
         required=False,
         empty_label='Todos los apartamentos',
         widget=forms.Select(attrs={'class':'form-select'})
@@ -137,10 +323,13 @@ class FiltroComprobantesForm(forms.Form):
     )
 
     
-    def __init__(self, user, *args, **kwargs):
+    def __init__(self, user, *args, apartamentos=None, **kwargs):
         super(FiltroComprobantesForm, self).__init__(*args, **kwargs)
-        #filtrar solo apartamentos del usuario
-        self.fields['apartamento'].queryset = user.apartamentos.all()
+        #filtrar solo apartamentos del usuario (o los que se indiquen, p. ej. todos para el admin)
+        if apartamentos is None:
+            self.fields['apartamento'].usar_membresias(user)
+        else:
+            self.fields['apartamento'].queryset = apartamentos
 
 from django.contrib.auth.forms import PasswordChangeForm
 
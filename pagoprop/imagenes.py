@@ -0,0 +1,101 @@
+# pagoprop/imagenes.py
+#
+# Procesamiento de imágenes con Pillow. Este módulo no importa modelos ni
+# nada de Django: sus funciones corren en procesos aparte (ver miniaturas.py).
+
+import os
+import shutil
+import subprocess
+import tempfile
+
+from PIL import Image, ImageOps
+
+
+def _guardar_webp(imagen, lado, destino, calidad):
+    # Reduce la imagen para que quepa en lado x lado y la escribe de forma atómica
+    copia = imagen.copy()
+    copia.thumbnail((lado, lado), Image.Resampling.LANCZOS)
+    os.makedirs(os.path.dirname(destino), exist_ok=True)
+    temporal = destino + '.tmp'
+    copia.save(temporal, 'WEBP', quality=calidad, method=4)
+    os.replace(temporal, destino)
+
+
+def _abrir_primera_pagina_pdf(origen, lado):
+    """
+    Pillow no sabe dibujar PDFs: la primera página se rasteriza con
+    pdftoppm (poppler-utils). Si no está instalado, el PDF queda sin vista previa.
+    """
+    if not shutil.which('pdftoppm'):
+        return None
+    with tempfile.TemporaryDirectory() as carpeta:
+        salida = os.path.join(carpeta, 'pagina')
+        subprocess.run(
+            ['pdftoppm', '-png', '-f', '1', '-l', '1', '-singlefile', '-scale-to', str(lado), origen, salida],
+            check=True, capture_output=True, timeout=60,
+        )
+        with Image.open(salida + '.png') as pagina:
+            pagina.load()
+            return pagina.copy()
+
+
+def generar_vistas_previas(origen, destino_miniatura, destino_vista, lado_miniatura, lado_vista, calidad):
+    """
+    Crea la miniatura y la vista previa (WebP) de un comprobante. Para los
+    PDF se usa la primera página. Devuelve True si se generaron.
+    """
+    with open(origen, 'rb') as archivo:
+        es_pdf = archivo.read(5) == b'%PDF-'
+
+    if es_pdf:
+        imagen = _abrir_primera_pagina_pdf(origen, lado_vista)
+        if imagen is None:
+            return False
+    else:
+        with Image.open(origen) as original:
+            # Las fotos del celular vienen rotadas por EXIF
+            imagen = ImageOps.exif_transpose(original)
+            imagen.load()
+
+    if imagen.mode not in ('RGB', 'RGBA'):
+        imagen = imagen.convert('RGBA' if 'A' in imagen.getbands() else 'RGB')
+
+    _guardar_webp(imagen, lado_miniatura, destino_miniatura, calidad)
+    _guardar_webp(imagen, lado_vista, destino_vista, calidad)
+    return True
+
+
+def normalizar_imagen(origen, destino, lado_maximo, formato, calidad):
+    """
+    Endereza la foto según EXIF, la reduce a lado_maximo, la vuelve a
+    codificar sin metadatos (ni EXIF ni GPS) y la escribe en `destino`.
+    Devuelve (bytes_antes, bytes_despues), o None si no es una imagen
+    fija o el resultado no pesa menos que el original.
+    """
+    try:
+        with Image.open(origen) as original:
+            if getattr(original, 'is_animated', False):
+                return None
+            imagen = ImageOps.exif_transpose(original)
+            imagen.load()
+    except (OSError, SyntaxError, ValueError):
+        return None
+
+    if formato == 'JPEG' or imagen.mode not in ('RGB', 'RGBA'):
+        imagen = imagen.convert('RGBA' if formato != 'JPEG' and 'A' in imagen.getbands() else 'RGB')
+    imagen.thumbnail((lado_maximo, lado_maximo), Image.Resampling.LANCZOS)
+
+    # Sin pasar exif= ni icc_profile= Pillow no copia los metadatos
+    opciones = {'quality': calidad}
+    if formato == 'JPEG':
+        opciones.update(optimize=True, progressive=True)
+    elif formato == 'WEBP':
+        opciones['method'] = 6
+    imagen.save(destino, formato, **opciones)
+
+    antes = os.path.getsize(origen)
+    despues = os.path.getsize(destino)
+    if despues >= antes:
+        os.remove(destino)
+        return None
+    return antes, despues
@@ -0,0 +1,138 @@
+# pagoprop/inventario.py
+
+import re
+import string
+
+from django.db import transaction
+
+from .busqueda import indexar_apartamentos
+from .models import Apartamento
+from .tablero import invalidar_tablero
+
+
+# Creación masiva de apartamentos a partir de la descripción del edificio
+# (torres, pisos, unidades por piso y un patrón de numeración) o de una
+# lista. Variables del patrón:
+#   {torre}        número de la torre (1, 2, ...)
+#   {torre_letra}  letra de la torre (A, B, ...)
+#   {piso}         número del piso
+#   {unidad}       número de la unidad dentro del piso
+# Admiten el formato de str.format, por ejemplo {unidad:02d}.
+
+PATRON_POR_DEFECTO = '{piso}{unidad:02d}'
+PATRON_CON_TORRES = '{torre_letra}{piso}{unidad:02d}'
+
+TAMANO_LOTE = 500
+
+LARGO_MAXIMO = Apartamento._meta.get_field('numeroApartamento').max_length
+
+
+def _letra(numero):
+    # 1 -> A, 26 -> Z, 27 -> AA
+    letras = ''
+    while numero:
+        numero, resto = divmod(numero - 1, 26)
+        letras = string.ascii_uppercase[resto] + letras
+    return letras
+
+
+def _revisar_patron(patron):
+    """
+    Rechaza anchos o precisiones mayores que LARGO_MAXIMO antes de formatear:
+    '{piso:>999999999}' armaría una cadena de gigabytes solo para descartarla.
+    """
+    try:
+        campos = list(string.Formatter().parse(patron))
+    except ValueError as e:
+        raise ValueError(f'El patrón "{patron}" no es válido ({e}).')
+    for _, _, formato, _ in campos:
+        if not formato:
+            continue
+        if '{' in formato:
+            raise ValueError(f'El patrón "{patron}" no es válido (formato anidado).')
+        if any(int(cifras) > LARGO_MAXIMO for cifras in re.findall(r'\d+', formato)):
+            raise ValueError(f'El patrón "{patron}" genera números de más de {LARGO_MAXIMO} caracteres.')
+
+
+def generar_numeros(torres, pisos, unidades, patron=None, piso_inicial=1):
+    """
+    Números de apartamento del edificio, en orden. Lanza ValueError si el
+    patrón no es válido, repite números o genera alguno demasiado largo.
+    """
+    if min(torres, pisos, unidades) < 1:
+        raise ValueError('Torres, pisos y unidades deben ser al menos 1.')
+    patron = patron or (PATRON_CON_TORRES if torres > 1 else PATRON_POR_DEFECTO)
+    _revisar_patron(patron)
+
+    numeros = []
+    vistos = set()
+    for torre in range(1, torres + 1):
+        for piso in range(piso_inicial, piso_inicial + pisos):
+            for unidad in range(1, unidades + 1):
+                try:
+                    numero = patron.format(torre=torre, torre_letra=_letra(torre), piso=piso, unidad=unidad)
+                except (KeyError, IndexError, ValueError) as e:
+                    raise ValueError(f'El patrón "{patron}" no es válido ({e}).')
+                if len(numero) > LARGO_MAXIMO:
+                    raise ValueError(f'"{numero}" supera los {LARGO_MAXIMO} caracteres.')
+                if numero in vistos:
+                    raise ValueError(
+                        f'El patrón repite el número "{numero}": incluye todas las variables que cambian.'
+                    )
+                vistos.add(numero)
+                numeros.append(numero)
+    return numeros
+
+
+def leer_lista(texto):
+    # Un número por línea (o la primera columna de un CSV), sin encabezado
+    numeros = []
+    for linea in texto.splitlines():
+        numero = linea.replace(';', ',').split(',')[0].strip()
+        if numero and numero.lower() not in ('numeroapartamento', 'apartamento', 'numero'):
+            numeros.append(numero)
+    return numeros
+
+
+def _existentes(numeros):
+    existentes = set()
+    for inicio in range(0, len(numeros), TAMANO_LOTE):
+        existentes.update(
+            Apartamento.objects.filter(numeroApartamento__in=numeros[inicio:inicio + TAMANO_LOTE])
+            .values_list('numeroApartamento', flat=True)
+        )
+    return existentes
+
+
+def provisionar(numeros, simular=False, tamano_lote=TAMANO_LOTE, al_avanzar=None):
+    """
+    Crea los apartamentos que no existan, en lotes de bulk_create dentro de
+    una sola transacción. Llama a al_avanzar(creados, total) después de
+    cada lote. Devuelve {'creados', 'existentes', 'invalidos', 'nuevos'}.
+    """
+    invalidos = [numero for numero in numeros if len(numero) > LARGO_MAXIMO]
+    validos = list(dict.fromkeys(numero for numero in numeros if len(numero) <= LARGO_MAXIMO))
+    existentes = _existentes(validos)
+    nuevos = [numero for numero in validos if numero not in existentes]
+    resultado = {'creados': 0, 'existentes': len(existentes), 'invalidos': invalidos, 'nuevos': nuevos}
+    if simular or not nuevos:
+        return resultado
+
+    with transaction.atomic():
+        for inicio in range(0, len(nuevos), tamano_lote):
+            lote = nuevos[inicio:inicio + tamano_lote]
+            filas_lote = Apartamento.objects.filter(numeroApartamento__in=lote)
+            antes = filas_lote.count()
+            # ignore_conflicts: si otro proceso creó el mismo número, se omite
+            # (y no se cuenta: los creados salen de releer el lote)
+            Apartamento.objects.bulk_create(
+                [Apartamento(numeroApartamento=numero) for numero in lote], ignore_conflicts=True
+            )
+            ids = list(filas_lote.values_list('apartamentoID', flat=True))
+            resultado['creados'] += len(ids) - antes
+            # bulk_create no envía las señales: índice de búsqueda (y tablero, abajo)
+            indexar_apartamentos(ids)
+            if al_avanzar:
+                al_avanzar(resultado['creados'], len(nuevos))
+        invalidar_tablero()
+    return resultado
@@ -0,0 +1,252 @@
+# pagoprop/lotes.py
+
+import csv
+import io
+import os
+import re
+import zipfile
+from collections import Counter
+
+from django.conf import settings
+from django.core.exceptions import ValidationError
+from django.core.files.base import ContentFile
+from django.db import transaction
+
+from . import archivos, contadores, normalizacion, resumenes
+from .almacenamiento import calcular_sha256
+from .cache_paginas import invalidar_usuarios
+from .conteos import invalidar_conteos
+from .membresias import apartamento_de, apartamentos_de
+from .models import Comprobante
+from .subidas import BYTES_FIRMA, detectar_tipo
+from .tablero import invalidar_tablero
+
+
+# Archivo opcional dentro del ZIP con: archivo;apartamento;monto
+MANIFIESTO = 'comprobantes.csv'
+
+# 1.200.000 -> 1200000 (mismo formato que escribe el JS del formulario)
+MILES = re.compile(r'^\d{1,3}(\.\d{3})+$')
+
+
+class Elemento:
+    # Un comprobante del lote, antes y después de validarlo
+    def __init__(self, nombre, archivo, apartamento='', monto=''):
+        self.nombre = nombre
+        self.archivo = archivo
+        self.apartamento = (apartamento or '').strip()
+        self.monto = (monto or '').strip()
+        self.errores = []
+        self.duplicado = False
+        self.comprobante = None
+
+
+# ---------------------------------------------------------------------------
+# Lectura
+# ---------------------------------------------------------------------------
+
+def _leer_manifiesto(texto):
+    # {nombre de archivo: (apartamento, monto)}; acepta ',' o ';'
+    try:
+        dialecto = csv.Sniffer().sniff(texto[:1024], delimiters=',;')
+    except csv.Error:
+        dialecto = csv.excel
+    filas = {}
+    for fila in csv.reader(io.StringIO(texto), dialecto):
+        if len(fila) < 3 or fila[0].strip().lower() == 'archivo':
+            continue
+        filas[os.path.basename(fila[0].strip())] = (fila[1], fila[2])
+    return filas
+
+
+def _leer_zip(subido, maximo_archivos):
+    """
+    Elementos de un ZIP. Los tamaños se revisan con el índice del ZIP antes
+    de descomprimir, para no inflar en memoria un archivo demasiado grande;
+    si trae más de `maximo_archivos` o más bytes de los que caben en esos
+    archivos, se rechaza entero sin leer nada.
+    """
+    try:
+        comprimido = zipfile.ZipFile(subido)
+    except zipfile.BadZipFile:
+        raise ValueError(f'{subido.name}: no es un ZIP válido.')
+
+    with comprimido:
+        entradas = [
+            info for info in comprimido.infolist()
+            if not info.is_dir()
+            and not os.path.basename(info.filename).startswith('.')
+            and not info.filename.startswith('__MACOSX/')
+        ]
+        archivos = [info for info in entradas if os.path.basename(info.filename).lower() != MANIFIESTO]
+        if len(archivos) > maximo_archivos:
+            raise ValueError(f'{subido.name}: el lote admite máximo {settings.LOTE_MAXIMO_ARCHIVOS} archivos.')
+        # Los archivos que caben en el cupo, más el manifiesto
+        if sum(info.file_size for info in entradas) > (maximo_archivos + 1) * settings.COMPROBANTE_TAMANO_MAXIMO:
+            raise ValueError(f'{subido.name}: el contenido del ZIP es demasiado grande.')
+
+        manifiesto = {}
+        for info in entradas:
+            if os.path.basename(info.filename).lower() == MANIFIESTO:
+                if info.file_size > settings.COMPROBANTE_TAMANO_MAXIMO:
+                    raise ValueError(f'{subido.name}: {MANIFIESTO} es demasiado grande.')
+                manifiesto = _leer_manifiesto(comprimido.read(info).decode('utf-8-sig', errors='replace'))
+        elementos = []
+        for info in entradas:
+            nombre = os.path.basename(info.filename)
+            if nombre.lower() == MANIFIESTO:
+                continue
+            apartamento, monto = manifiesto.get(nombre, ('', ''))
+            elemento = Elemento(nombre, None, apartamento, monto)
+            if info.file_size > settings.COMPROBANTE_TAMANO_MAXIMO:
+                elemento.errores.append('El archivo supera el tamaño máximo.')
+            else:
+                elemento.archivo = ContentFile(comprimido.read(info), name=nombre)
+            elementos.append(elemento)
+    return elementos
+
+
+def leer_elementos(subidos, datos):
+    """
+    Arma los elementos del lote. Cada archivo i puede traer apartamento_i y
+    monto_i; los ZIP usan su comprobantes.csv. Lo que falte se completa con
+    los valores generales `apartamento` y `monto`.
+    """
+    elementos = []
+    for indice, subido in enumerate(subidos):
+        if subido.name.lower().endswith('.zip'):
+            try:
+                # Lo que queda del cupo del lote (validar() vuelve a revisar el total)
+                elementos.extend(_leer_zip(subido, max(settings.LOTE_MAXIMO_ARCHIVOS - len(elementos), 0)))
+            except ValueError as e:
+                elemento = Elemento(subido.name, None)
+                elemento.errores.append(str(e))
+                elementos.append(elemento)
+            continue
+        elementos.append(Elemento(
+            subido.name,
+            subido,
+            datos.get(f'apartamento_{indice}', ''),
+            datos.get(f'monto_{indice}', ''),
+        ))
+
+    for elemento in elementos:
+        elemento.apartamento = elemento.apartamento or (datos.get('apartamento') or '').strip()
+        elemento.monto = elemento.monto or (datos.get('monto') or '').strip()
+    return elementos
+
+
+# ---------------------------------------------------------------------------
+# Validación
+# ---------------------------------------------------------------------------
+
+def _limpiar_monto(texto, campo):
+    if MILES.match(texto):
+        texto = texto.replace('.', '')
+    return campo.clean(texto)
+
+
+def validar(usuario, elementos):
+    """
+    Valida todos los elementos contra los apartamentos del usuario, que salen
+    de membresias.py (una consulta como mucho). Los errores quedan en cada elemento.
+    """
+    apartamentos = [apartamento_de(usuario, membresia.apartamentoID) for membresia in apartamentos_de(usuario)]
+    por_id = {str(apartamento.pk): apartamento for apartamento in apartamentos}
+    por_numero = {apartamento.numeroApartamento.lower(): apartamento for apartamento in apartamentos}
+    campo_monto = Comprobante._meta.get_field('monto').formfield(required=True)
+
+    if len(elementos) > settings.LOTE_MAXIMO_ARCHIVOS:
+        for elemento in elementos[settings.LOTE_MAXIMO_ARCHIVOS:]:
+            elemento.errores.append(f'El lote admite máximo {settings.LOTE_MAXIMO_ARCHIVOS} archivos.')
+
+    for elemento in elementos:
+        if elemento.errores:
+            continue
+
+        elemento.apartamento = por_id.get(elemento.apartamento) or por_numero.get(elemento.apartamento.lower())
+        if elemento.apartamento is None:
+            elemento.errores.append('Selecciona uno de tus apartamentos.')
+
+        try:
+            elemento.monto = _limpiar_monto(elemento.monto, campo_monto)
+        except ValidationError as e:
+            elemento.errores.extend(e.messages)
+
+        archivo = elemento.archivo
+        if archivo.size > settings.COMPROBANTE_TAMANO_MAXIMO:
+            elemento.errores.append('El archivo supera el tamaño máximo.')
+        else:
+            archivo.seek(0)
+            cabecera = archivo.read(BYTES_FIRMA)
+            archivo.seek(0)
+            if not detectar_tipo(cabecera):
+                elemento.errores.append('El archivo debe ser una imagen o un PDF.')
+
+    return [elemento for elemento in elementos if not elemento.errores]
+
+
+# ---------------------------------------------------------------------------
+# Guardado
+# ---------------------------------------------------------------------------
+
+def guardar(usuario, validos):
+    """
+    Guarda los archivos (por contenido) y crea todos los comprobantes con un
+    solo bulk_create. Como bulk_create no envía señales, aquí se hace lo
+    mismo que en signals.py: resumen mensual, contadores, referencias de
+    archivos, cachés y vistas previas.
+    """
+    comprobantes = []
+    for elemento in validos:
+        sha256 = calcular_sha256(elemento.archivo)
+        elemento.archivo.sha256 = sha256
+        comprobante = Comprobante(
+            copropietario=usuario,
+            apartamento=elemento.apartamento,
+            monto=elemento.monto,
+            sha256=sha256,
+        )
+        comprobante.archivo.save(elemento.nombre, elemento.archivo, save=False)
+        elemento.comprobante = comprobante
+        comprobantes.append(comprobante)
+
+    # Repetidos: contra lo ya subido y dentro del mismo lote
+    hashes = Counter(comprobante.sha256 for comprobante in comprobantes)
+    existentes = set(
+        Comprobante.objects.filter(sha256__in=hashes).values_list('sha256', flat=True).distinct()
+    )
+    for elemento in validos:
+        sha256 = elemento.comprobante.sha256
+        elemento.duplicado = sha256 in existentes or hashes[sha256] > 1
+
+    # Si algo falla aquí, los archivos ya guardados quedan sin referencias
+    # y los recoge la limpieza de archivos huérfanos
+    with transaction.atomic():
+        Comprobante.objects.bulk_create(comprobantes)
+        resumenes.sumar_lote(comprobantes)
+        contadores.sumar_lote(comprobantes)
+        rutas = Counter(comprobante.archivo.name for comprobante in comprobantes)
+        for comprobante in {c.archivo.name: c for c in comprobantes}.values():
+            archivos.retener(
+                comprobante.archivo.name, comprobante.sha256, comprobante.archivo.size,
+                cantidad=rutas[comprobante.archivo.name]
+            )
+            normalizacion.comprobante_guardado(comprobante, True, None)
+        invalidar_conteos()
+        invalidar_tablero()
+        invalidar_usuarios([usuario.pk])
+    return comprobantes
+
+
+def procesar_lote(usuario, subidos, datos):
+    """
+    Lee, valida y guarda un lote. Un elemento con errores no detiene a los
+    demás. Devuelve todos los elementos con sus errores y, los guardados,
+    con su comprobante.
+    """
+    elementos = leer_elementos(subidos, datos)
+    validos = validar(usuario, elementos)
+    if validos:
+        guardar(usuario, validos)
+    return elementos
@@ -0,0 +1,38 @@
+from django.conf import settings
+from django.core.management.base import BaseCommand
+
+from pagoprop.paquetes import archivar_antiguos, candidatos
+
+
+class Command(BaseCommand):
+    help = (
+        'Mueve los archivos de comprobantes antiguos a paquetes comprimidos de solo-agregar '
+        'en ARCHIVO_FRIO_ROOT. Siguen disponibles para descargarlos desde la aplicación.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--dias',
+            type=int,
+            default=settings.ARCHIVO_FRIO_DIAS,
+            help='Archiva los archivos que ningún comprobante de los últimos N días usa.'
+        )
+        parser.add_argument(
+            '--simular',
+            action='store_true',
+            help='Solo cuenta los archivos por archivar, sin moverlos.'
+        )
+
+    def handle(self, *args, **options):
+        if options['simular']:
+            self.stdout.write(f'{len(candidatos(options["dias"]))} archivo(s) por archivar.')
+            return
+
+        archivados, originales, empaquetados = archivar_antiguos(
+            options['dias'],
+            al_avanzar=lambda total: self.stdout.write(f'{total} archivo(s) archivado(s)...'),
+        )
+        self.stdout.write(self.style.SUCCESS(
+            f'{archivados} archivo(s) archivado(s): {originales / (1024 * 1024):.1f} MB '
+            f'ocupan {empaquetados / (1024 * 1024):.1f} MB en los paquetes.'
+        ))
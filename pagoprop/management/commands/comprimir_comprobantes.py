@@ -0,0 +1,30 @@
+from django.core.management.base import BaseCommand
+
+from pagoprop.normalizacion import comprimir_existentes, rutas_por_comprimir
+
+
+class Command(BaseCommand):
+    help = (
+        'Normaliza y recomprime en paralelo las fotos de comprobantes ya guardadas '
+        '(mismas opciones NORMALIZACION_* que al subir) y reporta los bytes ahorrados.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--simular',
+            action='store_true',
+            help='Solo cuenta las fotos pendientes, sin modificarlas.'
+        )
+
+    def handle(self, *args, **options):
+        rutas = rutas_por_comprimir()
+
+        if options['simular']:
+            self.stdout.write(f'{len(rutas)} foto(s) por comprimir.')
+            return
+
+        comprimidas, omitidas, ahorrados = comprimir_existentes(rutas)
+        self.stdout.write(self.style.SUCCESS(
+            f'{comprimidas} foto(s) comprimida(s), {omitidas} omitida(s), '
+            f'{ahorrados / (1024 * 1024):.1f} MB ahorrados.'
+        ))
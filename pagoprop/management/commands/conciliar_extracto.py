@@ -0,0 +1,79 @@
+import time
+
+from django.core.management.base import BaseCommand, CommandError
+
+from pagoprop.conciliacion import ErrorExtracto, conciliar, importar_extracto, reporte
+from pagoprop.models import ExtractoBancario
+
+
+class Command(BaseCommand):
+    help = (
+        'Importa un extracto bancario (CSV o XLSX) y lo concilia con los comprobantes, '
+        'o vuelve a conciliar uno ya importado (--extracto).'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('archivo', nargs='?', help='Ruta del extracto (CSV o XLSX).')
+        parser.add_argument(
+            '--extracto',
+            type=int,
+            help='Id de un extracto ya importado para volver a conciliarlo.'
+        )
+        parser.add_argument(
+            '--tolerancia',
+            type=int,
+            help='Días de diferencia aceptados (por defecto CONCILIACION_TOLERANCIA_DIAS o el del extracto).'
+        )
+        parser.add_argument(
+            '--rehacer',
+            action='store_true',
+            help='Vuelve a conciliar también los movimientos ya conciliados.'
+        )
+
+    def handle(self, *args, **options):
+        if bool(options['archivo']) == bool(options['extracto']):
+            raise CommandError('Indica un archivo o --extracto, no los dos.')
+        if options['tolerancia'] is not None and options['tolerancia'] < 0:
+            raise CommandError('--tolerancia no puede ser negativa.')
+
+        inicio = time.perf_counter()
+        if options['extracto']:
+            try:
+                extracto = ExtractoBancario.objects.get(pk=options['extracto'])
+            except ExtractoBancario.DoesNotExist:
+                raise CommandError(f'No existe el extracto {options["extracto"]}.')
+            conciliar(extracto, options['tolerancia'], rehacer=options['rehacer'])
+        else:
+            try:
+                with open(options['archivo'], 'rb') as archivo:
+                    extracto, lectura, _ = importar_extracto(
+                        archivo, options['archivo'], tolerancia_dias=options['tolerancia']
+                    )
+            except OSError as e:
+                raise CommandError(f'No se pudo leer el archivo: {e}')
+            except ErrorExtracto as e:
+                raise CommandError(str(e))
+            if lectura is None:
+                self.stdout.write(f'El archivo ya estaba importado como el extracto {extracto.pk}.')
+                if options['rehacer']:
+                    conciliar(extracto, options['tolerancia'], rehacer=True)
+            else:
+                for linea, motivo in lectura.errores:
+                    self.stderr.write(f'Línea {linea}: {motivo}')
+                self.stdout.write(
+                    f'Extracto {extracto.pk}: {len(lectura.movimientos)} consignación(es), '
+                    f'{lectura.omitidos} fila(s) omitida(s).'
+                )
+        segundos = time.perf_counter() - inicio
+
+        datos = reporte(extracto, limite=0)
+        movimientos, comprobantes = datos['movimientos'], datos['comprobantes']
+        self.stdout.write(
+            f'Movimientos: {movimientos["conciliados"]} conciliados, {movimientos["ambiguos"]} ambiguos, '
+            f'{movimientos["sin_coincidencia"]} sin coincidencia.'
+        )
+        self.stdout.write(
+            f'Comprobantes del periodo: {comprobantes["conciliados"]} conciliados, {comprobantes["ambiguos"]} ambiguos, '
+            f'{comprobantes["sin_coincidencia"]} sin coincidencia.'
+        )
+        self.stdout.write(self.style.SUCCESS(f'Listo en {segundos:.1f} s.'))
@@ -0,0 +1,65 @@
+from django.core.management.base import BaseCommand, CommandError
+
+from pagoprop.inventario import generar_numeros, leer_lista, provisionar
+
+
+class Command(BaseCommand):
+    help = (
+        'Crea los apartamentos de un edificio a partir de torres, pisos y unidades por piso '
+        '(con un patrón de numeración) o de un archivo con un número por línea. '
+        'Los números que ya existen se omiten.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--torres', type=int, default=1)
+        parser.add_argument('--pisos', type=int, help='Cantidad de pisos.')
+        parser.add_argument('--unidades', type=int, help='Apartamentos por piso.')
+        parser.add_argument('--piso-inicial', type=int, default=1)
+        parser.add_argument(
+            '--patron',
+            help='Patrón de numeración, por ejemplo "{torre_letra}-{piso}{unidad:02d}". '
+                 'Variables: torre, torre_letra, piso, unidad.'
+        )
+        parser.add_argument('--archivo', help='Archivo con un número de apartamento por línea.')
+        parser.add_argument(
+            '--simular',
+            action='store_true',
+            help='Solo muestra cuántos se crearían, sin crearlos.'
+        )
+
+    def handle(self, *args, **options):
+        if options['archivo']:
+            try:
+                with open(options['archivo'], encoding='utf-8-sig', errors='replace') as archivo:
+                    numeros = leer_lista(archivo.read())
+            except OSError as e:
+                raise CommandError(f'No se pudo leer el archivo: {e}')
+        elif options['pisos'] and options['unidades']:
+            try:
+                numeros = generar_numeros(
+                    options['torres'], options['pisos'], options['unidades'],
+                    options['patron'], options['piso_inicial']
+                )
+            except ValueError as e:
+                raise CommandError(str(e))
+        else:
+            raise CommandError('Indica --pisos y --unidades, o --archivo.')
+
+        resultado = provisionar(
+            numeros,
+            simular=options['simular'],
+            al_avanzar=lambda creados, total: self.stdout.write(f'{creados}/{total} apartamento(s) creado(s)...'),
+        )
+        for numero in resultado['invalidos']:
+            self.stderr.write(f'Número demasiado largo, se omite: {numero}')
+
+        if options['simular']:
+            muestra = ', '.join(resultado['nuevos'][:10])
+            self.stdout.write(
+                f'{len(resultado["nuevos"])} apartamento(s) por crear, {resultado["existentes"]} ya existen.'
+                + (f' Primeros: {muestra}' if muestra else '')
+            )
+            return
+        self.stdout.write(self.style.SUCCESS(
+            f'{resultado["creados"]} apartamento(s) creado(s), {resultado["existentes"]} ya existían.'
+        ))
@@ -0,0 +1,25 @@
+from django.core.management.base import BaseCommand
+
+from pagoprop.cache_paginas import estadisticas, reiniciar_estadisticas
+
+
+class Command(BaseCommand):
+    help = (
+        'Muestra los aciertos y fallos de la caché de páginas de los copropietarios '
+        '(mis apartamentos, detalle de apartamento, mis comprobantes).'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--reiniciar',
+            action='store_true',
+            help='Pone los contadores en cero después de mostrarlos.'
+        )
+
+    def handle(self, *args, **options):
+        for nombre, datos in estadisticas().items():
+            tasa = f'{datos["tasa"]:.0%}' if datos['tasa'] is not None else '-'
+            self.stdout.write(f'{nombre}: {datos["aciertos"]} aciertos, {datos["fallos"]} fallos ({tasa})')
+        if options['reiniciar']:
+            reiniciar_estadisticas()
+            self.stdout.write(self.style.SUCCESS('Contadores reiniciados.'))
@@ -0,0 +1,17 @@
+from django.core.management.base import BaseCommand
+
+from pagoprop.miniaturas import generar_pendientes, rutas_sin_vista_previa
+
+
+class Command(BaseCommand):
+    help = 'Genera las miniaturas y vistas previas que faltan de los comprobantes.'
+
+    def handle(self, *args, **options):
+        rutas = rutas_sin_vista_previa()
+        if not rutas:
+            self.stdout.write(self.style.SUCCESS('Todos los comprobantes tienen vista previa.'))
+            return
+
+        self.stdout.write(f'{len(rutas)} archivo(s) sin vista previa.')
+        generadas, fallidas = generar_pendientes(rutas)
+        self.stdout.write(self.style.SUCCESS(f'{generadas} generada(s), {fallidas} sin vista previa.'))
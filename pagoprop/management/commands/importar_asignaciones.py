@@ -0,0 +1,38 @@
+from django.core.management.base import BaseCommand, CommandError
+
+from pagoprop.asignaciones import CREAR, ESTADOS, importar
+
+
+class Command(BaseCommand):
+    help = (
+        'Importa asignaciones de apartamentos desde un CSV con las columnas '
+        'usuario (username o email) y numeroApartamento.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('archivo', help='Ruta del archivo CSV.')
+        parser.add_argument(
+            '--simular',
+            action='store_true',
+            help='Solo muestra el resultado, sin crear las asignaciones.'
+        )
+
+    def handle(self, *args, **options):
+        try:
+            with open(options['archivo'], encoding='utf-8-sig', errors='replace') as archivo:
+                texto = archivo.read()
+        except OSError as e:
+            raise CommandError(f'No se pudo leer el archivo: {e}')
+
+        filas, totales = importar(texto, simular=options['simular'])
+        for fila in filas:
+            if fila.estado != CREAR:
+                self.stderr.write(
+                    f'Línea {fila.linea}: {fila.texto_usuario};{fila.texto_apartamento} - {fila.descripcion}'
+                )
+
+        accion = 'por asignar' if options['simular'] else 'asignada(s)'
+        resumen = ', '.join(f'{cantidad} {ESTADOS[estado].lower()}' for estado, cantidad in sorted(totales.items()) if estado != CREAR)
+        self.stdout.write(self.style.SUCCESS(
+            f'{totales[CREAR]} {accion}' + (f'; {resumen}.' if resumen else '.')
+        ))
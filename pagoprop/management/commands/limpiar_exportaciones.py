@@ -0,0 +1,13 @@
+from django.core.management.base import BaseCommand
+
+from pagoprop.exportacion import limpiar_exportaciones
+
+
+class Command(BaseCommand):
+    help = 'Elimina los reportes de Excel vencidos y marca como error los que quedaron colgados.'
+
+    def handle(self, *args, **options):
+        eliminadas, colgadas = limpiar_exportaciones()
+        self.stdout.write(self.style.SUCCESS(
+            f'{eliminadas} exportación(es) eliminada(s), {colgadas} marcada(s) como error.'
+        ))
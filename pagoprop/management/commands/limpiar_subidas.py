@@ -0,0 +1,11 @@
+from django.core.management.base import BaseCommand
+
+from pagoprop.subidas import limpiar_subidas
+
+
+class Command(BaseCommand):
+    help = 'Elimina las subidas por partes abandonadas y sus archivos parciales.'
+
+    def handle(self, *args, **options):
+        borradas = limpiar_subidas()
+        self.stdout.write(self.style.SUCCESS(f'{borradas} subida(s) abandonada(s) eliminada(s).'))
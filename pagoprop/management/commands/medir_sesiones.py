@@ -0,0 +1,106 @@
+import time
+
+from django.conf import settings
+from django.contrib.auth.models import update_last_login
+from django.contrib.auth.signals import user_logged_in
+from django.contrib.auth.models import User
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection
+from django.test import Client
+from django.test.utils import CaptureQueriesContext, override_settings
+from django.urls import reverse
+
+from pagoprop.sesiones import BACKEND
+
+
+MIDDLEWARE_DJANGO = 'django.contrib.auth.middleware.AuthenticationMiddleware'
+MIDDLEWARE_CACHE = 'pagoprop.sesiones.AutenticacionCacheadaMiddleware'
+
+
+class Command(BaseCommand):
+    help = (
+        'Mide las consultas por request de un usuario con la sesión y el usuario '
+        'leídos de la BD (como antes) y desde la caché (sesiones.py). '
+        'Hace requests reales con ese usuario contra la BD configurada: abre '
+        'una sesión por modo y la cierra al terminar, sin tocar su last_login.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('usuario', help='Username con el que se hacen los requests.')
+        parser.add_argument(
+            '--requests',
+            type=int,
+            default=100,
+            help='Requests por página y por modo (por defecto 100).'
+        )
+
+    def _paginas(self, usuario):
+        paginas = ['mis_apartamentos', 'mis_comprobantes', 'perfil']
+        if usuario.is_staff:
+            paginas.append('admin_dashboard')
+        return [reverse(nombre) for nombre in paginas]
+
+    def _medir(self, usuario, paginas, cantidad):
+        cliente = Client()
+        # Sin update_last_login: guardar el usuario dispararía las señales
+        # (usuario_cambiado) e invalidaría sus cachés en medio de la medición
+        conectado = user_logged_in.disconnect(dispatch_uid='update_last_login')
+        try:
+            cliente.force_login(usuario, backend=BACKEND)
+        finally:
+            if conectado:
+                user_logged_in.connect(update_last_login, dispatch_uid='update_last_login')
+        try:
+            # Primera vuelta: llenar las cachés
+            for url in paginas:
+                cliente.get(url, secure=True)
+
+            inicio = time.perf_counter()
+            with CaptureQueriesContext(connection) as consultas:
+                for _ in range(cantidad):
+                    for url in paginas:
+                        cliente.get(url, secure=True)
+            segundos = time.perf_counter() - inicio
+        finally:
+            # Borra la sesión creada (de la BD y de la caché)
+            cliente.logout()
+
+        total = cantidad * len(paginas)
+        tablas = [consulta['sql'] for consulta in consultas.captured_queries]
+        return {
+            'consultas': len(tablas) / total,
+            'sesion': sum('django_session' in sql for sql in tablas) / total,
+            'usuario': sum('"auth_user"' in sql or '`auth_user`' in sql for sql in tablas) / total,
+            'ms': segundos * 1000 / total,
+        }
+
+    def handle(self, *args, **options):
+        try:
+            usuario = User.objects.get(username=options['usuario'])
+        except User.DoesNotExist:
+            raise CommandError(f'No existe el usuario "{options["usuario"]}".')
+        if options['requests'] < 1:
+            raise CommandError('--requests debe ser al menos 1.')
+
+        paginas = self._paginas(usuario)
+        middleware_django = [MIDDLEWARE_DJANGO if m == MIDDLEWARE_CACHE else m for m in settings.MIDDLEWARE]
+        middleware_cache = [MIDDLEWARE_CACHE if m == MIDDLEWARE_DJANGO else m for m in settings.MIDDLEWARE]
+        modos = [
+            ('BD', {'SESSION_ENGINE': 'django.contrib.sessions.backends.db', 'MIDDLEWARE': middleware_django}),
+            ('caché', {'SESSION_ENGINE': 'django.contrib.sessions.backends.cached_db', 'MIDDLEWARE': middleware_cache}),
+        ]
+
+        resultados = {}
+        for nombre, ajustes in modos:
+            with override_settings(ALLOWED_HOSTS=['*'], **ajustes):
+                resultados[nombre] = self._medir(usuario, paginas, options['requests'])
+            datos = resultados[nombre]
+            self.stdout.write(
+                f'{nombre}: {datos["consultas"]:.2f} consultas por request '
+                f'(sesión {datos["sesion"]:.2f}, auth_user {datos["usuario"]:.2f}), {datos["ms"]:.1f} ms'
+            )
+
+        ahorro = resultados['BD']['consultas'] - resultados['caché']['consultas']
+        self.stdout.write(self.style.SUCCESS(
+            f'{ahorro:.2f} consultas menos por request en {", ".join(paginas)}.'
+        ))
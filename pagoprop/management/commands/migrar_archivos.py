@@ -0,0 +1,39 @@
+from django.core.management.base import BaseCommand
+
+from pagoprop.archivos import archivos_pendientes, migrar_archivo
+
+
+class Command(BaseCommand):
+    help = (
+        'Mueve los archivos de comprobantes de la carpeta plana comprobantes/ al esquema '
+        'por contenido (comprobantes/ab/cd/<sha256>), unificando los archivos repetidos.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--simular',
+            action='store_true',
+            help='Solo cuenta los archivos pendientes, sin moverlos.'
+        )
+
+    def handle(self, *args, **options):
+        pendientes = archivos_pendientes()
+
+        if options['simular']:
+            self.stdout.write(f'{len(pendientes)} archivo(s) por migrar.')
+            return
+
+        migrados = faltantes = liberados = 0
+        for archivo in pendientes:
+            resultado = migrar_archivo(archivo)
+            if resultado is None:
+                faltantes += 1
+                self.stderr.write(f'No existe en el disco: {archivo.ruta}')
+                continue
+            migrados += 1
+            liberados += resultado[1]
+
+        self.stdout.write(self.style.SUCCESS(
+            f'{migrados} archivo(s) migrado(s), {faltantes} faltante(s), '
+            f'{liberados / (1024 * 1024):.1f} MB liberados por duplicados.'
+        ))
@@ -0,0 +1,20 @@
+from django.core.management.base import BaseCommand
+
+from pagoprop.exportacion import ejecutar_exportacion
+from pagoprop.models import ExportacionComprobantes
+
+
+class Command(BaseCommand):
+    help = 'Procesa las exportaciones pendientes (útil como proceso aparte o tras un reinicio).'
+
+    def handle(self, *args, **options):
+        pendientes = ExportacionComprobantes.objects.filter(
+            estado=ExportacionComprobantes.ESTADO_PENDIENTE
+        ).order_by('fecha_creacion').values_list('exportacionID', flat=True)
+
+        procesadas = 0
+        for exportacion_id in pendientes:
+            ejecutar_exportacion(exportacion_id)
+            procesadas += 1
+
+        self.stdout.write(self.style.SUCCESS(f'{procesadas} exportación(es) procesada(s).'))
@@ -0,0 +1,31 @@
+from django.core.management.base import BaseCommand, CommandError
+
+from pagoprop.contadores import reconciliar
+
+
+class Command(BaseCommand):
+    help = (
+        'Compara los contadores por usuario (ESTADISTICAS_USUARIO) con los datos reales '
+        'y corrige las diferencias. Con --verificar solo las reporta.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--verificar',
+            action='store_true',
+            help='Solo reporta las diferencias; termina con error si encuentra alguna.'
+        )
+
+    def handle(self, *args, **options):
+        diferentes = reconciliar(reparar=not options['verificar'])
+
+        if options['verificar']:
+            if diferentes:
+                raise CommandError(
+                    f'{len(diferentes)} usuario(s) con contadores desactualizados: '
+                    + ', '.join(str(usuario_id) for usuario_id in sorted(diferentes)[:50])
+                )
+            self.stdout.write(self.style.SUCCESS('Contadores correctos.'))
+            return
+
+        self.stdout.write(self.style.SUCCESS(f'{len(diferentes)} usuario(s) corregido(s).'))
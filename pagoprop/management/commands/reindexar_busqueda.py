@@ -0,0 +1,17 @@
+from django.core.management.base import BaseCommand
+
+from pagoprop.busqueda import reconstruir
+
+
+class Command(BaseCommand):
+    help = (
+        'Vuelve a armar el índice de búsqueda (nombre, email, usuario y número de '
+        'apartamento). Normalmente lo mantienen las señales; sirve después de '
+        'cambios hechos directo en la base de datos.'
+    )
+
+    def handle(self, *args, **options):
+        usuarios, apartamentos = reconstruir()
+        self.stdout.write(self.style.SUCCESS(
+            f'Índice reconstruido: {usuarios} usuario(s) y {apartamentos} apartamento(s).'
+        ))
@@ -0,0 +1,35 @@
+from django.core.management.base import BaseCommand, CommandError
+
+from pagoprop.resumenes import calcular_desde_comprobantes, diferencias_resumen, reconstruir_resumen
+
+
+class Command(BaseCommand):
+    help = (
+        'Reconstruye el resumen mensual de pagos (RESUMEN_MENSUAL) desde los comprobantes, '
+        'o con --verificar solo lo compara sin modificarlo.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--verificar',
+            action='store_true',
+            help='Solo reporta las diferencias; termina con error si encuentra alguna.'
+        )
+
+    def handle(self, *args, **options):
+        calculado = calcular_desde_comprobantes()
+
+        if options['verificar']:
+            diferencias = diferencias_resumen(calculado)
+            for (apartamento_id, copropietario_id, periodo), esperado, actual in diferencias[:50]:
+                self.stdout.write(
+                    f'Apt. {apartamento_id} / usuario {copropietario_id} / {periodo:%Y-%m}: '
+                    f'esperado {esperado}, guardado {actual}'
+                )
+            if diferencias:
+                raise CommandError(f'{len(diferencias)} fila(s) del resumen no coinciden.')
+            self.stdout.write(self.style.SUCCESS(f'Resumen correcto ({len(calculado)} filas).'))
+            return
+
+        filas = reconstruir_resumen(calculado)
+        self.stdout.write(self.style.SUCCESS(f'Resumen reconstruido: {filas} fila(s).'))
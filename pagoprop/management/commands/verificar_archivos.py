@@ -0,0 +1,53 @@
+from django.core.management.base import BaseCommand, CommandError
+
+from pagoprop.archivos import verificar_almacenamiento
+
+
+class Command(BaseCommand):
+    help = (
+        'Compara los archivos de MEDIA_ROOT/comprobantes con la base de datos: archivos '
+        'huérfanos, comprobantes sin archivo y conteos de referencias incorrectos.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--limpiar',
+            action='store_true',
+            help='Borra los archivos huérfanos y corrige los conteos de referencias.'
+        )
+        parser.add_argument('--hilos', type=int, default=4, help='Carpetas que se leen en paralelo.')
+        parser.add_argument(
+            '--gracia',
+            type=int,
+            default=60,
+            help='Minutos: los archivos más recientes no se consideran huérfanos.'
+        )
+
+    def handle(self, *args, **options):
+        descripciones = {
+            'huerfano': 'Huérfano',
+            'colgante': 'Sin archivo',
+            'conteo': 'Conteo incorrecto',
+        }
+
+        def reportar(tipo, ruta, detalle):
+            self.stdout.write(f'{descripciones[tipo]}: {ruta} ({detalle})')
+
+        totales = verificar_almacenamiento(
+            reparar=options['limpiar'],
+            hilos=options['hilos'],
+            gracia_minutos=options['gracia'],
+            al_encontrar=reportar,
+        )
+
+        resumen = (
+            f"{totales['archivos']} archivo(s) en {totales['carpetas']} carpeta(s): "
+            f"{totales['huerfano']} huérfano(s) ({totales['bytes_huerfanos'] / (1024 * 1024):.1f} MB), "
+            f"{totales['colgante']} comprobante(s) sin archivo, {totales['conteo']} conteo(s) incorrecto(s)."
+        )
+        if options['limpiar']:
+            self.stdout.write(self.style.SUCCESS(f'{resumen} Huérfanos borrados y conteos corregidos.'))
+        elif totales['huerfano'] or totales['colgante'] or totales['conteo']:
+            raise CommandError(resumen)
+        else:
+            self.stdout.write(self.style.SUCCESS(resumen))
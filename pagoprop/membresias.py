@@ -0,0 +1,95 @@
+# pagoprop/membresias.py
+
+from collections import namedtuple
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db import transaction
+
+from .cache_versiones import incrementar_version, obtener_version
+from .models import Apartamento, PropietarioApartamento
+
+
+# Los apartamentos de cada usuario (id y número) se leen una vez por request
+# (quedan guardados en el objeto del usuario) y se comparten entre requests
+# en la caché. La llave lleva una versión por usuario que suben las señales
+# de PropietarioApartamento y Apartamento, después del commit.
+
+PREFIJO = 'pagoprop:membresias:'
+
+# Mismos nombres que el modelo, para usarlo igual en los templates
+Membresia = namedtuple('Membresia', ['apartamentoID', 'numeroApartamento'])
+
+
+def _version(usuario_id):
+    return f'membresias:{usuario_id}'
+
+
+def _instancia(membresia):
+    # Un Apartamento ya "cargado" sin ir a la BD (para asignarlo a un FK)
+    apartamento = Apartamento(
+        apartamentoID=membresia.apartamentoID,
+        numeroApartamento=membresia.numeroApartamento,
+    )
+    apartamento._state.adding = False
+    apartamento._state.db = 'default'
+    return apartamento
+
+
+def apartamentos_de(usuario):
+    """
+    Tupla de Membresia (apartamentoID, numeroApartamento) del usuario,
+    ordenada por número. Una consulta como mucho por request.
+    """
+    if usuario is None or not usuario.is_authenticated:
+        return ()
+    membresias = getattr(usuario, '_membresias', None)
+    if membresias is not None:
+        return membresias
+
+    llave = f'{PREFIJO}{usuario.pk}:{obtener_version(_version(usuario.pk))}'
+    filas = cache.get(llave)
+    if filas is None:
+        filas = list(
+            PropietarioApartamento.objects.filter(copropietario_id=usuario.pk)
+            .order_by('apartamento__numeroApartamento')
+            .values_list('apartamento_id', 'apartamento__numeroApartamento')
+        )
+        cache.set(llave, filas, timeout=settings.MEMBRESIAS_CACHE_SEGUNDOS)
+
+    membresias = tuple(Membresia(*fila) for fila in filas)
+    usuario._membresias = membresias
+    return membresias
+
+
+def ids_apartamentos(usuario):
+    return {membresia.apartamentoID for membresia in apartamentos_de(usuario)}
+
+
+def es_propietario(usuario, apartamento_id):
+    try:
+        apartamento_id = int(apartamento_id)
+    except (TypeError, ValueError):
+        return False
+    return apartamento_id in ids_apartamentos(usuario)
+
+
+def apartamento_de(usuario, apartamento_id):
+    """
+    El Apartamento (sin consulta) si el usuario es propietario, o None.
+    """
+    for membresia in apartamentos_de(usuario):
+        if str(membresia.apartamentoID) == str(apartamento_id):
+            return _instancia(membresia)
+    return None
+
+
+def invalidar_membresias(usuario_ids):
+    ids = {usuario_id for usuario_id in usuario_ids if usuario_id}
+
+    def incrementar():
+        for usuario_id in ids:
+            incrementar_version(_version(usuario_id))
+
+    if ids:
+        transaction.on_commit(incrementar)
@@ -0,0 +1,37 @@
+# Generated by Django 5.2.8 on 2026-10-18 09:55
+
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('pagoprop', '0003_alter_comprobante_archivo'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ExportacionComprobantes',
+            fields=[
+                ('exportacionID', models.AutoField(db_column='PK_exportacionID', primary_key=True, serialize=False)),
+                ('filtros', models.JSONField(default=dict)),
+                ('huella', models.CharField(db_index=True, max_length=64)),
+                ('estado', models.CharField(choices=[('pendiente', 'Pendiente'), ('procesando', 'Procesando'), ('terminado', 'Terminado'), ('error', 'Error')], default='pendiente', max_length=12)),
+                ('total_filas', models.PositiveIntegerField(default=0)),
+                ('filas_procesadas', models.PositiveIntegerField(default=0)),
+                ('archivo', models.FileField(blank=True, upload_to='exportaciones/')),
+                ('error', models.TextField(blank=True)),
+                ('fecha_creacion', models.DateTimeField(auto_now_add=True)),
+                ('fecha_fin', models.DateTimeField(blank=True, null=True)),
+                ('fecha_expiracion', models.DateTimeField(blank=True, null=True)),
+                ('solicitante', models.ForeignKey(db_column='FK_solicitanteID', on_delete=django.db.models.deletion.CASCADE, related_name='exportaciones', to=settings.AUTH_USER_MODEL)),
+            ],
+            options={
+                'db_table': 'EXPORTACION',
+                'ordering': ['-fecha_creacion'],
+            },
+        ),
+    ]
@@ -0,0 +1,27 @@
+# Generated by Django 5.2.8 on 2026-10-18 09:56
+
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('pagoprop', '0004_exportacioncomprobantes'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='comprobante',
+            index=models.Index(fields=['copropietario', 'fecha_creacion'], name='comprobante_prop_fecha_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='comprobante',
+            index=models.Index(fields=['apartamento', 'fecha_creacion'], name='comprobante_apto_fecha_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='comprobante',
+            index=models.Index(fields=['fecha_creacion', 'monto'], name='comprobante_fecha_monto_idx'),
+        ),
+    ]
@@ -0,0 +1,60 @@
+# Generated by Django 5.2.8 on 2026-10-18 09:59
+
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+from django.utils import timezone
+
+
+def llenar_resumen(apps, schema_editor):
+    # Calcular el resumen de los comprobantes que ya existen
+    Comprobante = apps.get_model('pagoprop', 'Comprobante')
+    ResumenMensual = apps.get_model('pagoprop', 'ResumenMensual')
+
+    resumen = {}
+    filas = Comprobante.objects.order_by().values_list('apartamento_id', 'copropietario_id', 'fecha_creacion', 'monto')
+    for apartamento_id, copropietario_id, fecha, monto in filas.iterator(chunk_size=2000):
+        llave = (apartamento_id, copropietario_id, timezone.localtime(fecha).date().replace(day=1))
+        datos = resumen.setdefault(llave, {'cantidad': 0, 'total': 0, 'minimo': monto, 'maximo': monto})
+        datos['cantidad'] += 1
+        datos['total'] += monto
+        datos['minimo'] = min(datos['minimo'], monto)
+        datos['maximo'] = max(datos['maximo'], monto)
+
+    ResumenMensual.objects.bulk_create(
+        [
+            ResumenMensual(apartamento_id=apartamento_id, copropietario_id=copropietario_id, periodo=periodo, **datos)
+            for (apartamento_id, copropietario_id, periodo), datos in resumen.items()
+        ],
+        batch_size=1000
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('pagoprop', '0005_comprobante_indices'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ResumenMensual',
+            fields=[
+                ('resumenID', models.AutoField(db_column='PK_resumenID', primary_key=True, serialize=False)),
+                ('periodo', models.DateField()),
+                ('cantidad', models.PositiveIntegerField(default=0)),
+                ('total', models.DecimalField(decimal_places=2, default=0, max_digits=14)),
+                ('minimo', models.DecimalField(decimal_places=2, max_digits=10)),
+                ('maximo', models.DecimalField(decimal_places=2, max_digits=10)),
+                ('apartamento', models.ForeignKey(db_column='FK_apartamentoID', on_delete=django.db.models.deletion.CASCADE, related_name='resumenes_mensuales', to='pagoprop.apartamento')),
+                ('copropietario', models.ForeignKey(db_column='FK_copropietarioID', on_delete=django.db.models.deletion.CASCADE, related_name='resumenes_mensuales', to=settings.AUTH_USER_MODEL)),
+            ],
+            options={
+                'db_table': 'RESUMEN_MENSUAL',
+                'ordering': ['-periodo'],
+                'unique_together': {('apartamento', 'copropietario', 'periodo')},
+            },
+        ),
+        migrations.RunPython(llenar_resumen, migrations.RunPython.noop),
+    ]
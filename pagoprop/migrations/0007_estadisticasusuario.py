@@ -0,0 +1,29 @@
+# Generated by Django 5.2.8 on 2026-10-18 10:02
+
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('auth', '0012_alter_user_first_name_max_length'),
+        ('pagoprop', '0006_resumenmensual'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='EstadisticasUsuario',
+            fields=[
+                ('copropietario', models.OneToOneField(db_column='FK_copropietarioID', on_delete=django.db.models.deletion.CASCADE, primary_key=True, related_name='estadisticas', serialize=False, to=settings.AUTH_USER_MODEL)),
+                ('total_apartamentos', models.PositiveIntegerField(default=0)),
+                ('total_comprobantes', models.PositiveIntegerField(default=0)),
+                ('total_pagado', models.DecimalField(decimal_places=2, default=0, max_digits=14)),
+                ('ultimo_comprobante', models.DateTimeField(blank=True, null=True)),
+            ],
+            options={
+                'db_table': 'ESTADISTICAS_USUARIO',
+            },
+        ),
+    ]
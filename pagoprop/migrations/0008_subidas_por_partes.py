@@ -0,0 +1,38 @@
+# Generated by Django 5.2.8 on 2026-10-18 10:03
+
+import django.db.models.deletion
+import uuid
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('pagoprop', '0007_estadisticasusuario'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='comprobante',
+            name='sha256',
+            field=models.CharField(blank=True, db_index=True, max_length=64),
+        ),
+        migrations.CreateModel(
+            name='SubidaComprobante',
+            fields=[
+                ('subidaID', models.AutoField(db_column='PK_subidaID', primary_key=True, serialize=False)),
+                ('token', models.UUIDField(default=uuid.uuid4, editable=False, unique=True)),
+                ('nombre_archivo', models.CharField(max_length=255)),
+                ('tamano', models.PositiveBigIntegerField()),
+                ('bytes_recibidos', models.PositiveBigIntegerField(default=0)),
+                ('fecha_creacion', models.DateTimeField(auto_now_add=True)),
+                ('fecha_actualizacion', models.DateTimeField(auto_now=True)),
+                ('usuario', models.ForeignKey(db_column='FK_usuarioID', on_delete=django.db.models.deletion.CASCADE, related_name='subidas', to=settings.AUTH_USER_MODEL)),
+            ],
+            options={
+                'db_table': 'SUBIDA_COMPROBANTE',
+            },
+        ),
+    ]
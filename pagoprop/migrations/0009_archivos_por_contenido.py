@@ -0,0 +1,47 @@
+# Generated by Django 5.2.8 on 2026-10-18 10:07
+
+import pagoprop.almacenamiento
+from django.db import migrations, models
+from django.db.models import Count
+
+
+def contar_referencias(apps, schema_editor):
+    # Una fila por cada archivo que ya usan los comprobantes existentes
+    Comprobante = apps.get_model('pagoprop', 'Comprobante')
+    ArchivoComprobante = apps.get_model('pagoprop', 'ArchivoComprobante')
+
+    filas = Comprobante.objects.exclude(archivo='').order_by().values('archivo').annotate(referencias=Count('pk'))
+    ArchivoComprobante.objects.bulk_create(
+        (ArchivoComprobante(ruta=fila['archivo'], referencias=fila['referencias']) for fila in filas.iterator()),
+        batch_size=1000
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('pagoprop', '0008_subidas_por_partes'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ArchivoComprobante',
+            fields=[
+                ('archivoID', models.AutoField(db_column='PK_archivoID', primary_key=True, serialize=False)),
+                ('ruta', models.CharField(max_length=100, unique=True)),
+                ('sha256', models.CharField(blank=True, db_index=True, max_length=64)),
+                ('tamano', models.PositiveBigIntegerField(default=0)),
+                ('referencias', models.PositiveIntegerField(default=0)),
+                ('fecha_creacion', models.DateTimeField(auto_now_add=True)),
+            ],
+            options={
+                'db_table': 'ARCHIVO_COMPROBANTE',
+            },
+        ),
+        migrations.AlterField(
+            model_name='comprobante',
+            name='archivo',
+            field=models.FileField(storage=pagoprop.almacenamiento.almacenamiento_comprobantes, upload_to='comprobantes/'),
+        ),
+        migrations.RunPython(contar_referencias, migrations.RunPython.noop),
+    ]
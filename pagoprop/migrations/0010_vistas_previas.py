@@ -0,0 +1,23 @@
+# Generated by Django 5.2.8 on 2026-10-18 10:08
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('pagoprop', '0009_archivos_por_contenido'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='comprobante',
+            name='miniatura',
+            field=models.FileField(blank=True, max_length=120, upload_to='comprobantes/'),
+        ),
+        migrations.AddField(
+            model_name='comprobante',
+            name='vista_previa',
+            field=models.FileField(blank=True, max_length=120, upload_to='comprobantes/'),
+        ),
+    ]
@@ -0,0 +1,19 @@
+# Generated by Django 5.2.8 on 2026-10-18 10:10
+
+import pagoprop.almacenamiento
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('pagoprop', '0010_vistas_previas'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='comprobante',
+            name='archivo_original',
+            field=models.FileField(blank=True, storage=pagoprop.almacenamiento.almacenamiento_comprobantes, upload_to='comprobantes/'),
+        ),
+    ]
@@ -0,0 +1,19 @@
+# Generated by Django 5.2.8 on 2026-10-18 10:14
+
+import pagoprop.almacenamiento
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('pagoprop', '0011_archivo_original'),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name='comprobante',
+            name='archivo',
+            field=models.FileField(db_index=True, storage=pagoprop.almacenamiento.almacenamiento_comprobantes, upload_to='comprobantes/'),
+        ),
+    ]
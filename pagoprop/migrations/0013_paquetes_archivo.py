@@ -0,0 +1,47 @@
+# Generated by Django 5.2.8 on 2026-10-18 10:15
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('pagoprop', '0012_comprobante_archivo_indice'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='PaqueteArchivo',
+            fields=[
+                ('paqueteID', models.AutoField(db_column='PK_paqueteID', primary_key=True, serialize=False)),
+                ('nombre', models.CharField(max_length=100, unique=True)),
+                ('tamano', models.PositiveBigIntegerField(default=0)),
+                ('cerrado', models.BooleanField(default=False)),
+                ('fecha_creacion', models.DateTimeField(auto_now_add=True)),
+            ],
+            options={
+                'db_table': 'PAQUETE_ARCHIVO',
+            },
+        ),
+        migrations.AddField(
+            model_name='archivocomprobante',
+            name='comprimido',
+            field=models.BooleanField(default=False),
+        ),
+        migrations.AddField(
+            model_name='archivocomprobante',
+            name='desplazamiento',
+            field=models.PositiveBigIntegerField(blank=True, null=True),
+        ),
+        migrations.AddField(
+            model_name='archivocomprobante',
+            name='longitud',
+            field=models.PositiveBigIntegerField(blank=True, null=True),
+        ),
+        migrations.AddField(
+            model_name='archivocomprobante',
+            name='paquete',
+            field=models.ForeignKey(blank=True, db_column='FK_paqueteID', null=True, on_delete=django.db.models.deletion.PROTECT, related_name='archivos', to='pagoprop.paquetearchivo'),
+        ),
+    ]
@@ -0,0 +1,38 @@
+# Generated by Django 5.2.8 on 2026-10-18 11:02
+
+from django.conf import settings
+from django.db import migrations, models
+
+
+# Índices en auth_user para el autocompletado de la pantalla de asignaciones
+# (búsqueda por prefijo de nombre, apellido o email). auth es de Django, así
+# que se crean a mano con el schema_editor.
+INDICES = [
+    models.Index(fields=['first_name', 'last_name'], name='auth_user_nombre_idx'),
+    models.Index(fields=['last_name'], name='auth_user_apellido_idx'),
+    models.Index(fields=['email'], name='auth_user_email_idx'),
+]
+
+
+def crear_indices(apps, schema_editor):
+    User = apps.get_model('auth', 'User')
+    for indice in INDICES:
+        schema_editor.add_index(User, indice)
+
+
+def borrar_indices(apps, schema_editor):
+    User = apps.get_model('auth', 'User')
+    for indice in INDICES:
+        schema_editor.remove_index(User, indice)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('pagoprop', '0013_paquetes_archivo'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.RunPython(crear_indices, borrar_indices),
+    ]
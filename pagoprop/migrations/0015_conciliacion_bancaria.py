@@ -0,0 +1,55 @@
+# Generated by Django 5.2.8 on 2026-10-18 10:30
+
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('pagoprop', '0014_indices_busqueda_usuarios'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ExtractoBancario',
+            fields=[
+                ('extractoID', models.AutoField(db_column='PK_extractoID', primary_key=True, serialize=False)),
+                ('nombre_archivo', models.CharField(max_length=255)),
+                ('sha256', models.CharField(max_length=64, unique=True)),
+                ('fecha_desde', models.DateField(blank=True, null=True)),
+                ('fecha_hasta', models.DateField(blank=True, null=True)),
+                ('total_movimientos', models.PositiveIntegerField(default=0)),
+                ('tolerancia_dias', models.PositiveSmallIntegerField(default=3)),
+                ('fecha_creacion', models.DateTimeField(auto_now_add=True)),
+                ('fecha_conciliacion', models.DateTimeField(blank=True, null=True)),
+                ('subido_por', models.ForeignKey(blank=True, db_column='FK_subidoPorID', null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='extractos', to=settings.AUTH_USER_MODEL)),
+            ],
+            options={
+                'db_table': 'EXTRACTO_BANCARIO',
+                'ordering': ['-fecha_creacion'],
+            },
+        ),
+        migrations.CreateModel(
+            name='MovimientoBancario',
+            fields=[
+                ('movimientoID', models.AutoField(db_column='PK_movimientoID', primary_key=True, serialize=False)),
+                ('linea', models.PositiveIntegerField()),
+                ('fecha', models.DateField()),
+                ('monto', models.DecimalField(decimal_places=2, max_digits=12)),
+                ('descripcion', models.CharField(blank=True, max_length=255)),
+                ('referencia', models.CharField(blank=True, max_length=100)),
+                ('estado', models.CharField(choices=[('pendiente', 'Pendiente'), ('conciliado', 'Conciliado'), ('ambiguo', 'Ambiguo'), ('sin_coincidencia', 'Sin coincidencia')], default='pendiente', max_length=16)),
+                ('candidatos', models.JSONField(blank=True, default=list)),
+                ('comprobante', models.OneToOneField(blank=True, db_column='FK_comprobanteID', null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='movimiento_bancario', to='pagoprop.comprobante')),
+                ('extracto', models.ForeignKey(db_column='FK_extractoID', on_delete=django.db.models.deletion.CASCADE, related_name='movimientos', to='pagoprop.extractobancario')),
+            ],
+            options={
+                'db_table': 'MOVIMIENTO_BANCARIO',
+                'ordering': ['fecha', 'movimientoID'],
+                'indexes': [models.Index(fields=['extracto', 'estado'], name='movimiento_extracto_estado_idx')],
+            },
+        ),
+    ]
@@ -0,0 +1,90 @@
+# Generated by Django 5.2.8 on 2026-10-18 10:35
+
+import re
+import unicodedata
+
+from django.conf import settings
+from django.db import migrations, models
+
+
+# Copia de la tokenización de busqueda.py al momento de esta migración, para
+# que cambios posteriores allá no cambien lo que produce. Si la tokenización
+# cambia, el índice se vuelve a armar con `manage.py reindexar_busqueda`.
+LARGO_TERMINO = 64
+
+
+def normalizar(texto):
+    texto = unicodedata.normalize('NFKD', str(texto or ''))
+    return ''.join(letra for letra in texto if not unicodedata.combining(letra)).lower().strip()
+
+
+def palabras(texto):
+    return {palabra[:LARGO_TERMINO] for palabra in re.findall(r'[^\W_]+', normalizar(texto))}
+
+
+def terminos_usuario(username, first_name, last_name, email):
+    terminos = palabras(first_name) | palabras(last_name) | palabras(username) | palabras(email)
+    for texto in (username, email):
+        texto = normalizar(texto)
+        if texto:
+            terminos.add(texto[:LARGO_TERMINO])
+    return terminos
+
+
+def terminos_apartamento(numero):
+    terminos = palabras(numero)
+    numero = re.sub(r'\s+', '', normalizar(numero))
+    for texto in (numero, re.sub(r'[\W_]+', '', numero)):
+        if texto:
+            terminos.add(texto[:LARGO_TERMINO])
+    return terminos
+
+
+# Llena el índice con los usuarios y apartamentos que ya existen; desde
+# aquí lo mantienen las señales (ver busqueda.py)
+def llenar_indice(apps, schema_editor):
+    User = apps.get_model('auth', 'User')
+    Apartamento = apps.get_model('pagoprop', 'Apartamento')
+    TerminoBusqueda = apps.get_model('pagoprop', 'TerminoBusqueda')
+
+    def filas():
+        for usuario_id, *datos in User.objects.values_list('id', 'username', 'first_name', 'last_name', 'email').iterator():
+            for termino in terminos_usuario(*datos):
+                yield TerminoBusqueda(tipo='usuario', objeto_id=usuario_id, termino=termino)
+        for apartamento_id, numero in Apartamento.objects.values_list('apartamentoID', 'numeroApartamento').iterator():
+            for termino in terminos_apartamento(numero):
+                yield TerminoBusqueda(tipo='apartamento', objeto_id=apartamento_id, termino=termino)
+
+    lote = []
+    for fila in filas():
+        lote.append(fila)
+        if len(lote) == 1000:
+            TerminoBusqueda.objects.bulk_create(lote)
+            lote = []
+    TerminoBusqueda.objects.bulk_create(lote)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('pagoprop', '0015_conciliacion_bancaria'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='TerminoBusqueda',
+            fields=[
+                ('terminoID', models.AutoField(db_column='PK_terminoID', primary_key=True, serialize=False)),
+                ('tipo', models.CharField(choices=[('usuario', 'Usuario'), ('apartamento', 'Apartamento')], max_length=12)),
+                ('objeto_id', models.PositiveIntegerField()),
+                ('termino', models.CharField(max_length=64)),
+            ],
+            options={
+                'db_table': 'TERMINO_BUSQUEDA',
+                'indexes': [models.Index(fields=['tipo', 'objeto_id'], name='termino_tipo_objeto_idx')],
+                'unique_together': {('tipo', 'termino', 'objeto_id')},
+            },
+        ),
+        migrations.RunPython(llenar_indice, migrations.RunPython.noop),
+    ]
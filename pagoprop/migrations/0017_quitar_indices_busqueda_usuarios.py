@@ -0,0 +1,39 @@
+# Generated by Django 5.2.8 on 2026-10-18 12:10
+
+from django.conf import settings
+from django.db import migrations, models
+
+
+# Los índices de auth_user de 0014 eran para buscar por prefijo de nombre,
+# apellido o email. Desde 0016 esas búsquedas van por TERMINO_BUSQUEDA, así
+# que ya no se usan y solo cuestan escrituras (last_login en cada login,
+# editar el perfil).
+INDICES = [
+    models.Index(fields=['first_name', 'last_name'], name='auth_user_nombre_idx'),
+    models.Index(fields=['last_name'], name='auth_user_apellido_idx'),
+    models.Index(fields=['email'], name='auth_user_email_idx'),
+]
+
+
+def borrar_indices(apps, schema_editor):
+    User = apps.get_model('auth', 'User')
+    for indice in INDICES:
+        schema_editor.remove_index(User, indice)
+
+
+def crear_indices(apps, schema_editor):
+    User = apps.get_model('auth', 'User')
+    for indice in INDICES:
+        schema_editor.add_index(User, indice)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('pagoprop', '0016_indice_busqueda'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.RunPython(borrar_indices, crear_indices),
+    ]
@@ -0,0 +1,145 @@
+# pagoprop/miniaturas.py
+
+import logging
+import threading
+from concurrent.futures import ProcessPoolExecutor
+
+from django.conf import settings
+from django.core.files.storage import default_storage
+from django.db import close_old_connections, transaction
+
+from .almacenamiento import almacenamiento_comprobantes, rutas_vistas_previas
+from .cache_paginas import invalidar_por_archivo
+from .imagenes import generar_vistas_previas
+from .models import Comprobante
+from .tablero import invalidar_tablero
+
+logger = logging.getLogger(__name__)
+
+
+# ---------------------------------------------------------------------------
+# Pool de procesos
+# ---------------------------------------------------------------------------
+# Redimensionar fotos es trabajo de CPU: con procesos no se bloquea el GIL
+# de los hilos que atienden requests.
+
+_pool = None
+_pool_lock = threading.Lock()
+
+
+def obtener_pool():
+    # El pool se crea la primera vez que se usa, uno por proceso (también lo usa normalizacion.py)
+    global _pool
+    with _pool_lock:
+        if _pool is None:
+            _pool = ProcessPoolExecutor(max_workers=settings.MINIATURAS_PROCESOS)
+        return _pool
+
+
+def _argumentos(ruta):
+    # Rutas absolutas y tamaños: lo único que necesita el proceso hijo
+    miniatura, vista = rutas_vistas_previas(ruta)
+    return (
+        almacenamiento_comprobantes().path(ruta),
+        default_storage.path(miniatura),
+        default_storage.path(vista),
+        settings.MINIATURA_LADO,
+        settings.VISTA_PREVIA_LADO,
+        settings.MINIATURA_CALIDAD,
+    )
+
+
+def registrar(ruta):
+    # Todos los comprobantes con ese archivo comparten las vistas previas
+    miniatura, vista = rutas_vistas_previas(ruta)
+    actualizados = Comprobante.objects.filter(archivo=ruta).update(miniatura=miniatura, vista_previa=vista)
+    if actualizados:
+        # Los comprobantes recientes del tablero y las páginas de sus dueños están en caché
+        invalidar_tablero()
+        invalidar_por_archivo(ruta)
+    return actualizados
+
+
+def _ya_generadas(ruta):
+    return all(default_storage.exists(nombre) for nombre in rutas_vistas_previas(ruta))
+
+
+def _al_terminar(ruta, futuro):
+    try:
+        if futuro.result():
+            registrar(ruta)
+    except Exception:
+        logger.exception('Error generando la vista previa de %s', ruta)
+    finally:
+        # El callback corre fuera del ciclo de request, cerramos la conexión a mano
+        close_old_connections()
+
+
+def encolar(ruta):
+    """
+    Pide las vistas previas de un archivo. Si ya existen (el mismo archivo
+    se subió antes) solo se registran en los comprobantes.
+    """
+    if not ruta:
+        return
+    if _ya_generadas(ruta):
+        registrar(ruta)
+        return
+    if not almacenamiento_comprobantes().exists(ruta):
+        # Archivado en un paquete (ver paquetes.py): no se generan desde ahí
+        return
+    futuro = obtener_pool().submit(generar_vistas_previas, *_argumentos(ruta))
+    futuro.add_done_callback(lambda f: _al_terminar(ruta, f))
+
+
+def comprobante_guardado(comprobante, created, anterior):
+    # Solo cuando el archivo es nuevo o se reemplazó
+    ruta = comprobante.archivo.name
+    if not created and anterior is not None and anterior['archivo'] == ruta:
+        return
+    transaction.on_commit(lambda: encolar(ruta))
+
+
+# ---------------------------------------------------------------------------
+# Generación de las que faltan (comando generar_miniaturas)
+# ---------------------------------------------------------------------------
+
+def rutas_sin_vista_previa():
+    return list(
+        Comprobante.objects.filter(miniatura='').exclude(archivo='')
+        .order_by().values_list('archivo', flat=True).distinct()
+    )
+
+
+def generar_pendientes(rutas, al_avanzar=None):
+    """
+    Genera las vistas previas de esas rutas repartiendo el trabajo en el
+    pool. Devuelve (generadas, fallidas).
+    """
+    generadas = fallidas = 0
+    por_generar = []
+    for ruta in rutas:
+        if _ya_generadas(ruta):
+            registrar(ruta)
+            generadas += 1
+        elif almacenamiento_comprobantes().exists(ruta):
+            por_generar.append(ruta)
+        else:
+            fallidas += 1
+
+    pool = obtener_pool()
+    futuros = [(ruta, pool.submit(generar_vistas_previas, *_argumentos(ruta))) for ruta in por_generar]
+    for ruta, futuro in futuros:
+        try:
+            ok = futuro.result()
+        except Exception as e:
+            logger.warning('No se pudo generar la vista previa de %s: %s', ruta, e)
+            ok = False
+        if ok:
+            registrar(ruta)
+            generadas += 1
+        else:
+            fallidas += 1
+        if al_avanzar:
+            al_avanzar(generadas + fallidas)
+    return generadas, fallidas
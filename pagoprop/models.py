@@ -1,5 +1,12 @@
+import os
+import uuid
+
+from django.conf import settings
 from django.db import models
 from django.contrib.auth.models import User
+from django.utils import timezone
+
+from .almacenamiento import almacenamiento_comprobantes
 
 # Modelo APARTAMENTO
 class Apartamento(models.Model):
@@ -42,7 +49,9 @@ class PropietarioApartamento(models.Model):
 # Modelo COMPROBANTE
 class Comprobante(models.Model):
     comprobanteID = models.AutoField(primary_key=True, db_column='PK_comprobanteID')
-    archivo = models.FileField(upload_to='comprobantes/') #aca elimino el null true y blank true para que no permita valores nulos en el formulario
+    # Se guarda por contenido: comprobantes/ab/cd/<sha256>.pdf (ver almacenamiento.py)
+    # Con índice: las referencias y la verificación del almacenamiento buscan por ruta
+    archivo = models.FileField(upload_to='comprobantes/', storage=almacenamiento_comprobantes, db_index=True) #aca elimino el null true y blank true para que no permita valores nulos en el formulario
     monto = models.DecimalField(max_digits=10, decimal_places=2)
     copropietario = models.ForeignKey(
         'auth.User',  # Hace referencia a la tabla auth_user
@@ -57,11 +66,315 @@ class Comprobante(models.Model):
         related_name='comprobantes'
     )
     fecha_creacion = models.DateTimeField(auto_now_add=True)
+    # SHA-256 del archivo (también sirve para detectar comprobantes repetidos)
+    sha256 = models.CharField(max_length=64, blank=True, db_index=True)
+    # Foto tal como se subió, solo si NORMALIZACION_CONSERVAR_ORIGINAL está activo
+    archivo_original = models.FileField(upload_to='comprobantes/', storage=almacenamiento_comprobantes, blank=True)
+    # Vistas previas en WebP junto al archivo; las genera miniaturas.py en segundo plano
+    miniatura = models.FileField(upload_to='comprobantes/', max_length=120, blank=True)
+    vista_previa = models.FileField(upload_to='comprobantes/', max_length=120, blank=True)
     
     class Meta:
         db_table = 'COMPROBANTE'
         ordering = ['-fecha_creacion']
+        # Índices para los listados filtrados por rango de fechas (ver filtros.py)
+        indexes = [
+            models.Index(fields=['copropietario', 'fecha_creacion'], name='comprobante_prop_fecha_idx'),
+            models.Index(fields=['apartamento', 'fecha_creacion'], name='comprobante_apto_fecha_idx'),
+            models.Index(fields=['fecha_creacion', 'monto'], name='comprobante_fecha_monto_idx'),
+        ]
     
     def __str__(self):
         return f"Comprobante ${self.monto} - {self.copropietario.username}"
 
+
+
+# Modelo PAQUETE_ARCHIVO (archivos de solo-agregar con comprobantes antiguos, ver paquetes.py)
+class PaqueteArchivo(models.Model):
+    paqueteID = models.AutoField(primary_key=True, db_column='PK_paqueteID')
+    # Relativo a ARCHIVO_FRIO_ROOT
+    nombre = models.CharField(max_length=100, unique=True)
+    tamano = models.PositiveBigIntegerField(default=0)
+    cerrado = models.BooleanField(default=False)
+    fecha_creacion = models.DateTimeField(auto_now_add=True)
+
+    class Meta:
+        db_table = 'PAQUETE_ARCHIVO'
+
+    def __str__(self):
+        return self.nombre
+
+
+# Modelo ARCHIVO_COMPROBANTE (cuántos comprobantes usan cada archivo guardado)
+class ArchivoComprobante(models.Model):
+    archivoID = models.AutoField(primary_key=True, db_column='PK_archivoID')
+    # Mismo valor que Comprobante.archivo
+    ruta = models.CharField(max_length=100, unique=True)
+    sha256 = models.CharField(max_length=64, blank=True, db_index=True)
+    tamano = models.PositiveBigIntegerField(default=0)
+    referencias = models.PositiveIntegerField(default=0)
+    fecha_creacion = models.DateTimeField(auto_now_add=True)
+    # Si el archivo se archivó: en qué paquete y en qué posición está
+    paquete = models.ForeignKey(
+        PaqueteArchivo,
+        on_delete=models.PROTECT,
+        null=True,
+        blank=True,
+        db_column='FK_paqueteID',
+        related_name='archivos'
+    )
+    desplazamiento = models.PositiveBigIntegerField(null=True, blank=True)
+    longitud = models.PositiveBigIntegerField(null=True, blank=True)
+    comprimido = models.BooleanField(default=False)
+
+    class Meta:
+        db_table = 'ARCHIVO_COMPROBANTE'
+
+    def __str__(self):
+        return f"{self.ruta} ({self.referencias})"
+
+
+# Modelo EXPORTACION (reportes de Excel generados en segundo plano)
+class ExportacionComprobantes(models.Model):
+    ESTADO_PENDIENTE = 'pendiente'
+    ESTADO_PROCESANDO = 'procesando'
+    ESTADO_TERMINADO = 'terminado'
+    ESTADO_ERROR = 'error'
+    ESTADOS = [
+        (ESTADO_PENDIENTE, 'Pendiente'),
+        (ESTADO_PROCESANDO, 'Procesando'),
+        (ESTADO_TERMINADO, 'Terminado'),
+        (ESTADO_ERROR, 'Error'),
+    ]
+
+    exportacionID = models.AutoField(primary_key=True, db_column='PK_exportacionID')
+    solicitante = models.ForeignKey(
+        'auth.User',
+        on_delete=models.CASCADE,
+        db_column='FK_solicitanteID',
+        related_name='exportaciones'
+    )
+    # Filtros normalizados (mismos campos de FiltroComprobantesForm) y su hash
+    filtros = models.JSONField(default=dict)
+    huella = models.CharField(max_length=64, db_index=True)
+    estado = models.CharField(max_length=12, choices=ESTADOS, default=ESTADO_PENDIENTE)
+    total_filas = models.PositiveIntegerField(default=0)
+    filas_procesadas = models.PositiveIntegerField(default=0)
+    archivo = models.FileField(upload_to='exportaciones/', blank=True)
+    error = models.TextField(blank=True)
+    fecha_creacion = models.DateTimeField(auto_now_add=True)
+    fecha_fin = models.DateTimeField(null=True, blank=True)
+    fecha_expiracion = models.DateTimeField(null=True, blank=True)
+
+    class Meta:
+        db_table = 'EXPORTACION'
+        ordering = ['-fecha_creacion']
+
+    def __str__(self):
+        return f"Exportación {self.exportacionID} - {self.get_estado_display()}"
+
+    @property
+    def progreso(self):
+        # Porcentaje de filas escritas (0 a 100)
+        if self.estado == self.ESTADO_TERMINADO:
+            return 100
+        if not self.total_filas:
+            return 0
+        return min(99, int(self.filas_procesadas * 100 / self.total_filas))
+
+    @property
+    def vencida(self):
+        return self.fecha_expiracion is not None and self.fecha_expiracion <= timezone.now()
+
+
+# Modelo RESUMEN_MENSUAL (totales precalculados por apartamento, copropietario y mes)
+class ResumenMensual(models.Model):
+    resumenID = models.AutoField(primary_key=True, db_column='PK_resumenID')
+    apartamento = models.ForeignKey(
+        Apartamento,
+        on_delete=models.CASCADE,
+        db_column='FK_apartamentoID',
+        related_name='resumenes_mensuales'
+    )
+    copropietario = models.ForeignKey(
+        'auth.User',
+        on_delete=models.CASCADE,
+        db_column='FK_copropietarioID',
+        related_name='resumenes_mensuales'
+    )
+    # Primer día del mes (en la zona horaria configurada)
+    periodo = models.DateField()
+    cantidad = models.PositiveIntegerField(default=0)
+    total = models.DecimalField(max_digits=14, decimal_places=2, default=0)
+    minimo = models.DecimalField(max_digits=10, decimal_places=2)
+    maximo = models.DecimalField(max_digits=10, decimal_places=2)
+
+    class Meta:
+        db_table = 'RESUMEN_MENSUAL'
+        unique_together = ('apartamento', 'copropietario', 'periodo')
+        ordering = ['-periodo']
+
+    def __str__(self):
+        return f"Apt. {self.apartamento_id} - {self.copropietario_id} - {self.periodo:%Y-%m}"
+
+
+# Modelo ESTADISTICAS_USUARIO (contadores del dashboard de cada copropietario)
+class EstadisticasUsuario(models.Model):
+    copropietario = models.OneToOneField(
+        'auth.User',
+        on_delete=models.CASCADE,
+        primary_key=True,
+        db_column='FK_copropietarioID',
+        related_name='estadisticas'
+    )
+    total_apartamentos = models.PositiveIntegerField(default=0)
+    total_comprobantes = models.PositiveIntegerField(default=0)
+    total_pagado = models.DecimalField(max_digits=14, decimal_places=2, default=0)
+    ultimo_comprobante = models.DateTimeField(null=True, blank=True)
+
+    class Meta:
+        db_table = 'ESTADISTICAS_USUARIO'
+
+    def __str__(self):
+        return f"Estadísticas de {self.copropietario_id}"
+
+
+# Modelo SUBIDA_COMPROBANTE (subida por partes, reanudable)
+class SubidaComprobante(models.Model):
+    subidaID = models.AutoField(primary_key=True, db_column='PK_subidaID')
+    # Identificador público de la subida (va en la URL)
+    token = models.UUIDField(default=uuid.uuid4, unique=True, editable=False)
+    usuario = models.ForeignKey(
+        'auth.User',
+        on_delete=models.CASCADE,
+        db_column='FK_usuarioID',
+        related_name='subidas'
+    )
+    nombre_archivo = models.CharField(max_length=255)
+    tamano = models.PositiveBigIntegerField()
+    bytes_recibidos = models.PositiveBigIntegerField(default=0)
+    fecha_creacion = models.DateTimeField(auto_now_add=True)
+    fecha_actualizacion = models.DateTimeField(auto_now=True)
+
+    class Meta:
+        db_table = 'SUBIDA_COMPROBANTE'
+
+    def __str__(self):
+        return f"Subida {self.token} ({self.bytes_recibidos}/{self.tamano})"
+
+    @property
+    def ruta_parcial(self):
+        # Archivo donde se van escribiendo los fragmentos
+        return os.path.join(settings.SUBIDAS_PARCIALES_ROOT, f'{self.token}.part')
+
+    @property
+    def completa(self):
+        return self.bytes_recibidos == self.tamano
+
+
+# Modelo EXTRACTO_BANCARIO (extractos del banco importados para conciliar, ver conciliacion.py)
+class ExtractoBancario(models.Model):
+    extractoID = models.AutoField(primary_key=True, db_column='PK_extractoID')
+    nombre_archivo = models.CharField(max_length=255)
+    # El mismo archivo importado dos veces es el mismo extracto
+    sha256 = models.CharField(max_length=64, unique=True)
+    subido_por = models.ForeignKey(
+        'auth.User',
+        on_delete=models.SET_NULL,
+        null=True,
+        blank=True,
+        db_column='FK_subidoPorID',
+        related_name='extractos'
+    )
+    fecha_desde = models.DateField(null=True, blank=True)
+    fecha_hasta = models.DateField(null=True, blank=True)
+    total_movimientos = models.PositiveIntegerField(default=0)
+    # Días de diferencia aceptados entre el movimiento y el comprobante
+    tolerancia_dias = models.PositiveSmallIntegerField(default=3)
+    fecha_creacion = models.DateTimeField(auto_now_add=True)
+    fecha_conciliacion = models.DateTimeField(null=True, blank=True)
+
+    class Meta:
+        db_table = 'EXTRACTO_BANCARIO'
+        ordering = ['-fecha_creacion']
+
+    def __str__(self):
+        return f"Extracto {self.extractoID} - {self.nombre_archivo}"
+
+
+# Modelo MOVIMIENTO_BANCARIO (consignaciones de un extracto y su comprobante, si se encontró)
+class MovimientoBancario(models.Model):
+    ESTADO_PENDIENTE = 'pendiente'
+    ESTADO_CONCILIADO = 'conciliado'
+    ESTADO_AMBIGUO = 'ambiguo'
+    ESTADO_SIN_COINCIDENCIA = 'sin_coincidencia'
+    ESTADOS = [
+        (ESTADO_PENDIENTE, 'Pendiente'),
+        (ESTADO_CONCILIADO, 'Conciliado'),
+        (ESTADO_AMBIGUO, 'Ambiguo'),
+        (ESTADO_SIN_COINCIDENCIA, 'Sin coincidencia'),
+    ]
+
+    movimientoID = models.AutoField(primary_key=True, db_column='PK_movimientoID')
+    extracto = models.ForeignKey(
+        ExtractoBancario,
+        on_delete=models.CASCADE,
+        db_column='FK_extractoID',
+        related_name='movimientos'
+    )
+    # Línea del archivo, para ubicarlo en el extracto original
+    linea = models.PositiveIntegerField()
+    fecha = models.DateField()
+    monto = models.DecimalField(max_digits=12, decimal_places=2)
+    descripcion = models.CharField(max_length=255, blank=True)
+    referencia = models.CharField(max_length=100, blank=True)
+    estado = models.CharField(max_length=16, choices=ESTADOS, default=ESTADO_PENDIENTE)
+    # Un comprobante se concilia con un solo movimiento (de cualquier extracto)
+    comprobante = models.OneToOneField(
+        Comprobante,
+        on_delete=models.SET_NULL,
+        null=True,
+        blank=True,
+        db_column='FK_comprobanteID',
+        related_name='movimiento_bancario'
+    )
+    # Ids de los comprobantes posibles cuando es ambiguo
+    candidatos = models.JSONField(default=list, blank=True)
+
+    class Meta:
+        db_table = 'MOVIMIENTO_BANCARIO'
+        ordering = ['fecha', 'movimientoID']
+        indexes = [
+            models.Index(fields=['extracto', 'estado'], name='movimiento_extracto_estado_idx'),
+        ]
+
+    def __str__(self):
+        return f"Movimiento {self.fecha} ${self.monto} ({self.get_estado_display()})"
+
+
+# Modelo TERMINO_BUSQUEDA (índice de búsqueda de usuarios y apartamentos, ver busqueda.py)
+class TerminoBusqueda(models.Model):
+    TIPO_USUARIO = 'usuario'
+    TIPO_APARTAMENTO = 'apartamento'
+    TIPOS = [
+        (TIPO_USUARIO, 'Usuario'),
+        (TIPO_APARTAMENTO, 'Apartamento'),
+    ]
+
+    terminoID = models.AutoField(primary_key=True, db_column='PK_terminoID')
+    tipo = models.CharField(max_length=12, choices=TIPOS)
+    # Id del User o del Apartamento (sin FK: se mantiene desde las señales)
+    objeto_id = models.PositiveIntegerField()
+    # En minúsculas y sin tildes; se busca por prefijo (LIKE 'texto%')
+    termino = models.CharField(max_length=64)
+
+    class Meta:
+        db_table = 'TERMINO_BUSQUEDA'
+        # (tipo, termino, objeto_id): la búsqueda por prefijo se resuelve solo con el índice
+        unique_together = ('tipo', 'termino', 'objeto_id')
+        indexes = [
+            models.Index(fields=['tipo', 'objeto_id'], name='termino_tipo_objeto_idx'),
+        ]
+
+    def __str__(self):
+        return f"{self.tipo} {self.objeto_id}: {self.termino}"
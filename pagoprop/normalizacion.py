@@ -0,0 +1,169 @@
+# pagoprop/normalizacion.py
+
+import logging
+import os
+import uuid
+
+from django.conf import settings
+from django.db import close_old_connections, transaction
+
+from . import archivos, miniaturas
+from .almacenamiento import almacenamiento_comprobantes, calcular_sha256, ruta_por_contenido
+from .cache_paginas import invalidar_por_archivo
+from .imagenes import normalizar_imagen
+from .models import Comprobante
+
+logger = logging.getLogger(__name__)
+
+
+EXTENSIONES_IMAGEN = {'.jpg', '.jpeg', '.png', '.webp', '.heic', '.heif', '.bmp', '.tif', '.tiff'}
+
+EXTENSION_FORMATO = {'WEBP': '.webp', 'JPEG': '.jpg', 'PNG': '.png'}
+
+
+def es_imagen(ruta):
+    return os.path.splitext(ruta)[1].lower() in EXTENSIONES_IMAGEN
+
+
+def _argumentos(ruta):
+    # Rutas absolutas y opciones: lo único que necesita el proceso hijo
+    origen = almacenamiento_comprobantes().path(ruta)
+    temporal = os.path.join(os.path.dirname(origen), f'.{uuid.uuid4().hex}.tmp')
+    return (
+        origen,
+        temporal,
+        settings.NORMALIZACION_LADO_MAXIMO,
+        settings.NORMALIZACION_FORMATO,
+        settings.NORMALIZACION_CALIDAD,
+    )
+
+
+def aplicar(ruta, temporal):
+    """
+    Pasa los comprobantes del archivo `ruta` a la versión normalizada que
+    quedó en `temporal`: la guarda por contenido, mueve las referencias y,
+    salvo que NORMALIZACION_CONSERVAR_ORIGINAL esté activo, libera el
+    original. Devuelve la ruta nueva, o None si ya nadie usaba el original.
+    """
+    almacenamiento = almacenamiento_comprobantes()
+    extension = EXTENSION_FORMATO.get(settings.NORMALIZACION_FORMATO, '.webp')
+    carpeta = Comprobante._meta.get_field('archivo').upload_to
+    with open(temporal, 'rb') as normalizado:
+        nueva = ruta_por_contenido(os.path.join(carpeta, 'normalizado' + extension), calcular_sha256(normalizado))
+
+    if almacenamiento.exists(nueva):
+        os.remove(temporal)
+    else:
+        os.makedirs(os.path.dirname(almacenamiento.path(nueva)), exist_ok=True)
+        os.replace(temporal, almacenamiento.path(nueva))
+
+    conservar = settings.NORMALIZACION_CONSERVAR_ORIGINAL
+    with transaction.atomic():
+        # Comprobante.sha256 sigue siendo el del archivo subido: con él se
+        # detecta si alguien vuelve a subir la misma foto
+        cambios = {'archivo': nueva, 'miniatura': '', 'vista_previa': ''}
+        if conservar:
+            cambios['archivo_original'] = ruta
+        cantidad = Comprobante.objects.filter(archivo=ruta).update(**cambios)
+        if cantidad:
+            invalidar_por_archivo(nueva)
+            archivos.retener(nueva, tamano=almacenamiento.size(nueva), cantidad=cantidad)
+            if not conservar:
+                archivos.liberar(ruta, cantidad=cantidad)
+
+    if not cantidad:
+        # El comprobante se editó o se borró mientras tanto
+        transaction.on_commit(lambda: archivos.borrar_si_no_se_usa(nueva))
+        return None
+    return nueva
+
+
+def _al_terminar(ruta, temporal, futuro):
+    try:
+        if futuro.result():
+            nueva = aplicar(ruta, temporal)
+            if nueva:
+                miniaturas.encolar(nueva)
+        else:
+            # No era una imagen o no se ganaba nada: vistas previas del original
+            miniaturas.encolar(ruta)
+    except Exception:
+        logger.exception('Error normalizando %s', ruta)
+        if os.path.exists(temporal):
+            os.remove(temporal)
+    finally:
+        # El callback corre fuera del ciclo de request, cerramos la conexión a mano
+        close_old_connections()
+
+
+def encolar(ruta):
+    if not almacenamiento_comprobantes().exists(ruta):
+        # Archivado en un paquete: ya se normalizó (o no) cuando se subió
+        return miniaturas.encolar(ruta)
+    argumentos = _argumentos(ruta)
+    futuro = miniaturas.obtener_pool().submit(normalizar_imagen, *argumentos)
+    futuro.add_done_callback(lambda f: _al_terminar(ruta, argumentos[1], f))
+
+
+def comprobante_guardado(comprobante, created, anterior):
+    """
+    Archivo nuevo o reemplazado: si es una foto y la normalización está
+    activa, primero se normaliza y después se generan las vistas previas.
+    """
+    ruta = comprobante.archivo.name
+    if not created and anterior is not None and anterior['archivo'] == ruta:
+        return
+    if settings.NORMALIZAR_IMAGENES and es_imagen(ruta):
+        transaction.on_commit(lambda: encolar(ruta))
+    else:
+        miniaturas.comprobante_guardado(comprobante, created, anterior)
+
+
+# ---------------------------------------------------------------------------
+# Recompresión de los archivos existentes (comando comprimir_comprobantes)
+# ---------------------------------------------------------------------------
+
+def rutas_por_comprimir():
+    extension = EXTENSION_FORMATO.get(settings.NORMALIZACION_FORMATO, '.webp')
+    return [
+        ruta for ruta in Comprobante.objects.exclude(archivo='').order_by()
+        .values_list('archivo', flat=True).distinct().iterator()
+        if es_imagen(ruta) and not ruta.lower().endswith(extension)
+    ]
+
+
+def comprimir_existentes(rutas, al_avanzar=None):
+    """
+    Normaliza esas rutas en paralelo en el pool de procesos; las
+    actualizaciones en la BD se hacen aquí, una por una.
+    Devuelve (comprimidas, omitidas, bytes_ahorrados).
+    """
+    almacenamiento = almacenamiento_comprobantes()
+    pool = miniaturas.obtener_pool()
+    futuros = []
+    for ruta in rutas:
+        if almacenamiento.exists(ruta):
+            argumentos = _argumentos(ruta)
+            futuros.append((ruta, argumentos[1], pool.submit(normalizar_imagen, *argumentos)))
+
+    comprimidas = omitidas = ahorrados = 0
+    for indice, (ruta, temporal, futuro) in enumerate(futuros, start=1):
+        try:
+            resultado = futuro.result()
+            nueva = aplicar(ruta, temporal) if resultado else None
+            if nueva:
+                comprimidas += 1
+                if not settings.NORMALIZACION_CONSERVAR_ORIGINAL:
+                    ahorrados += resultado[0] - resultado[1]
+                miniaturas.encolar(nueva)
+            else:
+                omitidas += 1
+        except Exception as e:
+            logger.warning('No se pudo comprimir %s: %s', ruta, e)
+            omitidas += 1
+            if os.path.exists(temporal):
+                os.remove(temporal)
+        if al_avanzar:
+            al_avanzar(indice)
+    omitidas += len(rutas) - len(futuros)
+    return comprimidas, omitidas, ahorrados
@@ -0,0 +1,164 @@
+# pagoprop/paginacion.py
+
+from django.core import signing
+from django.db.models import Q
+from django.utils.dateparse import parse_datetime
+
+
+# Parámetro de la URL que lleva el cursor (?cursor=...)
+PARAMETRO_CURSOR = 'cursor'
+
+SALT_CURSOR = 'pagoprop.paginacion.cursor'
+
+# Cursor especial para saltar a la última página
+CURSOR_ULTIMA = 'ultima'
+
+ADELANTE = 'n'
+ATRAS = 'p'
+
+
+def _crear_cursor(direccion, comprobante):
+    # Token opaco y firmado con la posición (fecha, id) de un comprobante
+    return signing.dumps(
+        [direccion, comprobante.fecha_creacion.isoformat(), comprobante.comprobanteID],
+        salt=SALT_CURSOR,
+        compress=True
+    )
+
+
+def _leer_cursor(token):
+    """
+    Devuelve (direccion, fecha, id) o None si el token no existe o fue alterado.
+    Un cursor inválido simplemente lleva a la primera página.
+    """
+    if not token:
+        return None
+    if token == CURSOR_ULTIMA:
+        return (ATRAS, None, None)
+    try:
+        direccion, fecha, comprobante_id = signing.loads(token, salt=SALT_CURSOR)
+    except (signing.BadSignature, ValueError, TypeError):
+        return None
+    fecha = parse_datetime(fecha) if isinstance(fecha, str) else None
+    if direccion not in (ADELANTE, ATRAS) or fecha is None or not isinstance(comprobante_id, int):
+        return None
+    return (direccion, fecha, comprobante_id)
+
+
+class PaginaCursor:
+    """
+    Página de comprobantes ordenada por (fecha_creacion, comprobanteID)
+    descendente. Expone los mismos nombres que usan los templates con
+    Paginator (has_next, has_previous, has_other_pages) más las URLs ya
+    armadas para moverse entre páginas.
+    """
+
+    def __init__(self, object_list, parametros, anterior=None, siguiente=None, es_primera=False, es_ultima=False):
+        self.object_list = object_list
+        self.parametros = parametros
+        self.cursor_anterior = anterior
+        self.cursor_siguiente = siguiente
+        self.es_primera = es_primera
+        self.es_ultima = es_ultima
+
+    def __iter__(self):
+        return iter(self.object_list)
+
+    def __len__(self):
+        return len(self.object_list)
+
+    def __getitem__(self, indice):
+        return self.object_list[indice]
+
+    def has_next(self):
+        return self.cursor_siguiente is not None
+
+    def has_previous(self):
+        return self.cursor_anterior is not None
+
+    def has_other_pages(self):
+        return self.has_next() or self.has_previous()
+
+    def _url(self, cursor):
+        parametros = self.parametros.copy()
+        if cursor:
+            parametros[PARAMETRO_CURSOR] = cursor
+        texto = parametros.urlencode()
+        return f'?{texto}' if texto else '?'
+
+    @property
+    def url_primera(self):
+        return self._url(None)
+
+    @property
+    def url_anterior(self):
+        return self._url(self.cursor_anterior)
+
+    @property
+    def url_siguiente(self):
+        return self._url(self.cursor_siguiente)
+
+    @property
+    def url_ultima(self):
+        return self._url(CURSOR_ULTIMA)
+
+
+def paginar_por_cursor(queryset, request, por_pagina):
+    """
+    Paginación por llave (keyset): en vez de OFFSET y COUNT(*) filtra por
+    la posición del último comprobante visto, así cada página cuesta lo
+    mismo sin importar qué tan profunda sea y no se corre con inserciones
+    nuevas. Usa los índices (copropietario|apartamento, fecha_creacion).
+    """
+    cursor = _leer_cursor(request.GET.get(PARAMETRO_CURSOR))
+
+    # Parámetros de la URL sin el cursor ni el viejo ?page=
+    parametros = request.GET.copy()
+    parametros.pop(PARAMETRO_CURSOR, None)
+    parametros.pop('page', None)
+
+    if cursor is None:
+        direccion, fecha, comprobante_id = ADELANTE, None, None
+    else:
+        direccion, fecha, comprobante_id = cursor
+
+    if direccion == ADELANTE:
+        queryset = queryset.order_by('-fecha_creacion', '-comprobanteID')
+        if fecha is not None:
+            queryset = queryset.filter(
+                Q(fecha_creacion__lt=fecha) |
+                Q(fecha_creacion=fecha, comprobanteID__lt=comprobante_id)
+            )
+    else:
+        # Hacia atrás se recorre en orden ascendente y luego se invierte
+        queryset = queryset.order_by('fecha_creacion', 'comprobanteID')
+        if fecha is not None:
+            queryset = queryset.filter(
+                Q(fecha_creacion__gt=fecha) |
+                Q(fecha_creacion=fecha, comprobanteID__gt=comprobante_id)
+            )
+
+    # Se trae uno de más para saber si hay otra página en esa dirección
+    filas = list(queryset[:por_pagina + 1])
+    hay_mas = len(filas) > por_pagina
+    filas = filas[:por_pagina]
+
+    if direccion == ADELANTE:
+        hay_siguiente = hay_mas
+        hay_anterior = cursor is not None
+    else:
+        filas.reverse()
+        hay_anterior = hay_mas
+        hay_siguiente = fecha is not None
+
+    anterior = _crear_cursor(ATRAS, filas[0]) if filas and hay_anterior else None
+    siguiente = _crear_cursor(ADELANTE, filas[-1]) if filas and hay_siguiente else None
+
+    return PaginaCursor(
+        filas,
+        parametros,
+        anterior=anterior,
+        siguiente=siguiente,
+        es_primera=not hay_anterior,
+        es_ultima=not hay_siguiente,
+    )
@@ -0,0 +1,180 @@
+# pagoprop/paquetes.py
+
+import mmap
+import os
+import threading
+import zlib
+from datetime import timedelta
+
+from django.conf import settings
+from django.db import transaction
+from django.db.models import Exists, Max, OuterRef, Q
+from django.utils import timezone
+
+from .almacenamiento import almacenamiento_comprobantes, es_ruta_por_contenido
+from .models import ArchivoComprobante, Comprobante, PaqueteArchivo
+
+
+# Un paquete es un archivo de solo-agregar: cada miembro es el contenido de
+# un comprobante (comprimido con zlib si así pesa menos) escrito uno tras
+# otro. El índice (paquete, desplazamiento, longitud) está en ArchivoComprobante.
+
+NIVEL_COMPRESION = 9
+
+
+def ruta_paquete(paquete):
+    return os.path.join(settings.ARCHIVO_FRIO_ROOT, paquete.nombre)
+
+
+# ---------------------------------------------------------------------------
+# Lectura
+# ---------------------------------------------------------------------------
+# Cada proceso mantiene abiertos los paquetes que ha leído con mmap: leer un
+# miembro es copiar un rango de memoria, sin seek ni read por cada archivo.
+
+_mapas = {}
+_mapas_lock = threading.Lock()
+
+
+def _mapa(paquete, fin):
+    ruta = ruta_paquete(paquete)
+    with _mapas_lock:
+        mapa = _mapas.get(ruta)
+        # El paquete pudo crecer después de mapearlo (solo se agrega al final).
+        # El mapa anterior no se cierra: otro hilo puede estar leyendo de él;
+        # se libera solo cuando nadie lo usa
+        if mapa is None or len(mapa) < fin:
+            with open(ruta, 'rb') as archivo:
+                mapa = mmap.mmap(archivo.fileno(), 0, access=mmap.ACCESS_READ)
+            _mapas[ruta] = mapa
+        return mapa
+
+
+def miembro_frio(ruta):
+    # La fila del índice si el archivo está archivado, o None
+    return ArchivoComprobante.objects.filter(ruta=ruta, paquete__isnull=False).select_related('paquete').first()
+
+
+def leer_miembro(miembro):
+    fin = miembro.desplazamiento + miembro.longitud
+    datos = _mapa(miembro.paquete, fin)[miembro.desplazamiento:fin]
+    return zlib.decompress(datos) if miembro.comprimido else datos
+
+
+def leer_frio(ruta):
+    """
+    (contenido, fecha de modificación como timestamp) de un archivo
+    archivado, o None si no está en ningún paquete. El contenido nunca cambia
+    (la ruta es su hash), así que la fecha del paquete sirve para Last-Modified.
+    """
+    miembro = miembro_frio(ruta)
+    if miembro is None:
+        return None
+    return leer_miembro(miembro), miembro.paquete.fecha_creacion.timestamp()
+
+
+# ---------------------------------------------------------------------------
+# Archivado (comando archivar_comprobantes)
+# ---------------------------------------------------------------------------
+
+def _paquete_abierto():
+    paquete = PaqueteArchivo.objects.filter(cerrado=False).order_by('-paqueteID').first()
+    if paquete and paquete.tamano < settings.PAQUETE_TAMANO_MAXIMO:
+        return paquete
+    if paquete:
+        paquete.cerrado = True
+        paquete.save(update_fields=['cerrado'])
+    siguiente = (PaqueteArchivo.objects.aggregate(ultimo=Max('paqueteID'))['ultimo'] or 0) + 1
+    return PaqueteArchivo.objects.create(nombre=f'comprobantes_{siguiente:05d}.pack')
+
+
+def candidatos(dias):
+    """
+    Archivos que ningún comprobante reciente usa (ni como archivo ni como
+    original conservado). Solo los que ya están en el esquema por contenido
+    (ver migrar_archivos).
+    """
+    limite = timezone.now() - timedelta(days=dias)
+    recientes = Comprobante.objects.filter(
+        Q(archivo=OuterRef('ruta')) | Q(archivo_original=OuterRef('ruta')),
+        fecha_creacion__gte=limite,
+    )
+    rutas = (
+        ArchivoComprobante.objects.filter(paquete__isnull=True)
+        .exclude(Exists(recientes))
+        .order_by('pk').values_list('ruta', flat=True)
+    )
+    return [ruta for ruta in rutas if es_ruta_por_contenido(ruta)]
+
+
+def archivar(rutas):
+    """
+    Agrega esos archivos al paquete abierto y los borra de MEDIA_ROOT. El
+    orden es seguro ante caídas: primero se escribe y sincroniza el paquete,
+    luego se registra en la BD y al final se borra el original.
+    Devuelve (archivados, bytes_originales, bytes_en_paquete).
+    """
+    almacenamiento = almacenamiento_comprobantes()
+    os.makedirs(settings.ARCHIVO_FRIO_ROOT, exist_ok=True)
+    originales = empaquetados = 0
+
+    with transaction.atomic():
+        # Un solo proceso escribe a la vez en el paquete
+        paquete = PaqueteArchivo.objects.select_for_update().get(pk=_paquete_abierto().pk)
+        filas = ArchivoComprobante.objects.filter(ruta__in=rutas, paquete__isnull=True)
+
+        with open(ruta_paquete(paquete), 'ab') as destino:
+            # La posición real (no paquete.tamano): una caída pudo dejar bytes sin registrar
+            destino.seek(0, os.SEEK_END)
+            registros = []
+            for fila in filas:
+                if not os.path.isfile(almacenamiento.path(fila.ruta)):
+                    continue
+                with almacenamiento.open(fila.ruta, 'rb') as original:
+                    datos = original.read()
+                comprimidos = zlib.compress(datos, NIVEL_COMPRESION)
+                comprimido = len(comprimidos) < len(datos)
+                contenido = comprimidos if comprimido else datos
+
+                fila.paquete = paquete
+                fila.desplazamiento = destino.tell()
+                fila.longitud = len(contenido)
+                fila.comprimido = comprimido
+                destino.write(contenido)
+                registros.append(fila)
+                originales += len(datos)
+                empaquetados += len(contenido)
+            destino.flush()
+            os.fsync(destino.fileno())
+            paquete.tamano = destino.tell()
+
+        ArchivoComprobante.objects.bulk_update(registros, ['paquete', 'desplazamiento', 'longitud', 'comprimido'])
+        paquete.save(update_fields=['tamano'])
+
+        rutas_archivadas = [fila.ruta for fila in registros]
+        transaction.on_commit(lambda: [almacenamiento.delete(ruta) for ruta in rutas_archivadas])
+
+    return len(registros), originales, empaquetados
+
+
+def archivar_antiguos(dias, tamano_lote=200, al_avanzar=None):
+    """
+    Archiva por lotes todos los candidatos. Devuelve los totales de archivar().
+    """
+    totales = [0, 0, 0]
+    lote = []
+
+    def procesar():
+        for indice, valor in enumerate(archivar(lote)):
+            totales[indice] += valor
+        lote.clear()
+        if al_avanzar:
+            al_avanzar(totales[0])
+
+    for ruta in candidatos(dias):
+        lote.append(ruta)
+        if len(lote) >= tamano_lote:
+            procesar()
+    if lote:
+        procesar()
+    return tuple(totales)
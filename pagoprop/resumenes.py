@@ -0,0 +1,250 @@
+# pagoprop/resumenes.py
+
+from datetime import timedelta
+from decimal import Decimal
+
+from django.db import IntegrityError, transaction
+from django.db.models import Count, DecimalField, F, Max, Min, Sum, Value
+from django.db.models.functions import Greatest, Least
+from django.utils import timezone
+
+from .filtros import inicio_del_dia
+from .models import Comprobante, ResumenMensual
+
+
+def periodo_de(fecha):
+    # Primer día del mes de esa fecha, en la zona horaria configurada
+    return timezone.localtime(fecha).date().replace(day=1)
+
+
+def siguiente_periodo(periodo):
+    return (periodo.replace(day=28) + timedelta(days=4)).replace(day=1)
+
+
+def _sumar(apartamento_id, copropietario_id, periodo, cantidad, total, minimo, maximo):
+    """
+    Suma comprobantes nuevos a su fila del mes sin volver a leer los
+    demás: un UPDATE con F() o, si son los primeros del mes, un INSERT.
+    """
+    def decimal(valor):
+        return Value(valor, output_field=DecimalField(max_digits=14, decimal_places=2))
+
+    fila = ResumenMensual.objects.filter(
+        apartamento_id=apartamento_id,
+        copropietario_id=copropietario_id,
+        periodo=periodo,
+    )
+    cambios = {
+        'cantidad': F('cantidad') + cantidad,
+        'total': F('total') + decimal(total),
+        'minimo': Least('minimo', decimal(minimo)),
+        'maximo': Greatest('maximo', decimal(maximo)),
+    }
+
+    with transaction.atomic():
+        if fila.update(**cambios):
+            return
+        try:
+            with transaction.atomic():
+                ResumenMensual.objects.create(
+                    apartamento_id=apartamento_id,
+                    copropietario_id=copropietario_id,
+                    periodo=periodo,
+                    cantidad=cantidad,
+                    total=total,
+                    minimo=minimo,
+                    maximo=maximo,
+                )
+        except IntegrityError:
+            # Otro request creó la fila del mes al mismo tiempo
+            fila.update(**cambios)
+
+
+def sumar_comprobante(comprobante):
+    monto = comprobante.monto
+    _sumar(
+        comprobante.apartamento_id,
+        comprobante.copropietario_id,
+        periodo_de(comprobante.fecha_creacion),
+        1, monto, monto, monto
+    )
+
+
+def sumar_lote(comprobantes):
+    # Comprobantes creados con bulk_create (sin señales): una operación por mes
+    grupos = {}
+    for comprobante in comprobantes:
+        llave = (comprobante.apartamento_id, comprobante.copropietario_id, periodo_de(comprobante.fecha_creacion))
+        monto = comprobante.monto
+        datos = grupos.get(llave)
+        if datos is None:
+            grupos[llave] = {'cantidad': 1, 'total': monto, 'minimo': monto, 'maximo': monto}
+        else:
+            datos['cantidad'] += 1
+            datos['total'] += monto
+            datos['minimo'] = min(datos['minimo'], monto)
+            datos['maximo'] = max(datos['maximo'], monto)
+    for llave, datos in grupos.items():
+        _sumar(*llave, **datos)
+
+
+def recalcular_periodo(apartamento_id, copropietario_id, periodo):
+    """
+    Recalcula una sola fila del resumen a partir de los comprobantes de ese
+    mes. Se usa al editar o eliminar, cuando el mínimo o el máximo pueden
+    cambiar; la consulta recorre solo ese rango del índice (apartamento, fecha).
+    """
+    datos = Comprobante.objects.filter(
+        apartamento_id=apartamento_id,
+        copropietario_id=copropietario_id,
+        fecha_creacion__gte=inicio_del_dia(periodo),
+        fecha_creacion__lt=inicio_del_dia(siguiente_periodo(periodo)),
+    ).aggregate(
+        cantidad=Count('comprobanteID'),
+        total=Sum('monto'),
+        minimo=Min('monto'),
+        maximo=Max('monto'),
+    )
+
+    fila = ResumenMensual.objects.filter(
+        apartamento_id=apartamento_id,
+        copropietario_id=copropietario_id,
+        periodo=periodo,
+    )
+    if not datos['cantidad']:
+        # Nunca se crea una fila al borrar (puede venir de un borrado en cascada)
+        fila.delete()
+        return
+
+    with transaction.atomic():
+        if not fila.update(**datos):
+            ResumenMensual.objects.create(
+                apartamento_id=apartamento_id,
+                copropietario_id=copropietario_id,
+                periodo=periodo,
+                **datos
+            )
+
+
+def comprobante_guardado(comprobante, created, anterior):
+    # `anterior` son los valores que tenía en la BD antes de guardar (o None)
+    if created or anterior is None:
+        sumar_comprobante(comprobante)
+        return
+
+    periodo = periodo_de(comprobante.fecha_creacion)
+    periodo_anterior = periodo_de(anterior['fecha_creacion'])
+    llave_nueva = (comprobante.apartamento_id, comprobante.copropietario_id, periodo)
+    llave_anterior = (anterior['apartamento_id'], anterior['copropietario_id'], periodo_anterior)
+
+    if llave_nueva != llave_anterior:
+        recalcular_periodo(*llave_anterior)
+        recalcular_periodo(*llave_nueva)
+    elif comprobante.monto != anterior['monto']:
+        recalcular_periodo(*llave_nueva)
+
+
+def comprobante_eliminado(comprobante):
+    recalcular_periodo(
+        comprobante.apartamento_id,
+        comprobante.copropietario_id,
+        periodo_de(comprobante.fecha_creacion)
+    )
+
+
+# ---------------------------------------------------------------------------
+# Lecturas
+# ---------------------------------------------------------------------------
+
+def estadisticas_apartamento(apartamento, copropietario):
+    """
+    Total, cantidad y promedio de los pagos de un copropietario en un
+    apartamento, sumando las filas mensuales en vez de los comprobantes.
+    """
+    datos = ResumenMensual.objects.filter(
+        apartamento=apartamento,
+        copropietario=copropietario,
+    ).aggregate(
+        total_pagado=Sum('total'),
+        cantidad_pagos=Sum('cantidad'),
+    )
+    cantidad = datos['cantidad_pagos'] or 0
+    return {
+        'total_pagado': datos['total_pagado'],
+        'cantidad_pagos': cantidad,
+        'promedio_pago': datos['total_pagado'] / cantidad if cantidad else None,
+    }
+
+
+def total_recaudado():
+    return ResumenMensual.objects.aggregate(total=Sum('total'))['total'] or 0
+
+
+# ---------------------------------------------------------------------------
+# Reconstrucción completa (comando resumen_mensual)
+# ---------------------------------------------------------------------------
+
+def calcular_desde_comprobantes(tamano_lote=2000):
+    """
+    Calcula todas las filas del resumen recorriendo los comprobantes por
+    lotes. Devuelve un dict {(apartamento_id, copropietario_id, periodo): datos}.
+    """
+    resumen = {}
+    filas = Comprobante.objects.order_by().values_list(
+        'apartamento_id', 'copropietario_id', 'fecha_creacion', 'monto'
+    )
+    for apartamento_id, copropietario_id, fecha, monto in filas.iterator(chunk_size=tamano_lote):
+        llave = (apartamento_id, copropietario_id, periodo_de(fecha))
+        datos = resumen.get(llave)
+        if datos is None:
+            resumen[llave] = {'cantidad': 1, 'total': monto, 'minimo': monto, 'maximo': monto}
+        else:
+            datos['cantidad'] += 1
+            datos['total'] += monto
+            datos['minimo'] = min(datos['minimo'], monto)
+            datos['maximo'] = max(datos['maximo'], monto)
+    return resumen
+
+
+def diferencias_resumen(calculado):
+    """
+    Compara el resumen calculado con el guardado. Devuelve la lista de
+    llaves que faltan, sobran o no coinciden.
+    """
+    guardado = {}
+    filas = ResumenMensual.objects.order_by().values_list(
+        'apartamento_id', 'copropietario_id', 'periodo', 'cantidad', 'total', 'minimo', 'maximo'
+    )
+    for apartamento_id, copropietario_id, periodo, cantidad, total, minimo, maximo in filas.iterator():
+        guardado[(apartamento_id, copropietario_id, periodo)] = {
+            'cantidad': cantidad, 'total': total, 'minimo': minimo, 'maximo': maximo
+        }
+
+    diferencias = []
+    for llave in calculado.keys() | guardado.keys():
+        esperado = calculado.get(llave)
+        actual = guardado.get(llave)
+        if esperado is None or actual is None or any(
+            Decimal(esperado[campo]) != Decimal(actual[campo]) for campo in esperado
+        ):
+            diferencias.append((llave, esperado, actual))
+    return diferencias
+
+
+def reconstruir_resumen(calculado, tamano_lote=1000):
+    # Reemplaza todo el resumen en una sola transacción
+    with transaction.atomic():
+        ResumenMensual.objects.all().delete()
+        ResumenMensual.objects.bulk_create(
+            (
+                ResumenMensual(
+                    apartamento_id=apartamento_id,
+                    copropietario_id=copropietario_id,
+                    periodo=periodo,
+                    **datos
+                )
+                for (apartamento_id, copropietario_id, periodo), datos in calculado.items()
+            ),
+            batch_size=tamano_lote
+        )
+    return len(calculado)
@@ -0,0 +1,94 @@
+# pagoprop/sesiones.py
+
+from django.conf import settings
+from django.contrib import auth
+from django.contrib.auth.middleware import AuthenticationMiddleware
+from django.contrib.auth.models import AnonymousUser, User
+from django.core.cache import cache
+from django.db import transaction
+from django.utils.crypto import constant_time_compare
+from django.utils.functional import SimpleLazyObject
+
+from .cache_versiones import incrementar_version, obtener_version
+
+
+# request.user sin ir a la BD: los campos del usuario se guardan en la caché
+# (USUARIO_CACHE_SEGUNDOS) bajo una versión por usuario que suben las señales
+# de User (editar perfil, cambiar contraseña, cambios en el admin) y el
+# logout. La sesión va aparte, con SESSION_ENGINE = cached_db: se lee de la
+# caché y se escribe también en la BD.
+
+PREFIJO = 'pagoprop:usuario:'
+
+CAMPOS = [campo.attname for campo in User._meta.concrete_fields]
+
+BACKEND = 'django.contrib.auth.backends.ModelBackend'
+
+
+def _version(usuario_id):
+    return f'sesion:{usuario_id}'
+
+
+def _llave(usuario_id):
+    return f'{PREFIJO}{usuario_id}:{obtener_version(_version(usuario_id))}'
+
+
+def invalidar_usuario(usuario_id):
+    # Otra vez después del commit: un request concurrente que lea la fila vieja
+    # (is_staff, is_active) la dejaría guardada con la versión nueva
+    if usuario_id:
+        incrementar_version(_version(usuario_id))
+        transaction.on_commit(lambda: incrementar_version(_version(usuario_id)))
+
+
+def usuario_cacheado(usuario_id):
+    """
+    El User con ese id armado desde la caché (una consulta si no estaba),
+    o None si no existe.
+    """
+    llave = _llave(usuario_id)
+    valores = cache.get(llave)
+    if valores is None:
+        valores = User.objects.filter(pk=usuario_id).values_list(*CAMPOS).first()
+        if valores is None:
+            return None
+        cache.set(llave, valores, timeout=settings.USUARIO_CACHE_SEGUNDOS)
+    return User.from_db('default', CAMPOS, valores)
+
+
+def _usuario_de_sesion(request):
+    # Lo mismo que auth.get_user() con ModelBackend, pero leyendo de la caché.
+    # Cualquier caso raro (otro backend, hash que no coincide) se le deja a Django.
+    try:
+        usuario_id = auth._get_user_session_key(request)
+        backend = request.session[auth.BACKEND_SESSION_KEY]
+    except KeyError:
+        return AnonymousUser()
+    if backend != BACKEND or backend not in settings.AUTHENTICATION_BACKENDS:
+        return auth.get_user(request)
+
+    usuario = usuario_cacheado(usuario_id)
+    if usuario is None or not usuario.is_active:
+        return AnonymousUser()
+    if not constant_time_compare(
+        request.session.get(auth.HASH_SESSION_KEY, ''), usuario.get_session_auth_hash()
+    ):
+        # Contraseña cambiada o SECRET_KEY_FALLBACKS: Django decide si cierra la sesión
+        return auth.get_user(request)
+    return usuario
+
+
+def obtener_usuario(request):
+    if not hasattr(request, '_cached_user'):
+        request._cached_user = _usuario_de_sesion(request)
+    return request._cached_user
+
+
+class AutenticacionCacheadaMiddleware(AuthenticationMiddleware):
+    """
+    Reemplaza a AuthenticationMiddleware: request.user sale de la caché.
+    """
+
+    def process_request(self, request):
+        super().process_request(request)
+        request.user = SimpleLazyObject(lambda: obtener_usuario(request))
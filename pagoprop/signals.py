@@ -0,0 +1,123 @@
+# pagoprop/signals.py
+
+from django.contrib.auth.signals import user_logged_out
+from django.db.models.signals import pre_save, post_save, post_delete
+from django.dispatch import receiver
+
+from . import archivos, busqueda, contadores, normalizacion, resumenes
+from django.contrib.auth.models import User
+
+from .cache_paginas import invalidar_propietarios, invalidar_usuarios
+from .conteos import invalidar_conteos
+from .membresias import invalidar_membresias
+from .sesiones import invalidar_usuario
+from .models import Apartamento, PropietarioApartamento, Comprobante
+from .tablero import invalidar_tablero
+
+
+@receiver(pre_save, sender=Comprobante)
+def comprobante_antes_de_guardar(sender, instance, **kwargs):
+    # Guardar los valores actuales en la BD para saber qué cambió al editar
+    instance._valores_anteriores = None
+    if instance.pk:
+        instance._valores_anteriores = Comprobante.objects.filter(pk=instance.pk).values(
+            'apartamento_id', 'copropietario_id', 'fecha_creacion', 'monto', 'archivo', 'archivo_original'
+        ).first()
+    archivos.preparar_archivo(instance)
+
+
+@receiver(post_save, sender=Comprobante)
+def comprobante_guardado(sender, instance, created, raw=False, **kwargs):
+    if raw:
+        return
+    anterior = getattr(instance, '_valores_anteriores', None)
+    # Primero el resumen mensual: los contadores por usuario lo leen
+    resumenes.comprobante_guardado(instance, created, anterior)
+    contadores.comprobante_guardado(instance, created, anterior)
+    archivos.comprobante_guardado(instance, created, anterior)
+    # Normalizar la foto (si aplica) y luego generar las vistas previas
+    normalizacion.comprobante_guardado(instance, created, anterior)
+    # Editar monto, apartamento o fecha también cambia los conteos filtrados
+    invalidar_conteos()
+    invalidar_tablero()
+    invalidar_usuarios([instance.copropietario_id, anterior and anterior['copropietario_id']])
+
+
+@receiver(post_delete, sender=Comprobante)
+def comprobante_eliminado(sender, instance, **kwargs):
+    resumenes.comprobante_eliminado(instance)
+    contadores.comprobante_eliminado(instance)
+    # El archivo solo se borra del disco si ningún otro comprobante lo usa
+    archivos.comprobante_eliminado(instance)
+    invalidar_conteos()
+    invalidar_tablero()
+    invalidar_usuarios([instance.copropietario_id])
+
+
+# Estadísticas del panel de administración
+@receiver(post_save, sender=User)
+@receiver(post_delete, sender=User)
+def usuario_cambiado(sender, instance, update_fields=None, **kwargs):
+    # request.user sale de la caché (sesiones.py): perfil, contraseña, is_staff...
+    invalidar_usuario(instance.pk)
+    # Cada login guarda last_login: eso no cambia ninguna cifra del tablero
+    if update_fields and set(update_fields) <= {'last_login'}:
+        return
+    invalidar_tablero()
+    # Índice de búsqueda (nombre, email, usuario); los conteos en caché pueden incluir una búsqueda
+    if busqueda.indexar_usuarios([instance.pk]):
+        invalidar_conteos()
+    # Su nombre y email aparecen en el detalle de los apartamentos que comparte
+    invalidar_usuarios([instance.pk])
+    invalidar_propietarios(instance.propietario_apartamentos.values('apartamento_id'))
+
+
+@receiver(user_logged_out)
+def usuario_salio(sender, request, user, **kwargs):
+    if user is not None:
+        invalidar_usuario(user.pk)
+
+
+@receiver(post_save, sender=Apartamento)
+@receiver(post_delete, sender=Apartamento)
+def apartamento_cambiado(sender, instance, **kwargs):
+    invalidar_tablero()
+    if busqueda.indexar_apartamentos([instance.pk]):
+        invalidar_conteos()
+    invalidar_propietarios([instance.pk])
+    # El número del apartamento está en las membresías de sus propietarios
+    invalidar_membresias(
+        PropietarioApartamento.objects.filter(apartamento_id=instance.pk).values_list('copropietario_id', flat=True)
+    )
+
+
+# Asignaciones de apartamentos
+@receiver(pre_save, sender=PropietarioApartamento)
+def asignacion_antes_de_guardar(sender, instance, **kwargs):
+    # Si se cambia el copropietario de una asignación hay que corregir a los dos
+    instance._copropietario_anterior = None
+    if instance.pk:
+        instance._copropietario_anterior = PropietarioApartamento.objects.filter(
+            pk=instance.pk
+        ).values_list('copropietario_id', flat=True).first()
+
+
+@receiver(post_save, sender=PropietarioApartamento)
+def asignacion_guardada(sender, instance, raw=False, **kwargs):
+    if raw:
+        return
+    contadores.asignacion_cambiada(instance, getattr(instance, '_copropietario_anterior', None))
+    invalidar_tablero()
+    invalidar_usuarios([getattr(instance, '_copropietario_anterior', None)])
+    invalidar_propietarios([instance.apartamento_id])
+    invalidar_membresias([instance.copropietario_id, getattr(instance, '_copropietario_anterior', None)])
+
+
+@receiver(post_delete, sender=PropietarioApartamento)
+def asignacion_eliminada(sender, instance, **kwargs):
+    contadores.asignacion_cambiada(instance, eliminada=True)
+    invalidar_tablero()
+    # Ya no aparece entre los propietarios: se invalida aparte
+    invalidar_usuarios([instance.copropietario_id])
+    invalidar_propietarios([instance.apartamento_id])
+    invalidar_membresias([instance.copropietario_id])
@@ -0,0 +1,317 @@
+# pagoprop/subidas.py
+
+import hashlib
+import os
+import threading
+from collections import OrderedDict
+from datetime import timedelta
+
+from django.conf import settings
+from django.core.files.uploadedfile import UploadedFile
+from django.core.files.uploadhandler import FileUploadHandler, StopFutureHandlers, StopUpload
+from django.utils import timezone
+
+from .models import SubidaComprobante
+
+try:
+    import fcntl
+except ImportError:
+    # Windows (solo desarrollo): los fragmentos no se serializan
+    fcntl = None
+
+
+# Firmas (primeros bytes) de los formatos aceptados: imagen o PDF
+FIRMAS = [
+    (b'%PDF-', 'application/pdf'),
+    (b'\xff\xd8\xff', 'image/jpeg'),
+    (b'\x89PNG\r\n\x1a\n', 'image/png'),
+    (b'GIF87a', 'image/gif'),
+    (b'GIF89a', 'image/gif'),
+]
+
+# Bytes mínimos del primer fragmento para reconocer el formato
+BYTES_FIRMA = 16
+
+TAMANO_LECTURA = 64 * 1024
+
+
+def detectar_tipo(cabecera):
+    """
+    Devuelve el content type según los primeros bytes del archivo,
+    o None si no es un formato permitido.
+    """
+    for firma, tipo in FIRMAS:
+        if cabecera.startswith(firma):
+            return tipo
+    # WEBP: RIFF....WEBP / HEIC (fotos de iPhone): ....ftypheic
+    if cabecera[:4] == b'RIFF' and cabecera[8:12] == b'WEBP':
+        return 'image/webp'
+    if cabecera[4:8] == b'ftyp' and cabecera[8:12] in (b'heic', b'heix', b'mif1'):
+        return 'image/heic'
+    return None
+
+
+# ---------------------------------------------------------------------------
+# Estado del SHA-256 entre fragmentos
+# ---------------------------------------------------------------------------
+# hashlib no se puede guardar en la BD, así que cada proceso guarda el estado
+# de las subidas que atendió. Si un fragmento llega a otro worker (o después
+# de un reinicio) el estado se reconstruye leyendo una vez lo ya recibido.
+
+_hashes = OrderedDict()
+_hashes_lock = threading.Lock()
+_HASHES_MAXIMO = 256
+
+
+def _guardar_hash(subida, offset, sha):
+    with _hashes_lock:
+        _hashes[subida.token] = (offset, sha)
+        _hashes.move_to_end(subida.token)
+        while len(_hashes) > _HASHES_MAXIMO:
+            _hashes.popitem(last=False)
+
+
+def _descartar_hash(subida):
+    with _hashes_lock:
+        _hashes.pop(subida.token, None)
+
+
+def estado_hash(subida, offset):
+    with _hashes_lock:
+        guardado = _hashes.get(subida.token)
+    if guardado and guardado[0] == offset:
+        return guardado[1].copy()
+
+    sha = hashlib.sha256()
+    if offset:
+        with open(subida.ruta_parcial, 'rb') as parcial:
+            pendientes = offset
+            while pendientes:
+                bloque = parcial.read(min(TAMANO_LECTURA, pendientes))
+                if not bloque:
+                    break
+                sha.update(bloque)
+                pendientes -= len(bloque)
+    return sha
+
+
+# ---------------------------------------------------------------------------
+# Upload handler
+# ---------------------------------------------------------------------------
+
+class FragmentoUploadHandler(FileUploadHandler):
+    """
+    Escribe el campo `fragmento` directo en el archivo parcial de la subida,
+    a partir de `offset`, mientras llega: sin archivo temporal intermedio.
+    Va actualizando el SHA-256 y corta la subida si se pasa del tamaño
+    declarado o si el archivo no empieza como una imagen o un PDF.
+    """
+
+    CAMPO = 'fragmento'
+
+    def __init__(self, subida, offset, request=None):
+        super().__init__(request)
+        self.subida = subida
+        self.offset = offset
+        self.escritos = 0
+        self.sha = None
+        self.destino = None
+        self.cabecera = b''
+        self.error = None
+
+    def new_file(self, field_name, *args, **kwargs):
+        super().new_file(field_name, *args, **kwargs)
+        if field_name != self.CAMPO or self.destino is not None:
+            self.error = 'Solo se acepta un fragmento por petición.'
+            raise StopUpload()
+
+        os.makedirs(os.path.dirname(self.subida.ruta_parcial), exist_ok=True)
+        # Sin truncar al abrir: otra petición puede tener el archivo abierto
+        destino = os.fdopen(os.open(self.subida.ruta_parcial, os.O_RDWR | os.O_CREAT, 0o644), 'r+b')
+        if not self._bloquear(destino):
+            # Otra petición (p. ej. un reintento del cliente) está escribiendo
+            # esta subida, o ya la avanzó: se descarta este fragmento sin tocar
+            # el archivo y el cliente consulta el estado
+            destino.close()
+            raise StopUpload()
+
+        self.destino = destino
+        self.sha = estado_hash(self.subida, self.offset)
+        self.destino.seek(self.offset)
+        self.destino.truncate()
+        raise StopFutureHandlers()
+
+    def _bloquear(self, destino):
+        """
+        Candado exclusivo sobre el archivo parcial hasta cerrar(): un solo
+        fragmento a la vez por subida. Con el candado se confirma que la
+        subida sigue en `offset`; si no, escribir ahí borraría lo que otra
+        petición ya registró.
+        """
+        if fcntl is not None:
+            try:
+                fcntl.flock(destino, fcntl.LOCK_EX | fcntl.LOCK_NB)
+            except BlockingIOError:
+                return False
+        return SubidaComprobante.objects.filter(
+            pk=self.subida.pk, bytes_recibidos=self.offset
+        ).exists()
+
+    def receive_data_chunk(self, raw_data, start):
+        if self.destino is None:
+            return None
+
+        fin = self.offset + self.escritos + len(raw_data)
+        if fin > self.subida.tamano:
+            self.error = 'El fragmento supera el tamaño declarado del archivo.'
+            raise StopUpload()
+
+        # Validar el formato con los primeros bytes del archivo
+        if self.offset == 0 and len(self.cabecera) < BYTES_FIRMA:
+            self.cabecera += raw_data[:BYTES_FIRMA - len(self.cabecera)]
+            if len(self.cabecera) >= min(BYTES_FIRMA, self.subida.tamano) and not detectar_tipo(self.cabecera):
+                self.error = 'El archivo debe ser una imagen o un PDF.'
+                raise StopUpload()
+
+        self.destino.write(raw_data)
+        self.sha.update(raw_data)
+        self.escritos += len(raw_data)
+        return None
+
+    def file_complete(self, file_size):
+        # El fragmento ya quedó en el archivo parcial; no va a request.FILES
+        return None
+
+    def cerrar(self, aceptar):
+        """
+        Cierra el archivo parcial y suelta el candado. Si el fragmento no se
+        acepta, se deja el archivo como estaba antes (se corta en `offset`).
+        """
+        if self.destino is None:
+            return
+        if not aceptar:
+            self.destino.seek(self.offset)
+            self.destino.truncate()
+        self.destino.close()
+        self.destino = None
+        if aceptar:
+            _guardar_hash(self.subida, self.offset + self.escritos, self.sha)
+
+
+# ---------------------------------------------------------------------------
+# Operaciones
+# ---------------------------------------------------------------------------
+
+def iniciar_subida(usuario, nombre_archivo, tamano):
+    """
+    Crea una subida nueva o devuelve la que el usuario ya tenía abierta para
+    el mismo archivo (mismo nombre y tamaño), para poder reanudarla.
+    Lanza ValueError si el tamaño no es válido.
+    """
+    if tamano <= 0:
+        raise ValueError('El archivo está vacío.')
+    if tamano > settings.COMPROBANTE_TAMANO_MAXIMO:
+        limite = settings.COMPROBANTE_TAMANO_MAXIMO // (1024 * 1024)
+        raise ValueError(f'El archivo supera el máximo de {limite}MB.')
+
+    nombre_archivo = os.path.basename(nombre_archivo)[:255]
+    existente = SubidaComprobante.objects.filter(
+        usuario=usuario,
+        nombre_archivo=nombre_archivo,
+        tamano=tamano,
+    ).order_by('-fecha_actualizacion').first()
+    if existente:
+        # Si el archivo parcial se perdió, la subida empieza de nuevo
+        if existente.bytes_recibidos and not os.path.exists(existente.ruta_parcial):
+            existente.bytes_recibidos = 0
+            existente.save(update_fields=['bytes_recibidos', 'fecha_actualizacion'])
+        return existente
+
+    return SubidaComprobante.objects.create(
+        usuario=usuario,
+        nombre_archivo=nombre_archivo,
+        tamano=tamano,
+    )
+
+
+def registrar_fragmento(subida, handler):
+    """
+    Confirma en la BD los bytes escritos por el handler, todavía con el
+    candado del archivo parcial. Si otra petición avanzó la misma subida
+    (sin pasar por el candado), se descarta este fragmento.
+    Devuelve True si quedó registrado.
+    """
+    if handler.error or handler.destino is None:
+        handler.cerrar(aceptar=False)
+        return False
+
+    nuevo_offset = handler.offset + handler.escritos
+    actualizadas = SubidaComprobante.objects.filter(
+        pk=subida.pk,
+        bytes_recibidos=handler.offset,
+    ).update(bytes_recibidos=nuevo_offset, fecha_actualizacion=timezone.now())
+
+    handler.cerrar(aceptar=bool(actualizadas))
+    if actualizadas:
+        subida.bytes_recibidos = nuevo_offset
+    return bool(actualizadas)
+
+
+class ArchivoEnsamblado(UploadedFile):
+    """
+    El archivo parcial ya completo, presentado como un archivo subido.
+    Como tiene temporary_file_path(), FileSystemStorage lo mueve a su
+    destino final en vez de copiarlo.
+    """
+
+    def __init__(self, subida, content_type):
+        super().__init__(
+            open(subida.ruta_parcial, 'rb'),
+            name=subida.nombre_archivo,
+            content_type=content_type,
+            size=subida.tamano,
+        )
+        self.ruta = subida.ruta_parcial
+
+    def temporary_file_path(self):
+        return self.ruta
+
+
+def ensamblar(subida):
+    """
+    Devuelve (archivo, sha256) de una subida completa. El hash sale del
+    estado acumulado mientras llegaban los fragmentos.
+    """
+    sha = estado_hash(subida, subida.bytes_recibidos).hexdigest()
+    with open(subida.ruta_parcial, 'rb') as parcial:
+        content_type = detectar_tipo(parcial.read(BYTES_FIRMA))
+    archivo = ArchivoEnsamblado(subida, content_type)
+    # El almacenamiento por contenido lo usa en vez de volver a leer el archivo
+    archivo.sha256 = sha
+    return archivo, sha
+
+
+def finalizar_subida(subida):
+    # Se llama después de guardar el comprobante. Si el contenido ya estaba
+    # guardado el archivo parcial no se movió y hay que borrarlo.
+    if os.path.exists(subida.ruta_parcial):
+        os.remove(subida.ruta_parcial)
+    _descartar_hash(subida)
+    subida.delete()
+
+
+def limpiar_subidas(ahora=None):
+    """
+    Borra las subidas abandonadas (sin fragmentos nuevos en
+    SUBIDA_VIGENCIA_HORAS) y sus archivos parciales. Devuelve cuántas borró.
+    """
+    ahora = ahora or timezone.now()
+    limite = ahora - timedelta(hours=settings.SUBIDA_VIGENCIA_HORAS)
+    borradas = 0
+    for subida in SubidaComprobante.objects.filter(fecha_actualizacion__lt=limite).iterator():
+        if os.path.exists(subida.ruta_parcial):
+            os.remove(subida.ruta_parcial)
+        _descartar_hash(subida)
+        subida.delete()
+        borradas += 1
+    return borradas
@@ -0,0 +1,115 @@
+# pagoprop/tablero.py
+
+import time
+from decimal import Decimal
+
+from django.conf import settings
+from django.contrib.auth.models import User
+from django.core.cache import cache
+from django.db import connection, transaction
+from django.db.models import Exists, OuterRef
+from django.utils import timezone
+
+from .cache_versiones import obtener_version, incrementar_version
+from .models import Apartamento, PropietarioApartamento, Comprobante, ResumenMensual
+
+
+VERSION_TABLERO = 'tablero_admin'
+
+
+def invalidar_tablero():
+    # Se llama desde las señales de User, Apartamento, PropietarioApartamento y Comprobante.
+    # Otra vez después del commit: lo que se calculó entre medio (con los datos
+    # viejos) quedaría guardado con la versión nueva. El ETag de api.py la usa.
+    incrementar_version(VERSION_TABLERO)
+    transaction.on_commit(lambda: incrementar_version(VERSION_TABLERO))
+
+
+def _medir(tiempos, nombre, funcion):
+    inicio = time.perf_counter()
+    resultado = funcion()
+    tiempos[nombre] = round((time.perf_counter() - inicio) * 1000, 2)
+    return resultado
+
+
+def _cifras_generales():
+    """
+    Las cinco cifras del tablero en un solo viaje a la base de datos:
+    un SELECT con una subconsulta por cifra. Los totales de comprobantes
+    salen del resumen mensual, no de la tabla COMPROBANTE.
+    """
+    q = connection.ops.quote_name
+    usuario = User._meta
+    apartamento = Apartamento._meta
+    propietario = PropietarioApartamento._meta
+    resumen = ResumenMensual._meta
+
+    col_apto_pk = q(apartamento.pk.column)
+    col_prop_apto = q(propietario.get_field('apartamento').column)
+
+    sql = (
+        f"SELECT "
+        f"(SELECT COUNT(*) FROM {q(usuario.db_table)} WHERE {q(usuario.get_field('is_superuser').column)} = %s), "
+        f"(SELECT COUNT(*) FROM {q(apartamento.db_table)}), "
+        f"(SELECT COALESCE(SUM({q(resumen.get_field('cantidad').column)}), 0) FROM {q(resumen.db_table)}), "
+        f"(SELECT COALESCE(SUM({q(resumen.get_field('total').column)}), 0) FROM {q(resumen.db_table)}), "
+        f"(SELECT COUNT(*) FROM {q(apartamento.db_table)} a WHERE NOT EXISTS ("
+        f"SELECT 1 FROM {q(propietario.db_table)} p WHERE p.{col_prop_apto} = a.{col_apto_pk}))"
+    )
+    with connection.cursor() as cursor:
+        cursor.execute(sql, [False])
+        usuarios, apartamentos, comprobantes, recaudado, sin_propietario = cursor.fetchone()
+
+    return {
+        'total_usuarios': int(usuarios),
+        'total_apartamentos': int(apartamentos),
+        'total_comprobantes': int(comprobantes),
+        'total_recaudado': Decimal(str(recaudado)),
+        'total_sin_propietario': int(sin_propietario),
+    }
+
+
+def _apartamentos_sin_propietario():
+    sin_propietario = ~Exists(PropietarioApartamento.objects.filter(apartamento=OuterRef('pk')))
+    return list(Apartamento.objects.filter(sin_propietario).order_by('numeroApartamento'))
+
+
+def _comprobantes_recientes():
+    return list(
+        Comprobante.objects.select_related('copropietario', 'apartamento').order_by('-fecha_creacion')[:10]
+    )
+
+
+def calcular_tablero():
+    tiempos = {}
+    datos = _medir(tiempos, 'cifras', _cifras_generales)
+
+    # La lista solo se consulta si hay apartamentos sin propietario
+    if datos['total_sin_propietario']:
+        datos['apartamentos_sin_propietario'] = _medir(tiempos, 'sin_propietario', _apartamentos_sin_propietario)
+    else:
+        datos['apartamentos_sin_propietario'] = []
+
+    datos['comprobantes_recientes'] = _medir(tiempos, 'recientes', _comprobantes_recientes)
+    datos['tiempos_ms'] = tiempos
+    datos['calculado_en'] = timezone.now()
+    return datos
+
+
+def estadisticas_tablero(refrescar=False):
+    """
+    Estadísticas del panel de administración. Se guardan en caché bajo una
+    versión que las señales incrementan cuando cambian usuarios,
+    apartamentos, asignaciones o comprobantes; el TTL es solo un respaldo.
+
+    Devuelve el dict de cifras más 'calculado_en', 'tiempos_ms' y 'desde_cache'.
+    """
+    llave = f'pagoprop:tablero:{obtener_version(VERSION_TABLERO)}'
+
+    datos = None if refrescar else cache.get(llave)
+    if datos is None:
+        datos = calcular_tablero()
+        cache.set(llave, datos, timeout=settings.TABLERO_CACHE_SEGUNDOS)
+        return {**datos, 'desde_cache': False}
+
+    return {**datos, 'desde_cache': True}
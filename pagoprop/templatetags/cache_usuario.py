@@ -0,0 +1,46 @@
+from django import template
+
+from pagoprop.cache_paginas import fragmento
+
+register = template.Library()
+
+
+class CacheUsuarioNode(template.Node):
+    def __init__(self, nodelist, nombre, partes):
+        self.nodelist = nodelist
+        self.nombre = nombre
+        self.partes = partes
+
+    def render(self, context):
+        usuario = context.get('user')
+        if usuario is None or not usuario.is_authenticated:
+            return self.nodelist.render(context)
+        return fragmento(
+            usuario.pk,
+            self.nombre.resolve(context),
+            [parte.resolve(context) for parte in self.partes],
+            lambda: self.nodelist.render(context),
+        )
+
+
+@register.tag('cache_usuario')
+def cache_usuario(parser, token):
+    """
+    Guarda en caché el contenido para el usuario actual hasta que cambien
+    sus datos (ver cache_paginas.py). Lo que va adentro no debe tener
+    csrf_token ni mensajes:
+
+        {% cache_usuario 'detalle_apartamento' apartamento.pk %}
+            ...
+        {% endcache_usuario %}
+    """
+    partes = token.split_contents()
+    if len(partes) < 2:
+        raise template.TemplateSyntaxError(f'"{partes[0]}" necesita al menos el nombre del fragmento.')
+    nodelist = parser.parse(('endcache_usuario',))
+    parser.delete_first_token()
+    return CacheUsuarioNode(
+        nodelist,
+        parser.compile_filter(partes[1]),
+        [parser.compile_filter(parte) for parte in partes[2:]],
+    )
@@ -1,3 +1,116 @@
-from django.test import TestCase
+import io
+from datetime import date
+from decimal import Decimal
 
-# Create your tests here.
+from django.test import SimpleTestCase
+
+from .conciliacion import ErrorExtracto, emparejar, leer_extracto
+
+
+def _csv(texto):
+    return io.BytesIO(texto.encode('utf-8'))
+
+
+class LeerExtractoTests(SimpleTestCase):
+
+    def test_separador_punto_y_coma(self):
+        lectura = leer_extracto(_csv('Fecha;Descripcion;Valor\n18/10/2026;Consig;5000\n'), 'extracto.csv')
+        self.assertEqual(len(lectura.movimientos), 1)
+        self.assertEqual(lectura.movimientos[0].fecha, date(2026, 10, 18))
+        self.assertEqual(lectura.movimientos[0].monto, Decimal('5000.00'))
+
+    def test_lineas_antes_del_encabezado(self):
+        lectura = leer_extracto(
+            _csv('BANCO X\nCuenta 123\nFecha;Descripcion;Valor\n18/10/2026;Consig;5000\n'),
+            'extracto.csv'
+        )
+        self.assertEqual(len(lectura.movimientos), 1)
+        movimiento = lectura.movimientos[0]
+        self.assertEqual(movimiento.linea, 4)
+        self.assertEqual(movimiento.descripcion, 'Consig')
+        self.assertEqual(movimiento.monto, Decimal('5000.00'))
+
+    def test_lineas_antes_del_encabezado_con_comas_y_tabs(self):
+        for separador in (',', '\t'):
+            texto = f'BANCO X\nCuenta: 123-456\n\nFecha{separador}Valor\n2026-10-18{separador}"1.200.000,50"\n'
+            lectura = leer_extracto(_csv(texto), 'extracto.csv')
+            self.assertEqual([m.monto for m in lectura.movimientos], [Decimal('1200000.50')])
+
+    def test_omite_debitos_y_reporta_totales(self):
+        lectura = leer_extracto(
+            _csv('Fecha;Valor\n18/10/2026;-300\n19/10/2026;700\nTotal;400\n'),
+            'extracto.csv'
+        )
+        self.assertEqual([m.monto for m in lectura.movimientos], [Decimal('700.00')])
+        self.assertEqual(lectura.omitidos, 1)
+        self.assertEqual(lectura.errores, [(4, 'Fecha o monto no válidos.')])
+
+    def test_cp1252(self):
+        texto = 'Fecha;Descripción;Crédito\n18/10/2026;Consignación;5000\n'.encode('cp1252')
+        lectura = leer_extracto(io.BytesIO(texto), 'extracto.csv')
+        self.assertEqual(len(lectura.movimientos), 1)
+        self.assertEqual(lectura.movimientos[0].descripcion, 'Consignación')
+
+    def test_utf8_con_bom(self):
+        texto = '\ufeffFecha;Descripción;Valor\n18/10/2026;Consignación;5000\n'.encode('utf-8')
+        lectura = leer_extracto(io.BytesIO(texto), 'extracto.csv')
+        self.assertEqual(lectura.movimientos[0].descripcion, 'Consignación')
+
+    def test_monto_demasiado_grande(self):
+        lectura = leer_extracto(
+            _csv('Fecha;Valor\n18/10/2026;99999999999999999\n19/10/2026;9999999999,99\n'),
+            'extracto.csv'
+        )
+        self.assertEqual([m.monto for m in lectura.movimientos], [Decimal('9999999999.99')])
+        self.assertEqual(lectura.errores, [(2, 'Monto demasiado grande.')])
+
+    def test_sin_encabezado(self):
+        with self.assertRaises(ErrorExtracto):
+            leer_extracto(_csv('BANCO X\nCuenta 123\n18/10/2026;Consig;5000\n'), 'extracto.csv')
+
+
+class EmparejarTests(SimpleTestCase):
+
+    def _indice(self, *comprobantes):
+        # comprobantes: (comprobanteID, monto, fecha)
+        indice = {}
+        for comprobante_id, monto, fecha in comprobantes:
+            indice.setdefault(Decimal(monto), []).append((fecha.toordinal(), comprobante_id))
+        for lista in indice.values():
+            lista.sort()
+        return indice
+
+    def test_unico_candidato_dentro_de_la_tolerancia(self):
+        indice = self._indice((1, '5000', date(2026, 10, 16)), (2, '5000', date(2026, 10, 25)))
+        conciliados, ambiguos = emparejar([(10, date(2026, 10, 18), Decimal('5000'))], indice, 3)
+        self.assertEqual(conciliados, {10: 1})
+        self.assertEqual(ambiguos, {})
+
+    def test_sin_candidatos(self):
+        indice = self._indice((1, '5000', date(2026, 10, 10)), (2, '4000', date(2026, 10, 18)))
+        conciliados, ambiguos = emparejar([(10, date(2026, 10, 18), Decimal('5000'))], indice, 3)
+        self.assertEqual((conciliados, ambiguos), ({}, {}))
+
+    def test_ambiguo(self):
+        indice = self._indice((1, '5000', date(2026, 10, 17)), (2, '5000', date(2026, 10, 19)))
+        conciliados, ambiguos = emparejar([(10, date(2026, 10, 18), Decimal('5000'))], indice, 3)
+        self.assertEqual(conciliados, {})
+        self.assertEqual(ambiguos, {10: [1, 2]})
+
+    def test_varios_movimientos_con_el_mismo_monto(self):
+        indice = self._indice((1, '5000', date(2026, 10, 12)), (2, '5000', date(2026, 10, 20)))
+        conciliados, ambiguos = emparejar([
+            (10, date(2026, 10, 13), Decimal('5000')),
+            (11, date(2026, 10, 19), Decimal('5000')),
+        ], indice, 3)
+        self.assertEqual(conciliados, {10: 1, 11: 2})
+        self.assertEqual(ambiguos, {})
+
+    def test_comprobante_reclamado_por_dos_movimientos(self):
+        indice = self._indice((1, '5000', date(2026, 10, 18)))
+        conciliados, ambiguos = emparejar([
+            (10, date(2026, 10, 17), Decimal('5000')),
+            (11, date(2026, 10, 19), Decimal('5000')),
+        ], indice, 3)
+        self.assertEqual(conciliados, {})
+        self.assertEqual(ambiguos, {10: [1], 11: [1]})
@@ -28,11 +28,42 @@ urlpatterns = [
     path('mis-comprobantes/', views.mis_comprobantes_view, name='mis_comprobantes'),
     path('editar-comprobante/<int:comprobante_id>/', views.editar_comprobante_view, name='editar_comprobante'),
     path('eliminar-comprobante/<int:comprobante_id>/', views.eliminar_comprobante_view, name='eliminar_comprobante'),
+
+    # Archivos de comprobantes (con control de acceso)
+    path('comprobantes/<int:comprobante_id>/archivo/', views.archivo_comprobante_view, name='archivo_comprobante'),
+    path('comprobantes/<int:comprobante_id>/miniatura/', views.archivo_comprobante_view, {'tipo': 'miniatura'}, name='miniatura_comprobante'),
+    path('comprobantes/<int:comprobante_id>/vista-previa/', views.archivo_comprobante_view, {'tipo': 'vista_previa'}, name='vista_previa_comprobante'),
+
+    # Subida de varios comprobantes a la vez
+    path('subir-lote/', views.subir_lote_view, name='subir_lote'),
+
+    # Subida por partes (reanudable)
+    path('subidas/', views.subida_iniciar_view, name='subida_iniciar'),
+    path('subidas/<uuid:token>/', views.subida_estado_view, name='subida_estado'),
+    path('subidas/<uuid:token>/fragmento/', views.subida_fragmento_view, name='subida_fragmento'),
+    path('subidas/<uuid:token>/completar/', views.subida_completar_view, name='subida_completar'),
     
     # Administrador
     path('admin-dashboard/', views.admin_dashboard_view, name='admin_dashboard'),
     path('admin-comprobantes/', views.admin_todos_comprobantes_view, name='admin_todos_comprobantes'),
     path('admin-asignar/', views.admin_asignar_apartamento_view, name='admin_asignar_apartamento'),
+    path('admin-asignar/usuarios/', views.admin_buscar_usuarios_view, name='admin_buscar_usuarios'),
+    path('admin-asignar/apartamentos/', views.admin_buscar_apartamentos_view, name='admin_buscar_apartamentos'),
+    path('admin-asignar/importar/', views.admin_importar_asignaciones_view, name='admin_importar_asignaciones'),
+    path('admin-apartamentos/generar/', views.admin_generar_apartamentos_view, name='admin_generar_apartamentos'),
+    path('admin-conciliacion/', views.admin_conciliacion_view, name='admin_conciliacion'),
+    path('admin-conciliacion/<int:extracto_id>/', views.admin_extracto_view, name='admin_extracto'),
     path('admin-eliminar-asignacion/<int:asignacion_id>/', views.admin_eliminar_asignacion_view, name='admin_eliminar_asignacion'),
     path('admin-exportar-excel/', views.exportar_comprobantes_excel, name='admin_exportar_excel'),  # 👈 NUEVA
+    path('admin-exportaciones/solicitar/', views.admin_solicitar_exportacion_view, name='admin_solicitar_exportacion'),
+    path('admin-exportaciones/<int:exportacion_id>/', views.admin_estado_exportacion_view, name='admin_estado_exportacion'),
+    path('admin-exportaciones/<int:exportacion_id>/progreso/', views.admin_progreso_exportacion_view, name='admin_progreso_exportacion'),
+    path('admin-exportaciones/<int:exportacion_id>/descargar/', views.admin_descargar_exportacion_view, name='admin_descargar_exportacion'),
+
+    # API JSON de solo lectura (ver api.py)
+    path('api/comprobantes/', views.api_mis_comprobantes_view, name='api_mis_comprobantes'),
+    path('api/apartamentos/', views.api_mis_apartamentos_view, name='api_mis_apartamentos'),
+    path('api/admin/comprobantes/', views.api_admin_comprobantes_view, name='api_admin_comprobantes'),
+    path('api/admin/apartamentos/', views.api_admin_apartamentos_view, name='api_admin_apartamentos'),
+    path('api/admin/asignaciones/', views.api_admin_asignaciones_view, name='api_admin_asignaciones'),
 ]
\ No newline at end of file
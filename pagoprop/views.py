@@ -1,14 +1,30 @@
 import os
+from django.db import transaction
 from django.shortcuts import render, redirect
 from django.contrib.auth import login, authenticate, logout
 from django.contrib.auth.decorators import login_required
 from django.contrib import messages
-from .forms import RegistroForm, LoginForm, ComprobanteForm, FiltroComprobantesForm, EditarPerfilForm
-from .models import Apartamento, PropietarioApartamento, Comprobante, User
-# importo el paginador
-from django.core.paginator import Paginator
+from .forms import RegistroForm, LoginForm, ComprobanteForm, EditarPerfilForm, LoteComprobantesForm, ImportarAsignacionesForm, GenerarApartamentosForm, ImportarExtractoForm
+from .filtros import formulario_filtros, filtrar_comprobantes, aplicar_filtros, serializar_filtros, hay_filtros_activos
+from .models import Apartamento, PropietarioApartamento, Comprobante, User, ExportacionComprobantes, SubidaComprobante, ExtractoBancario, MovimientoBancario
+from .subidas import FragmentoUploadHandler, iniciar_subida, registrar_fragmento, ensamblar, finalizar_subida
+# importo el paginador por cursor
+from .paginacion import paginar_por_cursor
+from .conteos import contar_comprobantes
+from .resumenes import estadisticas_apartamento
+from .tablero import estadisticas_tablero
+from .contadores import estadisticas_usuario
+from .archivos import contar_duplicados
+from .entrega import puede_ver_comprobante, servir_archivo, servir_datos
+from .paquetes import leer_frio
+from .lotes import procesar_lote
+from .asignaciones import importar as importar_asignaciones, CREAR, EXISTENTE
+from .inventario import provisionar
+from .conciliacion import ErrorExtracto, conciliar, conciliar_manual, importar_extracto, reporte
+from .membresias import apartamento_de, apartamentos_de
+from . import api
+from .autocompletado import buscar_usuarios, buscar_apartamentos, filtrar_asignaciones, leer_limite
 
-#importo formulario de filtros
 #staff
 from django.contrib.admin.views.decorators import staff_member_required
 # from django.contrib.auth.models import User  # 👈 AGREGAR
@@ -17,9 +33,15 @@ from django.contrib.auth import update_session_auth_hash
 
 
 #importaciones para excel
-from django.http import HttpResponse
-from openpyxl import Workbook
-from openpyxl.styles import Font, Alignment, PatternFill
+from django.http import FileResponse, Http404, JsonResponse
+from django.urls import reverse
+from django.views.decorators.http import condition, require_POST, require_safe
+from django.views.decorators.gzip import gzip_page
+from django.views.decorators.csrf import csrf_exempt, csrf_protect
+from django.conf import settings
+from django.core.paginator import Paginator
+from django.utils.functional import SimpleLazyObject
+from .exportacion import generar_excel_temporal, CONTENT_TYPE_EXCEL, solicitar_exportacion
 from datetime import datetime
 
 
@@ -70,15 +92,14 @@ def logout_view(request):
 
 @login_required(login_url='login')
 def dashboard_view(request):
-    # Contar apartamentos del usuario
-    total_apartamentos = request.user.apartamentos.count()
-    # Contar comprobantes del usuario
-    total_comprobantes = Comprobante.objects.filter(copropietario=request.user).count()
+    # Contadores precalculados del usuario (una búsqueda por llave primaria)
+    estadisticas = estadisticas_usuario(request.user)
     
     return render(request, 'pagoprop/dashboard.html', {
         'user': request.user,
-        'total_apartamentos': total_apartamentos,
-        'total_comprobantes': total_comprobantes,
+        'total_apartamentos': estadisticas.total_apartamentos,
+        'total_comprobantes': estadisticas.total_comprobantes,
+        'estadisticas': estadisticas,
     })
 
 
@@ -88,7 +109,7 @@ def dashboard_view(request):
 def mis_apartamentos_view(request):
     # Buscar apartamentos del usuario logueado
     # through='PropietarioApartamento' nos permite hacer esta consulta
-    apartamentos = request.user.apartamentos.all()
+    apartamentos = apartamentos_de(request.user)
     
     # Enviar los apartamentos al template
     return render(request, 'pagoprop/mis_apartamentos.html', {
@@ -110,10 +131,12 @@ def subir_comprobante_view(request):
             # Asignar el usuario logueado como copropietario
             comprobante.copropietario = request.user
             
-            # AHORA SÍ guardar en la BD
-            comprobante.save()
+            # AHORA SÍ guardar en la BD (junto con el resumen mensual)
+            with transaction.atomic():
+                comprobante.save()
             
             messages.success(request, '¡Comprobante subido exitosamente!')
+            _avisar_duplicado(request, comprobante)
             return redirect('mis_comprobantes')
         else:
             messages.error(request, 'Error al subir el comprobante. Verifica los datos.')
@@ -126,63 +149,84 @@ def subir_comprobante_view(request):
     })
 
 
-# Vista para ver mis comprobantes
+# Vista para subir varios comprobantes a la vez (archivos sueltos o un ZIP)
 @login_required(login_url='login')
-def mis_comprobantes_view(request):
+def subir_lote_view(request):
+    elementos = []
+    if request.method == 'POST':
+        form = LoteComprobantesForm(request.user, request.POST)
+        archivos = request.FILES.getlist('archivos')
 
-    # Traer TODOS los comprobantes del usuario logueado
-    comprobantes_list = Comprobante.objects.filter(copropietario=request.user).order_by('-fecha_creacion')
-    # ↑ .filter(): Solo los del usuario
-    # ↑ .order_by('-fecha_creacion'): Más recientes primero (el - significa descendente)
+        if not archivos:
+            messages.error(request, 'Selecciona al menos un archivo.')
+        else:
+            elementos = procesar_lote(request.user, archivos, request.POST)
+            guardados = [e for e in elementos if e.comprobante]
+            con_errores = len(elementos) - len(guardados)
+            repetidos = sum(1 for e in guardados if e.duplicado)
+
+            if guardados:
+                messages.success(request, f'¡{len(guardados)} comprobante(s) subido(s) exitosamente!')
+            if repetidos:
+                messages.warning(request, f'{repetidos} archivo(s) son idénticos a comprobantes ya subidos.')
+            if not con_errores:
+                return redirect('mis_comprobantes')
+            messages.error(request, f'{con_errores} archivo(s) no se subieron. Revisa los errores.')
+    else:
+        form = LoteComprobantesForm(request.user)
 
-    # CREAR FORMULARIO DE FILTROS
-    filtro_form = FiltroComprobantesForm(request.user, request.GET)
+    return render(request, 'pagoprop/subir_lote.html', {
+        'form': form,
+        'elementos': elementos,
+        'maximo_archivos': settings.LOTE_MAXIMO_ARCHIVOS,
+    })
 
-    if filtro_form.is_valid():
 
-        #filtrar por apartamento
-        apartamento = filtro_form.cleaned_data.get('apartamento')
-        if apartamento:
-            comprobantes_list = comprobantes_list.filter(apartamento=apartamento)
+def _avisar_duplicado(request, comprobante):
+    # El mismo archivo exacto ya estaba subido: se guarda igual, pero se avisa
+    duplicados = contar_duplicados(comprobante)
+    if duplicados:
+        messages.warning(
+            request,
+            f'Este archivo es idéntico a {duplicados} comprobante(s) ya subido(s). '
+            'Verifica que no estés registrando el mismo pago dos veces.'
+        )
+    return duplicados
 
-        #filtrar por fecha desde
-        fecha_desde = filtro_form.cleaned_data.get('fecha_desde')
-        if fecha_desde:
-            comprobantes_list = comprobantes_list.filter(fecha_creacion__date__gte=fecha_desde)
-        
-        #filtrar por fecha hasta
-        fecha_hasta = filtro_form.cleaned_data.get('fecha_hasta')
-        if fecha_hasta:
-            comprobantes_list = comprobantes_list.filter(fecha_creacion__date__lte=fecha_hasta)
 
-        #filtrar por monto minimo
-        monto_minimo = filtro_form.cleaned_data.get('monto_minimo')
-        if monto_minimo:
-            comprobantes_list = comprobantes_list.filter(monto__gte=monto_minimo)
+# Vista para ver mis comprobantes
+@login_required(login_url='login')
+def mis_comprobantes_view(request):
 
-        #filtrar por monto maximo
-        monto_maximo = filtro_form.cleaned_data.get('monto_maximo')
-        if monto_maximo:
-            comprobantes_list = comprobantes_list.filter(monto__lte=monto_maximo)
+    # Traer TODOS los comprobantes del usuario logueado
+    comprobantes_list = Comprobante.objects.filter(copropietario=request.user).order_by('-fecha_creacion')
+    # ↑ .filter(): Solo los del usuario
+    # ↑ .order_by('-fecha_creacion'): Más recientes primero (el - significa descendente)
 
+    # CREAR FORMULARIO DE FILTROS Y APLICARLOS (rango de fechas amigable con los índices)
+    filtro_form = formulario_filtros(request.user, request.GET)
+    comprobantes_list = filtrar_comprobantes(comprobantes_list, filtro_form)
 
-    # CREAR PAGINADOR {10 POR PAGINA}
-    paginator = Paginator(comprobantes_list, 10)
 
-    #obtener el numero de pagina actual desde la URL (?page = 2)
-    page_number = request.GET.get('page')
-    # ↑ Lee el parámetro ?page=2 de la URL
-    # Si no existe, devuelve None
+    # PAGINAR POR CURSOR {10 POR PAGINA}
+    # ↑ Lee el parámetro ?cursor=... de la URL (si no existe, primera página)
+    # ↑ Cada página cuesta lo mismo: no hay OFFSET ni COUNT(*) por página
+    # Perezoso: si la tabla está en caché ({% cache_usuario %}) no se consulta
+    comprobantes = SimpleLazyObject(
+        lambda: paginar_por_cursor(comprobantes_list.select_related('apartamento'), request, 10)
+    )
 
-    #obtener los comprobantes de la pagina
-    comprobantes= paginator.get_page(page_number)
-    
-    # ↑ Obtiene los comprobantes de esa página específica
-    # Si page_number es None, devuelve la página 1
-    # Si page_number es 999 (no existe), devuelve la última página
+    # Total solo cuando hay filtros activos (se muestra en el aviso de resultados)
+    total_filtrados = None
+    if hay_filtros_activos(filtro_form):
+        total_filtrados = contar_comprobantes(
+            comprobantes_list, filtro_form, alcance=f'usuario:{request.user.pk}'
+        )['cantidad']
 
     return render(request, 'pagoprop/mis_comprobantes.html', {
-        'comprobantes': comprobantes
+        'comprobantes': comprobantes,
+        'total_filtrados': total_filtrados,
+        'apartamentos_usuario': apartamentos_de(request.user),
     })
 
 
@@ -196,13 +240,10 @@ def eliminar_comprobante_view(request, comprobante_id):
         messages.error(request, 'Comprobante no encontrado o no tienes permiso para eliminarlo.')
         return redirect('mis_comprobantes')
     
-    #eliminar el archivo fisico del servidor
-    if comprobante.archivo:
-        if os.path.isfile(comprobante.archivo.path):
-            os.remove(comprobante.archivo.path)
-
-    #eliminar el registro de la base de datos
-    comprobante.delete()
+    #eliminar el registro de la base de datos (junto con el resumen mensual).
+    #el archivo fisico lo borra la señal solo si ningun otro comprobante lo usa
+    with transaction.atomic():
+        comprobante.delete()
     
     messages.success(request, '¡Comprobante eliminado exitosamente!')
     return redirect('mis_comprobantes')
@@ -221,8 +262,11 @@ def editar_comprobante_view(request, comprobante_id):
         form = ComprobanteForm(request.user, request.POST, request.FILES, instance=comprobante)
 
         if form.is_valid():
-            form.save()
+            with transaction.atomic():
+                form.save()
             messages.success(request, '¡Comprobante actualizado exitosamente!')
+            if 'archivo' in form.changed_data:
+                _avisar_duplicado(request, comprobante)
             return redirect('mis_comprobantes')
         else:
             messages.error(request,'Error al actualizar el comprobante.')
@@ -239,16 +283,13 @@ def editar_comprobante_view(request, comprobante_id):
 #funcion de ver detalles del apartamento
 @login_required(login_url='login')
 def detalle_apartamento_view(request, apartamento_id):
-    #buscar el apartamento
-    try:
-        apartamento = Apartamento.objects.get(apartamentoID=apartamento_id)
-    except Apartamento.DoesNotExist:
-        messages.error(request, 'Apartamento no encontrado.')
-        return redirect('mis_apartamentos')
-    
-    #verficar que el usuario es propietario de ese apartamento
-    if not PropietarioApartamento.objects.filter(copropietario = request.user, apartamento = apartamento).exists():
-        messages.error(request, 'No tienes acceso a este apartamento.')
+    #buscar el apartamento entre los del usuario (membresias.py, sin consulta)
+    apartamento = apartamento_de(request.user, apartamento_id)
+    if apartamento is None:
+        if Apartamento.objects.filter(apartamentoID=apartamento_id).exists():
+            messages.error(request, 'No tienes acceso a este apartamento.')
+        else:
+            messages.error(request, 'Apartamento no encontrado.')
         return redirect('mis_apartamentos')
     
     #obtener comprobantes de este apartamento
@@ -258,13 +299,9 @@ def detalle_apartamento_view(request, apartamento_id):
     ).order_by('-fecha_creacion')
 
 
-    #calcular estadisticas
-    from django.db.models import Sum, Count, Avg
-    stats = comprobantes.aggregate(
-        total_pagado = Sum('monto'),
-        cantidad_pagos = Count('comprobanteID'),
-        promedio_pago = Avg('monto')
-    )
+    #estadisticas desde el resumen mensual (unas pocas filas en vez de todos los comprobantes)
+    #perezosas: si el detalle está en caché ({% cache_usuario %}) no se calculan
+    stats = SimpleLazyObject(lambda: estadisticas_apartamento(apartamento, request.user))
 
     #obtener todos los propietarios del apartamento
     propietarios = PropietarioApartamento.objects.filter(apartamento=apartamento).select_related('copropietario')
@@ -283,96 +320,11 @@ from django.contrib.admin.views.decorators import staff_member_required
 # Dashboard del administrador
 @staff_member_required(login_url='login')
 def admin_dashboard_view(request):
-    # Estadísticas generales del edificio
-    from django.db.models import Sum, Count, Avg
-    
-    # Total de usuarios
-    total_usuarios = User.objects.filter(is_superuser=False).count()
-    
-    # Total de apartamentos
-    total_apartamentos = Apartamento.objects.count()
-    
-    # Total de comprobantes
-    total_comprobantes = Comprobante.objects.count()
-    
-    # Total recaudado
-    total_recaudado = Comprobante.objects.aggregate(total=Sum('monto'))['total'] or 0
-    
-    # Comprobantes recientes (últimos 10)
-    comprobantes_recientes = Comprobante.objects.select_related(
-        'copropietario', 'apartamento'
-    ).order_by('-fecha_creacion')[:10]
-    
-    # Apartamentos sin propietarios
-    apartamentos_sin_propietario = Apartamento.objects.annotate(
-        num_propietarios=Count('propietario_apartamentos')
-    ).filter(num_propietarios=0)
-    
-    return render(request, 'pagoprop/admin_dashboard.html', {
-        'total_usuarios': total_usuarios,
-        'total_apartamentos': total_apartamentos,
-        'total_comprobantes': total_comprobantes,
-        'total_recaudado': total_recaudado,
-        'comprobantes_recientes': comprobantes_recientes,
-        'apartamentos_sin_propietario': apartamentos_sin_propietario,
-
-    })
-
-# ver todos los comprobantes
-@staff_member_required(login_url='login')
-def admin_todos_comprobantes_view(request):
-    # obtener todos los comprobantes de todos los usuarios
-    comprobantes_list = Comprobante.objects.select_related(
-        'copropietario', 'apartamento'
-    ).order_by('-fecha_creacion')
-    
-    # Crear el formulario de filtros
-    filtro_form = FiltroComprobantesForm(request.user, request.GET)
-    
-    # Aplicar filtros si el formulario es válido
-    if filtro_form.is_valid():
-        # Filtrar por apartamento
-        apartamento = filtro_form.cleaned_data.get('apartamento')
-        if apartamento:
-            comprobantes_list = comprobantes_list.filter(apartamento=apartamento)
-        
-        # Filtrar por fecha desde
-        fecha_desde = filtro_form.cleaned_data.get('fecha_desde')
-        if fecha_desde:
-            comprobantes_list = comprobantes_list.filter(fecha_creacion__date__gte=fecha_desde)
-        
-        # Filtrar por fecha hasta
-        fecha_hasta = filtro_form.cleaned_data.get('fecha_hasta')
-        if fecha_hasta:
-            comprobantes_list = comprobantes_list.filter(fecha_creacion__date__lte=fecha_hasta)
-        
-        # Filtrar por monto mínimo
-        monto_minimo = filtro_form.cleaned_data.get('monto_minimo')
-        if monto_minimo:
-            comprobantes_list = comprobantes_list.filter(monto__gte=monto_minimo)
-        
-        # Filtrar por monto máximo
-        monto_maximo = filtro_form.cleaned_data.get('monto_maximo')
-        if monto_maximo:
-            comprobantes_list = comprobantes_list.filter(monto__lte=monto_maximo)
+    # Estadísticas generales del edificio (en caché, se invalidan con señales)
+    # ?refrescar=1 fuerza el recálculo
+    stats = estadisticas_tablero(refrescar=bool(request.GET.get('refrescar')))
     
-    # Paginador
-    paginator = Paginator(comprobantes_list, 20)  # 20 registros por página
-    page_number = request.GET.get('page')
-    comprobantes = paginator.get_page(page_number)
-    
-    # Estadísticas (sobre resultados filtrados)
-    from django.db.models import Count
-    stats = {
-        'cantidad': comprobantes_list.count()
-    }
-    
-    return render(request, 'pagoprop/admin_todos_comprobantes.html', {
-        'comprobantes': comprobantes,
-        'stats': stats,
-        'filtro_form': filtro_form
-    })
-
+    return render(request, 'pagoprop/admin_dashboard.html', stats)
 
 # asignar apartamento a usuario (admin)
 @staff_member_required(login_url='login')
@@ -399,22 +351,153 @@ def admin_asignar_apartamento_view(request):
                 messages.success(request, f'✅ Apartamento {apartamento.numeroApartamento} asignado a {usuario.get_full_name()}')
                 return redirect('admin_asignar_apartamento')
         
-        except (User.DoesNotExist, Apartamento.DoesNotExist):
+        except (User.DoesNotExist, Apartamento.DoesNotExist, ValueError):
             messages.error(request, 'Usuario o apartamento no encontrado.')
 
-    # GET motrar formulario
-    usuarios= User.objects.filter(is_superuser=False).order_by('first_name', 'last_name')
-    apartamentos = Apartamento.objects.all().order_by('numeroApartamento')
-
-    # asignaciones actuales
-    asignaciones = PropietarioApartamento.objects.select_related(
-        'copropietario', 'apartamento'
-    ).order_by('apartamento__numeroApartamento')
+    # GET: los usuarios y apartamentos se buscan con el autocompletado y
+    # las asignaciones actuales se muestran por páginas
+    busqueda = request.GET.get('q', '').strip()
+    asignaciones = Paginator(filtrar_asignaciones(busqueda), 25).get_page(request.GET.get('page'))
 
     return render(request, 'pagoprop/admin_asignar_apartamento.html',{
-        'usuarios': usuarios,
-        'apartamentos': apartamentos,
-        'asignaciones':asignaciones
+        'asignaciones': asignaciones,
+        'busqueda': busqueda,
+    })
+
+# Autocompletado de usuarios y apartamentos (Admin)
+@staff_member_required(login_url='login')
+@require_safe
+def admin_buscar_usuarios_view(request):
+    resultados, mas = buscar_usuarios(request.GET.get('q'), leer_limite(request.GET.get('limite')))
+    return JsonResponse({'resultados': resultados, 'mas': mas})
+
+@staff_member_required(login_url='login')
+@require_safe
+def admin_buscar_apartamentos_view(request):
+    resultados, mas = buscar_apartamentos(request.GET.get('q'), leer_limite(request.GET.get('limite')))
+    return JsonResponse({'resultados': resultados, 'mas': mas})
+
+# Importar asignaciones desde un CSV (Admin)
+@staff_member_required(login_url='login')
+def admin_importar_asignaciones_view(request):
+    filas = totales = None
+    if request.method == 'POST':
+        form = ImportarAsignacionesForm(request.POST, request.FILES)
+        if form.is_valid():
+            simular = form.cleaned_data['simular']
+            filas, totales = importar_asignaciones(form.cleaned_data['contenido'], simular=simular)
+            if not simular:
+                messages.success(
+                    request,
+                    f'✅ {totales[CREAR]} asignación(es) creada(s), {totales[EXISTENTE]} ya existían.'
+                )
+                return redirect('admin_asignar_apartamento')
+            # Para confirmar se reenvía el mismo CSV, ya sin simular
+            form = ImportarAsignacionesForm(initial={
+                'contenido': form.cleaned_data['contenido'],
+                'simular': False,
+            })
+    else:
+        form = ImportarAsignacionesForm()
+
+    return render(request, 'pagoprop/admin_importar_asignaciones.html', {
+        'form': form,
+        'filas': filas,
+        'totales': totales,
+        'por_crear': totales[CREAR] if totales else 0,
+    })
+
+# Crear los apartamentos del edificio (Admin)
+@staff_member_required(login_url='login')
+def admin_generar_apartamentos_view(request):
+    resultado = None
+    if request.method == 'POST':
+        form = GenerarApartamentosForm(request.POST, request.FILES)
+        if form.is_valid():
+            simular = form.cleaned_data['simular']
+            resultado = provisionar(form.cleaned_data['numeros'], simular=simular)
+            if not simular:
+                messages.success(
+                    request,
+                    f'✅ {resultado["creados"]} apartamento(s) creado(s), {resultado["existentes"]} ya existían.'
+                )
+                return redirect('admin_generar_apartamentos')
+            # Para confirmar se reenvían los mismos datos, ya sin simular
+            form = GenerarApartamentosForm(initial={**form.cleaned_data, 'archivo': None, 'simular': False})
+    else:
+        form = GenerarApartamentosForm()
+
+    return render(request, 'pagoprop/admin_generar_apartamentos.html', {
+        'form': form,
+        'resultado': resultado,
+        'muestra': resultado['nuevos'][:30] if resultado else [],
+        'total_apartamentos': Apartamento.objects.count(),
+    })
+
+# Conciliación de extractos bancarios (Admin, ver conciliacion.py)
+@staff_member_required(login_url='login')
+def admin_conciliacion_view(request):
+    if request.method == 'POST':
+        form = ImportarExtractoForm(request.POST, request.FILES)
+        if form.is_valid():
+            archivo = form.cleaned_data['archivo']
+            try:
+                extracto, lectura, resultado = importar_extracto(
+                    archivo, archivo.name, request.user, form.cleaned_data['tolerancia_dias']
+                )
+            except ErrorExtracto as e:
+                messages.error(request, str(e))
+            else:
+                if lectura is None:
+                    messages.info(request, 'Ese extracto ya estaba importado: se volvió a conciliar.')
+                else:
+                    messages.success(
+                        request,
+                        f'✅ {len(lectura.movimientos)} consignación(es) importada(s), {lectura.omitidos} fila(s) omitida(s)'
+                        + (f', {len(lectura.errores)} con error.' if lectura.errores else '.')
+                    )
+                return redirect('admin_extracto', extracto_id=extracto.pk)
+    else:
+        form = ImportarExtractoForm()
+
+    return render(request, 'pagoprop/admin_conciliacion.html', {
+        'form': form,
+        'extractos': ExtractoBancario.objects.select_related('subido_por')[:20],
+    })
+
+@staff_member_required(login_url='login')
+def admin_extracto_view(request, extracto_id):
+    try:
+        extracto = ExtractoBancario.objects.get(extractoID=extracto_id)
+    except ExtractoBancario.DoesNotExist:
+        messages.error(request, 'Extracto no encontrado.')
+        return redirect('admin_conciliacion')
+
+    if request.method == 'POST':
+        if request.POST.get('accion') == 'resolver':
+            # Elegir a mano el comprobante de un movimiento ambiguo
+            try:
+                movimiento = extracto.movimientos.get(movimientoID=request.POST.get('movimiento_id'))
+                comprobante = Comprobante.objects.get(comprobanteID=request.POST.get('comprobante_id'))
+                conciliar_manual(movimiento, comprobante)
+                messages.success(request, f'✅ Línea {movimiento.linea} conciliada con el comprobante #{comprobante.pk}.')
+            except (MovimientoBancario.DoesNotExist, Comprobante.DoesNotExist, ValueError):
+                messages.error(request, 'Movimiento o comprobante no encontrado.')
+            except ErrorExtracto as e:
+                messages.error(request, str(e))
+        else:
+            resultado = conciliar(extracto, rehacer=bool(request.POST.get('rehacer')))
+            messages.success(
+                request,
+                f'✅ Conciliación terminada: {resultado[MovimientoBancario.ESTADO_CONCILIADO]} conciliado(s), '
+                f'{resultado[MovimientoBancario.ESTADO_AMBIGUO]} ambiguo(s), '
+                f'{resultado[MovimientoBancario.ESTADO_SIN_COINCIDENCIA]} sin coincidencia.'
+            )
+        return redirect('admin_extracto', extracto_id=extracto.pk)
+
+    return render(request, 'pagoprop/admin_extracto.html', {
+        'extracto': extracto,
+        'reporte': reporte(extracto),
     })
 
 # Eliminar asignación de apartamento (Admin)
@@ -438,7 +521,8 @@ def admin_eliminar_asignacion_view(request, asignacion_id):
 @login_required(login_url='login')
 def perfil_view(request):
     return render(request, 'pagoprop/perfil.html', {
-        'user': request.user
+        'user': request.user,
+        'total_apartamentos': len(apartamentos_de(request.user)),
     })
 
 
@@ -485,6 +569,7 @@ def cambiar_password_view(request):
 
 
 
+# ver todos los comprobantes
 @staff_member_required(login_url='login')
 def admin_todos_comprobantes_view(request):
     # obtener todos los comprobantes de todos los usuarios
@@ -492,46 +577,15 @@ def admin_todos_comprobantes_view(request):
         'copropietario', 'apartamento'
     ).order_by('-fecha_creacion')
     
-    # Crear el formulario de filtros
-    filtro_form = FiltroComprobantesForm(request.user, request.GET)
+    # Crear el formulario de filtros (el admin puede filtrar por cualquier apartamento)
+    filtro_form = formulario_filtros(request.user, request.GET, todos_apartamentos=True)
+    comprobantes_list = filtrar_comprobantes(comprobantes_list, filtro_form)
     
-    # Aplicar filtros si el formulario es válido
-    if filtro_form.is_valid():
-        # Filtrar por apartamento
-        apartamento = filtro_form.cleaned_data.get('apartamento')
-        if apartamento:
-            comprobantes_list = comprobantes_list.filter(apartamento=apartamento)
-        
-        # Filtrar por fecha desde
-        fecha_desde = filtro_form.cleaned_data.get('fecha_desde')
-        if fecha_desde:
-            comprobantes_list = comprobantes_list.filter(fecha_creacion__date__gte=fecha_desde)
-        
-        # Filtrar por fecha hasta
-        fecha_hasta = filtro_form.cleaned_data.get('fecha_hasta')
-        if fecha_hasta:
-            comprobantes_list = comprobantes_list.filter(fecha_creacion__date__lte=fecha_hasta)
-        
-        # Filtrar por monto mínimo
-        monto_minimo = filtro_form.cleaned_data.get('monto_minimo')
-        if monto_minimo:
-            comprobantes_list = comprobantes_list.filter(monto__gte=monto_minimo)
-        
-        # Filtrar por monto máximo
-        monto_maximo = filtro_form.cleaned_data.get('monto_maximo')
-        if monto_maximo:
-            comprobantes_list = comprobantes_list.filter(monto__lte=monto_maximo)
-    
-    # Paginador
-    paginator = Paginator(comprobantes_list, 20)
-    page_number = request.GET.get('page')
-    comprobantes = paginator.get_page(page_number)
+    # Paginación por cursor (20 registros por página, costo constante)
+    comprobantes = paginar_por_cursor(comprobantes_list, request, 20)
     
-    # Estadísticas
-    from django.db.models import Count
-    stats = {
-        'cantidad': comprobantes_list.count()
-    }
+    # Estadísticas (un solo conteo, en caché por conjunto de filtros)
+    stats = contar_comprobantes(comprobantes_list, filtro_form, permitir_estimado=True)
     
     # 👇 AGREGAR ESTO: Todos los apartamentos para el modal
     todos_apartamentos = Apartamento.objects.all().order_by('numeroApartamento')
@@ -550,75 +604,314 @@ def exportar_comprobantes_excel(request):
     que en la vista de administración.
     """
     # 1. Obtener la base de datos de comprobantes
-    comprobantes = Comprobante.objects.select_related('copropietario', 'apartamento').all()
+    comprobantes = Comprobante.objects.all()
 
-    # 2. Capturar filtros del request (los mismos que usa el formulario del modal)
-    apartamento_id = request.GET.get('apartamento')
-    fecha_desde = request.GET.get('fecha_desde')
-    fecha_hasta = request.GET.get('fecha_hasta')
-    monto_min = request.GET.get('monto_minimo')
-    monto_max = request.GET.get('monto_maximo')
+    # 2. Validar los filtros del request (los mismos que usa el formulario del modal)
+    filtro_form = formulario_filtros(request.user, request.GET, todos_apartamentos=True)
+    if not filtro_form.is_valid():
+        messages.error(request, 'Los filtros de la exportación no son válidos.')
+        return redirect('admin_todos_comprobantes')
 
     # 3. Aplicar filtros si existen
-    if apartamento_id:
-        comprobantes = comprobantes.filter(apartamento_id=apartamento_id)
-    if fecha_desde:
-        comprobantes = comprobantes.filter(fecha_creacion__date__gte=fecha_desde)
-    if fecha_hasta:
-        comprobantes = comprobantes.filter(fecha_creacion__date__lte=fecha_hasta)
-    if monto_min:
-        comprobantes = comprobantes.filter(monto__gte=monto_min)
-    if monto_max:
-        comprobantes = comprobantes.filter(monto__lte=monto_max)
-
-    # 4. Crear el libro de Excel
-    wb = Workbook()
-    ws = wb.active
-    ws.title = "Comprobantes Recaudados"
-
-    # Estilos básicos
-    font_bold = Font(bold=True, color="FFFFFF")
-    fill_header = PatternFill(start_color="4F81BD", end_color="4F81BD", fill_type="solid")
-    center_aligned = Alignment(horizontal="center")
-
-    # Encabezados
-    headers = ['ID', 'Copropietario', 'Email', 'Apartamento', 'Monto', 'Fecha']
-    ws.append(headers)
-
-    # Aplicar estilos a la primera fila
-    for cell in ws[1]:
-        cell.font = font_bold
-        cell.fill = fill_header
-        cell.alignment = center_aligned
-
-    # 5. Agregar los datos
-    for comp in comprobantes:
-        ws.append([
-            comp.comprobanteID,
-            comp.copropietario.get_full_name() if comp.copropietario else "Sin asignar",
-            comp.copropietario.email if comp.copropietario else "",
-            f"Apto. {comp.apartamento.numeroApartamento}" if comp.apartamento else "N/A",
-            comp.monto,
-            comp.fecha_creacion.strftime('%d/%m/%Y %H:%M') if comp.fecha_creacion else ""
-        ])
-
-    # 6. Ajustar ancho de columnas automáticamente
-    for col in ws.columns:
-        max_length = 0
-        column = col[0].column_letter
-        for cell in col:
-            try:
-                if len(str(cell.value)) > max_length:
-                    max_length = len(str(cell.value))
-            except: pass
-        ws.column_dimensions[column].width = max_length + 2
+    comprobantes = aplicar_filtros(comprobantes, filtro_form.cleaned_data)
+
+    # 4. Generar el libro en modo write-only (memoria constante)
+    archivo = generar_excel_temporal(comprobantes)
 
-    # 7. Preparar la respuesta HTTP
+    # 5. Enviar el archivo por partes, sin cargarlo completo en memoria
     nombre_archivo = f"Reporte_Comprobantes_{datetime.now().strftime('%Y%m%d_%H%M')}.xlsx"
-    response = HttpResponse(
-        content_type='application/vnd.openxmlformats-officedocument.spreadsheetml.sheet'
+    return FileResponse(
+        archivo,
+        as_attachment=True,
+        filename=nombre_archivo,
+        content_type=CONTENT_TYPE_EXCEL
     )
-    response['Content-Disposition'] = f'attachment; filename="{nombre_archivo}"'
-    
-    wb.save(response)
-    return response
\ No newline at end of file
+
+
+# Solicitar una exportación en segundo plano
+@staff_member_required(login_url='login')
+@require_POST
+def admin_solicitar_exportacion_view(request):
+    filtro_form = formulario_filtros(request.user, request.POST, todos_apartamentos=True)
+    if not filtro_form.is_valid():
+        messages.error(request, 'Los filtros de la exportación no son válidos.')
+        return redirect('admin_todos_comprobantes')
+
+    exportacion = solicitar_exportacion(request.user, serializar_filtros(filtro_form.cleaned_data))
+
+    if exportacion.estado == ExportacionComprobantes.ESTADO_TERMINADO:
+        messages.info(request, 'Ya existe un reporte reciente con estos filtros, puedes descargarlo.')
+    else:
+        messages.success(request, 'Estamos generando tu reporte. Puedes seguir usando el sistema mientras tanto.')
+    return redirect('admin_estado_exportacion', exportacion_id=exportacion.exportacionID)
+
+
+# Ver el estado de una exportación
+@staff_member_required(login_url='login')
+def admin_estado_exportacion_view(request, exportacion_id):
+    try:
+        exportacion = ExportacionComprobantes.objects.get(exportacionID=exportacion_id)
+    except ExportacionComprobantes.DoesNotExist:
+        messages.error(request, 'Exportación no encontrada.')
+        return redirect('admin_todos_comprobantes')
+
+    return render(request, 'pagoprop/admin_estado_exportacion.html', {
+        'exportacion': exportacion
+    })
+
+
+# Progreso de la exportación en JSON (lo consulta la página de estado)
+@staff_member_required(login_url='login')
+def admin_progreso_exportacion_view(request, exportacion_id):
+    try:
+        exportacion = ExportacionComprobantes.objects.get(exportacionID=exportacion_id)
+    except ExportacionComprobantes.DoesNotExist:
+        return JsonResponse({'error': 'Exportación no encontrada.'}, status=404)
+
+    url_descarga = None
+    if exportacion.estado == ExportacionComprobantes.ESTADO_TERMINADO and not exportacion.vencida:
+        url_descarga = reverse('admin_descargar_exportacion', args=[exportacion.exportacionID])
+
+    return JsonResponse({
+        'estado': exportacion.estado,
+        'estado_display': exportacion.get_estado_display(),
+        'progreso': exportacion.progreso,
+        'filas_procesadas': exportacion.filas_procesadas,
+        'total_filas': exportacion.total_filas,
+        'error': exportacion.error,
+        'url_descarga': url_descarga,
+    })
+
+
+# Descargar el archivo de una exportación terminada
+@staff_member_required(login_url='login')
+def admin_descargar_exportacion_view(request, exportacion_id):
+    try:
+        exportacion = ExportacionComprobantes.objects.get(exportacionID=exportacion_id)
+    except ExportacionComprobantes.DoesNotExist:
+        messages.error(request, 'Exportación no encontrada.')
+        return redirect('admin_todos_comprobantes')
+
+    if exportacion.estado != ExportacionComprobantes.ESTADO_TERMINADO:
+        messages.warning(request, 'El reporte todavía no está listo.')
+        return redirect('admin_estado_exportacion', exportacion_id=exportacion.exportacionID)
+
+    if exportacion.vencida or not exportacion.archivo:
+        messages.error(request, 'El reporte ya expiró. Genera uno nuevo.')
+        return redirect('admin_estado_exportacion', exportacion_id=exportacion.exportacionID)
+
+    return FileResponse(
+        exportacion.archivo.open('rb'),
+        as_attachment=True,
+        filename=os.path.basename(exportacion.archivo.name),
+        content_type=CONTENT_TYPE_EXCEL
+    )
+
+
+# ---------------------------------------------------------------------------
+# Subida de comprobantes por partes (reanudable)
+# ---------------------------------------------------------------------------
+
+def _subida_del_usuario(request, token):
+    try:
+        return SubidaComprobante.objects.get(token=token, usuario=request.user)
+    except SubidaComprobante.DoesNotExist:
+        return None
+
+
+def _estado_subida(subida):
+    return {
+        'token': str(subida.token),
+        'offset': subida.bytes_recibidos,
+        'tamano': subida.tamano,
+        'tamano_fragmento': settings.SUBIDA_TAMANO_FRAGMENTO,
+        'completa': subida.completa,
+    }
+
+
+# Iniciar (o retomar) una subida: recibe nombre y tamano del archivo
+@login_required(login_url='login')
+@require_POST
+def subida_iniciar_view(request):
+    try:
+        tamano = int(request.POST.get('tamano', ''))
+        subida = iniciar_subida(request.user, request.POST.get('nombre') or 'comprobante', tamano)
+    except ValueError as e:
+        mensaje = str(e) if str(e).startswith('El archivo') else 'Tamaño de archivo inválido.'
+        return JsonResponse({'error': mensaje}, status=400)
+
+    return JsonResponse(_estado_subida(subida))
+
+
+# Consultar cuántos bytes lleva una subida (para reanudar)
+@login_required(login_url='login')
+def subida_estado_view(request, token):
+    subida = _subida_del_usuario(request, token)
+    if subida is None:
+        return JsonResponse({'error': 'Subida no encontrada.'}, status=404)
+    return JsonResponse(_estado_subida(subida))
+
+
+# Recibir un fragmento. El CSRF se valida después de instalar el upload
+# handler (si se valida antes, Django ya habría leído el cuerpo).
+@csrf_exempt
+@login_required(login_url='login')
+@require_POST
+def subida_fragmento_view(request, token):
+    subida = _subida_del_usuario(request, token)
+    if subida is None:
+        return JsonResponse({'error': 'Subida no encontrada.'}, status=404)
+
+    try:
+        offset = int(request.headers.get('X-Subida-Offset', ''))
+    except ValueError:
+        return JsonResponse({'error': 'Falta el encabezado X-Subida-Offset.'}, status=400)
+
+    # El cliente debe continuar exactamente donde quedó la subida
+    if offset != subida.bytes_recibidos:
+        return JsonResponse({**_estado_subida(subida), 'error': 'Offset incorrecto.'}, status=409)
+
+    handler = FragmentoUploadHandler(subida, offset, request)
+    request.upload_handlers = [handler]
+    try:
+        return _recibir_fragmento(request, subida, handler)
+    finally:
+        # Si el CSRF falló o hubo un error, el archivo parcial vuelve a como estaba
+        handler.cerrar(aceptar=False)
+
+
+@csrf_protect
+def _recibir_fragmento(request, subida, handler):
+    request.POST  # procesa el cuerpo con el FragmentoUploadHandler
+
+    if not registrar_fragmento(subida, handler):
+        mensaje = handler.error or 'No se pudo guardar el fragmento, consulta el estado e intenta de nuevo.'
+        return JsonResponse({**_estado_subida(subida), 'error': mensaje}, status=400 if handler.error else 409)
+
+    return JsonResponse(_estado_subida(subida))
+
+
+# Completar la subida: crea el comprobante con las mismas validaciones del formulario
+@login_required(login_url='login')
+@require_POST
+def subida_completar_view(request, token):
+    subida = _subida_del_usuario(request, token)
+    if subida is None:
+        return JsonResponse({'error': 'Subida no encontrada.'}, status=404)
+    if not subida.completa:
+        return JsonResponse({**_estado_subida(subida), 'error': 'La subida no está completa.'}, status=409)
+
+    archivo, sha256 = ensamblar(subida)
+    form = ComprobanteForm(request.user, request.POST, {'archivo': archivo})
+
+    if not form.is_valid():
+        archivo.close()
+        return JsonResponse({'error': 'Error al subir el comprobante. Verifica los datos.', 'errores': form.errors}, status=400)
+
+    comprobante = form.save(commit=False)
+    comprobante.copropietario = request.user
+    comprobante.sha256 = sha256
+    with transaction.atomic():
+        # El archivo parcial se mueve a su destino final, no se copia
+        comprobante.save()
+        archivo.close()
+        finalizar_subida(subida)
+
+    messages.success(request, '¡Comprobante subido exitosamente!')
+    duplicados = _avisar_duplicado(request, comprobante)
+    return JsonResponse({
+        'comprobante': comprobante.comprobanteID,
+        'sha256': sha256,
+        'duplicados': duplicados,
+        'url': reverse('mis_comprobantes'),
+    })
+
+
+# ---------------------------------------------------------------------------
+# Archivos de comprobantes (solo para quien tiene acceso)
+# ---------------------------------------------------------------------------
+
+@login_required(login_url='login')
+@require_safe
+def archivo_comprobante_view(request, comprobante_id, tipo='archivo'):
+    # Mismo 404 si no existe o si no tiene permiso: no revela qué IDs existen
+    try:
+        comprobante = Comprobante.objects.get(comprobanteID=comprobante_id)
+    except Comprobante.DoesNotExist:
+        raise Http404('Comprobante no encontrado.')
+    if not puede_ver_comprobante(request.user, comprobante):
+        raise Http404('Comprobante no encontrado.')
+
+    archivo = getattr(comprobante, tipo)
+    if not archivo:
+        raise Http404('Archivo no encontrado.')
+
+    extension = os.path.splitext(archivo.name)[1]
+    nombre_descarga = f'comprobante_{comprobante_id}{extension}'
+    if os.path.isfile(archivo.path):
+        return servir_archivo(request, archivo.name, archivo.path, nombre_descarga)
+
+    # Los archivos antiguos pueden estar archivados en un paquete
+    frio = leer_frio(archivo.name)
+    if frio is None:
+        raise Http404('Archivo no encontrado.')
+    datos, modificado = frio
+    return servir_datos(request, archivo.name, datos, modificado, nombre_descarga)
+
+
+# API JSON de solo lectura (ver api.py). Mismos permisos que mis_comprobantes_view
+# y admin_todos_comprobantes_view; 304 si el If-None-Match sigue vigente
+def _comprobantes_filtrados(request, comprobantes, todos_apartamentos=False):
+    filtro_form = formulario_filtros(request.user, request.GET, todos_apartamentos=todos_apartamentos)
+    if not filtro_form.is_valid():
+        raise api.ErrorApi('Filtros no válidos.', errores=filtro_form.errors.get_json_data())
+    return aplicar_filtros(comprobantes, filtro_form.cleaned_data)
+
+@gzip_page
+@api.requiere_login
+@require_safe
+@condition(etag_func=api.etag('usuario'))
+@api.respuesta_json
+def api_mis_comprobantes_view(request):
+    comprobantes = _comprobantes_filtrados(request, Comprobante.objects.filter(copropietario=request.user))
+    return api.listar_comprobantes(request, comprobantes)
+
+@gzip_page
+@api.requiere_login
+@require_safe
+@condition(etag_func=api.etag('usuario'))
+@api.respuesta_json
+def api_mis_apartamentos_view(request):
+    return api.listar_mis_apartamentos(request)
+
+@gzip_page
+@api.requiere_staff
+@require_safe
+@condition(etag_func=api.etag('staff'))
+@api.respuesta_json
+def api_admin_comprobantes_view(request):
+    comprobantes = _comprobantes_filtrados(request, Comprobante.objects.all(), todos_apartamentos=True)
+    return api.listar_comprobantes(request, comprobantes)
+
+@gzip_page
+@api.requiere_staff
+@require_safe
+@condition(etag_func=api.etag('staff'))
+@api.respuesta_json
+def api_admin_apartamentos_view(request):
+    return api.listar_por_llave(request, Apartamento.objects.all(), api.CAMPOS_APARTAMENTO, 'apartamentoID')
+
+@gzip_page
+@api.requiere_staff
+@require_safe
+@condition(etag_func=api.etag('staff'))
+@api.respuesta_json
+def api_admin_asignaciones_view(request):
+    asignaciones = PropietarioApartamento.objects.all()
+    for parametro in ('apartamento', 'copropietario'):
+        valor = request.GET.get(parametro)
+        if valor:
+            if not valor.isdigit():
+                raise api.ErrorApi(f'"{parametro}" debe ser un número.')
+            asignaciones = asignaciones.filter(**{f'{parametro}_id': valor})
+    return api.listar_por_llave(request, asignaciones, api.CAMPOS_ASIGNACION, 'propietarioAptoID')
@@ -46,7 +46,7 @@ MIDDLEWARE = [
     'django.contrib.sessions.middleware.SessionMiddleware',
     'django.middleware.common.CommonMiddleware',
     'django.middleware.csrf.CsrfViewMiddleware',
-    'django.contrib.auth.middleware.AuthenticationMiddleware',
+    'pagoprop.sesiones.AutenticacionCacheadaMiddleware',  # request.user desde la caché
     'django.contrib.messages.middleware.MessageMiddleware',
     'django.middleware.clickjacking.XFrameOptionsMiddleware',
 ]
@@ -87,6 +87,16 @@ DATABASES = {
     }
 }
 
+# Caché
+# Con varios procesos (gunicorn) usar un caché compartido (Redis o Memcached)
+# para que la invalidación por versiones llegue a todos los workers.
+CACHES = {
+    'default': {
+        'BACKEND': config('CACHE_BACKEND', default='django.core.cache.backends.locmem.LocMemCache'),
+        'LOCATION': config('CACHE_LOCATION', default='pagoprop'),
+    }
+}
+
 # Password validation
 # https://docs.djangoproject.com/en/5.2/ref/settings/#auth-password-validators
 
@@ -132,6 +142,16 @@ MEDIA_URL = '/media/'
 MEDIA_ROOT = os.path.join(BASE_DIR, 'media')
 
 
+# Subidas de comprobantes por partes (reanudables)
+# La carpeta de parciales debe estar en el mismo disco que MEDIA_ROOT para que
+# el archivo final se mueva sin copiarse.
+SUBIDAS_PARCIALES_ROOT = config('SUBIDAS_PARCIALES_ROOT', default=os.path.join(BASE_DIR, 'subidas_parciales'))
+COMPROBANTE_TAMANO_MAXIMO = config('COMPROBANTE_TAMANO_MAXIMO', default=5 * 1024 * 1024, cast=int)  # bytes
+SUBIDA_TAMANO_FRAGMENTO = config('SUBIDA_TAMANO_FRAGMENTO', default=1024 * 1024, cast=int)  # bytes
+SUBIDA_VIGENCIA_HORAS = config('SUBIDA_VIGENCIA_HORAS', default=48, cast=int)
+LOTE_MAXIMO_ARCHIVOS = config('LOTE_MAXIMO_ARCHIVOS', default=20, cast=int)  # por lote (incluye los que vienen en un ZIP)
+
+
 # Configuración de Email
 EMAIL_BACKEND = 'django.core.mail.backends.smtp.EmailBackend'
 EMAIL_HOST = config('EMAIL_HOST')
@@ -144,6 +164,61 @@ DEFAULT_FROM_EMAIL = 'PagoProp <alejodaza061@gmail.com>'
 # WhatsApp Admin
 WHATSAPP_ADMIN = config('WHATSAPP_ADMIN')
 
+# Exportaciones de Excel en segundo plano
+EXPORTACION_HILOS = config('EXPORTACION_HILOS', default=2, cast=int)  # hilos por proceso
+EXPORTACION_VIGENCIA_HORAS = config('EXPORTACION_VIGENCIA_HORAS', default=24, cast=int)
+EXPORTACION_REUTILIZAR_MINUTOS = config('EXPORTACION_REUTILIZAR_MINUTOS', default=10, cast=int)
+
+# Conteos de comprobantes en caché
+CONTEO_CACHE_SEGUNDOS = config('CONTEO_CACHE_SEGUNDOS', default=300, cast=int)
+CONTEO_ESTIMADO_MINIMO = config('CONTEO_ESTIMADO_MINIMO', default=100000, cast=int)  # desde aquí se usa el estimado sin filtros
+
+# Estadísticas del panel de administración (se invalidan con señales, el TTL es de respaldo)
+TABLERO_CACHE_SEGUNDOS = config('TABLERO_CACHE_SEGUNDOS', default=900, cast=int)
+
+# Fragmentos de las páginas de cada copropietario (se invalidan con señales, el TTL es de respaldo)
+PAGINA_CACHE_SEGUNDOS = config('PAGINA_CACHE_SEGUNDOS', default=86400, cast=int)
+
+# Apartamentos de cada usuario (membresias.py); se invalidan con las señales
+MEMBRESIAS_CACHE_SEGUNDOS = config('MEMBRESIAS_CACHE_SEGUNDOS', default=86400, cast=int)
+
+# Sesiones en caché con escritura en la BD, y el usuario de cada request en caché
+# (sesiones.py). Con varios procesos conviene una caché compartida (CACHE_BACKEND)
+SESSION_ENGINE = config('SESSION_ENGINE', default='django.contrib.sessions.backends.cached_db')
+USUARIO_CACHE_SEGUNDOS = config('USUARIO_CACHE_SEGUNDOS', default=900, cast=int)
+
+# Conciliación de extractos bancarios (conciliacion.py): días de diferencia
+# aceptados entre la consignación y la fecha en que se subió el comprobante
+CONCILIACION_TOLERANCIA_DIAS = config('CONCILIACION_TOLERANCIA_DIAS', default=3, cast=int)
+
+# Entrega de archivos de comprobantes (pasan por una vista que revisa el acceso).
+# 'python': los envía Django con ETag y rangos; 'x-accel': nginx con X-Accel-Redirect;
+# 'x-sendfile': Apache/lighttpd con X-Sendfile. Con nginx, por ejemplo:
+#     location /media-protegida/ { internal; alias /ruta/a/MEDIA_ROOT/; }
+MEDIA_ENVIO = config('MEDIA_ENVIO', default='python')
+MEDIA_X_ACCEL_PREFIJO = config('MEDIA_X_ACCEL_PREFIJO', default='/media-protegida/')
+
+# Archivo frío: los comprobantes antiguos pasan a paquetes comprimidos de solo-agregar
+# (comando archivar_comprobantes). Puede estar en otro disco que MEDIA_ROOT.
+ARCHIVO_FRIO_ROOT = config('ARCHIVO_FRIO_ROOT', default=os.path.join(BASE_DIR, 'archivo_frio'))
+ARCHIVO_FRIO_DIAS = config('ARCHIVO_FRIO_DIAS', default=730, cast=int)
+PAQUETE_TAMANO_MAXIMO = config('PAQUETE_TAMANO_MAXIMO', default=512 * 1024 * 1024, cast=int)  # bytes
+
+# Miniaturas y vistas previas de comprobantes (WebP, lado mayor en píxeles).
+# Las vistas previas de PDF necesitan pdftoppm (paquete poppler-utils).
+MINIATURAS_PROCESOS = config('MINIATURAS_PROCESOS', default=2, cast=int)  # procesos por worker
+MINIATURA_LADO = config('MINIATURA_LADO', default=160, cast=int)
+VISTA_PREVIA_LADO = config('VISTA_PREVIA_LADO', default=1024, cast=int)
+MINIATURA_CALIDAD = config('MINIATURA_CALIDAD', default=75, cast=int)
+
+# Normalización de fotos al subirlas (en el mismo pool de procesos que las miniaturas):
+# orientación EXIF, tamaño máximo, sin metadatos y recodificada en NORMALIZACION_FORMATO
+NORMALIZAR_IMAGENES = config('NORMALIZAR_IMAGENES', default=False, cast=bool)
+NORMALIZACION_LADO_MAXIMO = config('NORMALIZACION_LADO_MAXIMO', default=2000, cast=int)
+NORMALIZACION_FORMATO = config('NORMALIZACION_FORMATO', default='WEBP')  # WEBP, JPEG o PNG
+NORMALIZACION_CALIDAD = config('NORMALIZACION_CALIDAD', default=80, cast=int)
+NORMALIZACION_CONSERVAR_ORIGINAL = config('NORMALIZACION_CONSERVAR_ORIGINAL', default=False, cast=bool)
+
 # URLs para recuperación de contraseña (en producción cambiar por tu dominio)
 PASSWORD_RESET_TIMEOUT = 3600  # 1 hora (en segundos)
 
@@ -46,7 +46,8 @@ urlpatterns = [
 
 ]
 
-# Servir archivos media en desarrollo
+# Servir archivos media en desarrollo (los comprobantes se enlazan por
+# archivo_comprobante_view, que revisa el acceso)
 if settings.DEBUG:
     urlpatterns += static(settings.MEDIA_URL, document_root=settings.MEDIA_ROOT)
 